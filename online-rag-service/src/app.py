@@ -1,25 +1,50 @@
 from typing import List, Optional, Dict, Any
 from typing import Union
 import os
+import re
+import threading
+import time
+from contextlib import asynccontextmanager
 import pymysql  # 提前导入，避免运行时错误
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 
 try:
     # 优先按包导入（若已安装为 rag_service 包）
-    from rag_service.config import INDEX_PATH, META_PATH, MODEL_NAME, DB_CONFIG
-    from rag_service.services.embedder import Embedder
+    from rag_service.config import INDEX_PATH, META_PATH, MODEL_NAME, DB_CONFIG, COUNTER_CONFIG, SHARED_CACHE_PATH, ADMISSION_CONFIG, PROJECTION_CONFIG, SNAPSHOT_DIR, RESILIENCE_CONFIG, QUERY_CACHE_CONFIG, SPARSE_CONFIG, PLANNER_CONFIG
+    from rag_service.services.embedder import Embedder, LocalEmbedder
     from rag_service.services.vector_store import VectorStore
     from rag_service.services.db import like_search
     from rag_service.services.hybrid_search import merge_results
+    from rag_service.services.operations import OperationRegistry
+    from rag_service.services.shared_cache import SharedCache
+    from rag_service.services.admission import AdmissionController, AdmissionRejected, retry_after_header
+    from rag_service.services.serialization import FastJSONResponse, ok, slim
+    from rag_service.services.projection import load_projection
+    from rag_service.services.snapshot import export_tenant, import_tenant, snapshot_path, default_snapshot_name, SnapshotError
+    from rag_service.services.resilience import ResilientEmbedder, EmbeddingUnavailable
+    from rag_service.services.query_cache import QueryCache, QueryLog, QueryWarmer
+    from rag_service.services.sparse import SparseEncoder
+    from rag_service.services.planner import SearchPlanner
 except ImportError:
     # 回退为本地相对导入（当前目录运行）
-    from config import INDEX_PATH, META_PATH, MODEL_NAME, DB_CONFIG
-    from services.embedder import Embedder
+    from config import INDEX_PATH, META_PATH, MODEL_NAME, DB_CONFIG, COUNTER_CONFIG, SHARED_CACHE_PATH, ADMISSION_CONFIG, PROJECTION_CONFIG, SNAPSHOT_DIR, RESILIENCE_CONFIG, QUERY_CACHE_CONFIG, SPARSE_CONFIG, PLANNER_CONFIG
+    from services.embedder import Embedder, LocalEmbedder
     from services.vector_store import VectorStore
     from services.db import like_search
     from services.hybrid_search import merge_results
+    from services.operations import OperationRegistry
+    from services.shared_cache import SharedCache
+    from services.admission import AdmissionController, AdmissionRejected, retry_after_header
+    from services.serialization import FastJSONResponse, ok, slim
+    from services.projection import load_projection
+    from services.snapshot import export_tenant, import_tenant, snapshot_path, default_snapshot_name, SnapshotError
+    from services.resilience import ResilientEmbedder, EmbeddingUnavailable
+    from services.query_cache import QueryCache, QueryLog, QueryWarmer
+    from services.sparse import SparseEncoder
+    from services.planner import SearchPlanner
 
 
 # 数据库连接函数
@@ -51,8 +76,117 @@ def chunk_text(text: str, size: int, overlap: int) -> List[str]:
             break
     return chunks
 
+def chunk_document(text: str, size: int, overlap: int) -> List[str]:
+    # 先按空行切分段落，再对每个段落单独分片
+    # 分片边界与段落对齐，修改某一段落只会影响该段落对应的分片，便于增量入库
+    chunks = []
+    for para in re.split(r'\n\s*\n', text or ''):
+        chunks.extend(chunk_text(para, size, overlap))
+    return chunks
+
+# 嵌入模型与向量存储在首次使用时创建（或由启动预热线程创建），
+# 导入 app 模块不做任何网络调用，进程可以快速启动
+embedder = None
+vector_store = None
+_init_lock = threading.Lock()
+
+# 多 worker 部署时各进程共享的磁盘缓存
+shared_cache = SharedCache(SHARED_CACHE_PATH) if SHARED_CACHE_PATH else None
+
+# 后台操作（如 wait=False 的批量删除）登记表
+operations = OperationRegistry(store=shared_cache)
+
+# 嵌入调用准入控制：限流 + 交互检索/批量入库两个优先级通道
+admission = AdmissionController(ADMISSION_CONFIG)
+
+# 预热状态：pending -> warming -> ready；失败时为 retrying 并记录错误
+warmup_state = {'status': 'pending', 'error': None, 'attempts': 0}
+# 检索缓存与查询日志（各 worker 进程独立缓存，查询日志写入同一个磁盘文件）
+query_cache = QueryCache(QUERY_CACHE_CONFIG['embedding_size'], QUERY_CACHE_CONFIG['result_size'],
+                         QUERY_CACHE_CONFIG['result_ttl']) if QUERY_CACHE_CONFIG['enabled'] else None
+query_log = QueryLog(QUERY_CACHE_CONFIG['log_path'], QUERY_CACHE_CONFIG['log_max_per_user'],
+                     QUERY_CACHE_CONFIG['log_window_days']) if QUERY_CACHE_CONFIG['log_enabled'] else None
+query_warmer = None
+# 检索计划器（精确检索 / HNSW）及其决策与耗时统计
+planner = SearchPlanner(PLANNER_CONFIG) if PLANNER_CONFIG['enabled'] else None
+
+
+def get_embedder():
+    global embedder
+    if embedder is None:
+        with _init_lock:
+            if embedder is None:
+                primary = Embedder(model_name=MODEL_NAME, request_timeout=RESILIENCE_CONFIG['timeout'])
+                if RESILIENCE_CONFIG['enabled']:
+                    fallback = LocalEmbedder(RESILIENCE_CONFIG['fallback_model']) if RESILIENCE_CONFIG['fallback_model'] else None
+                    embedder = ResilientEmbedder(primary, RESILIENCE_CONFIG, fallback=fallback)
+                else:
+                    embedder = primary
+    return embedder
+
+
+def get_vector_store():
+    global vector_store
+    if vector_store is None:
+        emb = get_embedder()
+        with _init_lock:
+            if vector_store is None:
+                # 创建一个全局共享的VectorStore实例，所有用户共用同一个知识库
+                projection = None
+                if PROJECTION_CONFIG['enabled']:
+                    projection = load_projection(PROJECTION_CONFIG['path'])
+                    if projection is None:
+                        raise RuntimeError(f"已启用降维投影，但投影文件不存在: {PROJECTION_CONFIG['path']}")
+                    print(f"[APP] 已加载降维投影: {projection.method} {projection.source_dim} -> {projection.target_dim}")
+                sparse = None
+                if SPARSE_CONFIG['enabled']:
+                    sparse = SparseEncoder(SPARSE_CONFIG['k1'], SPARSE_CONFIG['b'], SPARSE_CONFIG['avg_len'])
+                vector_store = VectorStore(embedder=emb, shared_cache=shared_cache, admission=admission,
+                                           projection=projection, query_cache=query_cache, sparse=sparse,
+                                           planner=planner)
+                print(f"[APP] 已初始化全局共享向量存储")
+    return vector_store
+
+
+def _warm_up_loop():
+    """后台预热：集合检查、载荷索引、计数预加载；失败时指数退避重试"""
+    delay = 1.0
+    while True:
+        warmup_state['attempts'] += 1
+        warmup_state['status'] = 'warming'
+        try:
+            get_vector_store().warm_up(COUNTER_CONFIG['reconcile_interval'], COUNTER_CONFIG['stale_after'], COUNTER_CONFIG['stale_limit'])
+            warmup_state.update(status='ready', error=None)
+            start_query_warmer()
+            return
+        except Exception as e:
+            print(f"[APP] 预热失败（第 {warmup_state['attempts']} 次），{delay:.0f}s 后重试: {e}")
+            warmup_state.update(status='retrying', error=str(e))
+            time.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+
+def start_query_warmer():
+    """就绪后按查询日志预热检索缓存，并定期把查询日志写入磁盘"""
+    global query_warmer
+    if query_log is None or query_warmer is not None:
+        return
+    # 未启用检索缓存时预热没有意义，只定期写查询日志
+    top_n = QUERY_CACHE_CONFIG['warmup_top_n'] if query_cache is not None else 0
+    query_warmer = QueryWarmer(get_vector_store(), query_log, top_n,
+                               QUERY_CACHE_CONFIG['warmup_interval'], QUERY_CACHE_CONFIG['log_flush_interval'])
+    query_warmer.start()
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # 预热放在后台线程，不阻塞服务启动；就绪前 /rag/readyz 返回 503
+    threading.Thread(target=_warm_up_loop, name="rag-warmup", daemon=True).start()
+    yield
+
+
 # 初始化 FastAPI 实例
-app = FastAPI(title="RAG Service", version="0.1")
+app = FastAPI(title="RAG Service", version="0.1", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # 配置CORS
 app.add_middleware(
@@ -63,12 +197,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 初始化嵌入模型
-embedder = Embedder(model_name=MODEL_NAME)
 
-# 创建一个全局共享的VectorStore实例，所有用户共用同一个知识库
-vector_store = VectorStore(embedder=embedder)
-print(f"[APP] 已初始化全局共享向量存储")
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(_request, exc: AdmissionRejected):
+    # 过载时快速失败，客户端按 Retry-After 重试
+    return JSONResponse(
+        status_code=429,
+        content={"detail": f"请求过多，请稍后重试: {exc}"},
+        headers={"Retry-After": retry_after_header(exc)}
+    )
+
+@app.exception_handler(EmbeddingUnavailable)
+async def embedding_unavailable_handler(_request, exc: EmbeddingUnavailable):
+    # 嵌入服务熔断或重试耗尽时快速失败，不占用请求线程等待
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, int(exc.retry_after + 0.999)))}
+    )
 
 # Pydantic 模型定义（集中放在一起，便于维护）
 class IngestRaw(BaseModel):
@@ -116,32 +262,84 @@ class DeleteByCategoryReq(BaseModel):
     user: str = Field(..., description="用户标识")
     category: str = Field(..., description="要删除的类别")
 
+class DeleteBulkReq(BaseModel):
+    user: str = Field(..., description="用户标识")
+    titles: List[str] = Field(default_factory=list, description="要删除的标题列表")
+    categories: List[str] = Field(default_factory=list, description="要删除的类别列表")
+    docIds: List[str] = Field(default_factory=list, description="要删除的文档ID列表")
+    countDeleted: bool = Field(False, description="是否先计数以返回真实删除数量")
+    wait: bool = Field(True, description="是否等待删除完成；为 false 时返回操作ID供轮询")
+
+class OperationStatusReq(BaseModel):
+    operationId: str = Field(..., description="操作ID")
+
+class ExportReq(BaseModel):
+    user: str = Field(..., description="用户标识")
+    name: Optional[str] = Field(None, description="快照名，默认为 用户_时间戳")
+    wait: bool = Field(True, description="是否等待导出完成；为 false 时返回操作ID供轮询")
+
+class ImportReq(BaseModel):
+    name: str = Field(..., description="快照名")
+    user: Optional[str] = Field(None, description="导入到的用户，默认为快照的原用户")
+    replace: bool = Field(False, description="是否先清空目标用户的数据")
+    wait: bool = Field(True, description="是否等待导入完成；为 false 时返回操作ID供轮询")
+
 class CountReq(BaseModel):
     user: str = Field(..., description="用户标识")
     category: Optional[str] = Field(None, description="可选的类别过滤条件")
+    exact: bool = Field(False, description="是否与Qdrant对账后返回精确计数（审计用）")
 
 # 接口定义（按功能分类，装饰器紧贴函数）
-@app.post("/rag/health", response_model=Dict[str, Any])
-def health(req: HealthReq) -> Dict[str, Any]:
+@app.post("/rag/health", response_class=FastJSONResponse)
+def health(req: HealthReq) -> FastJSONResponse:
     """健康检查接口"""
     if req.user == '':
-        return {"code": 0, "message": "OK", "data": {"model": MODEL_NAME}}
+        return ok({"model": MODEL_NAME})
     # 补充完整的返回逻辑，避免语法风险
-    return {"code": 0, "message": "OK", "user": req.user, "data": {"model": MODEL_NAME}}
+    return ok({"model": MODEL_NAME}, user=req.user)
+
+@app.get("/rag/livez", response_class=FastJSONResponse)
+def livez() -> Dict[str, Any]:
+    """存活探针：进程能响应即返回 OK，不依赖外部服务"""
+    return {"code": 0, "message": "OK"}
+
+@app.get("/rag/readyz", response_class=FastJSONResponse)
+def readyz():
+    """就绪探针：预热完成后才返回 200，否则返回 503"""
+    if warmup_state['status'] == 'ready':
+        return ok(dict(warmup_state))
+    return JSONResponse(status_code=503, content={"code": 1, "message": "NOT_READY", "data": dict(warmup_state)})
 
-@app.post("/rag/count", response_model=Dict[str, Any])
-def count_vector(req: CountReq) -> Dict[str, Any]:
-    """获取用户向量库中的数据条数"""
+@app.get("/rag/metrics", response_class=FastJSONResponse)
+def metrics() -> FastJSONResponse:
+    """服务运行指标（当前 worker 进程）"""
+    return ok({
+        "pid": os.getpid(),
+        "admission": admission.stats(),
+        "embedder": embedder.stats() if hasattr(embedder, 'stats') else None,
+        "query_cache": query_cache.stats() if query_cache is not None else None,
+        "planner": planner.stats() if planner is not None else None,
+        "query_warmup": query_warmer.last_run if query_warmer is not None else None,
+        # 向量库尚未初始化时不触发初始化
+        "shards": [
+            {"index": s.index, "collection": s.collection_name, "host": s.host}
+            for s in vector_store.shards
+        ] if vector_store is not None else None
+    })
+
+@app.post("/rag/count", response_class=FastJSONResponse)
+def count_vector(req: CountReq) -> FastJSONResponse:
+    """获取用户向量库中的数据条数（默认读取内存计数，exact=true 时精确对账）"""
     try:
         # 使用全局共享的向量存储实例
-        user_store = vector_store
+        user_store = get_vector_store()
         # 获取用户数据条数，支持category过滤
-        count = user_store.count(user=req.user, category=req.category)
-        return {"code": 0, "message": "OK", "user": req.user, "data": {"count": count}}
+        counts = user_store.tenant_counts(user=req.user, category=req.category, exact=req.exact)
+        return ok({"count": counts['chunks'], "documents": counts['documents']}, user=req.user)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取数据条数失败: {e}")
 
-@app.post("/rag/ingest", response_model=Dict[str, Any])
+@app.post("/rag/ingest", response_class=FastJSONResponse)
 def ingest( req: Union[IngestRaw, IngestDB]):
     """数据入库接口（支持raw文本/数据库ID）"""
     # 从payload中获取user
@@ -149,27 +347,27 @@ def ingest( req: Union[IngestRaw, IngestDB]):
     if not user:
         raise HTTPException(status_code=400, detail="参数 user 不能为空")
     # 使用全局共享的向量存储实例
-    user_store = vector_store
+    user_store = get_vector_store()
     if isinstance(req, IngestRaw):
         # 处理 Raw 模式
         if req.source != 'raw': 
             # 这是一个防御性检查，因为 Pydantic 可能已经根据字段匹配了
             pass 
             
-        chunks = chunk_text(req.text, req.chunkSize, req.chunkOverlap)
-        metas = [{
-            'title': req.title,
+        chunks = chunk_document(req.text, req.chunkSize, req.chunkOverlap)
+        meta = {
             'category': req.category,
-            'keywords': req.keywords or '',
-            'content': c,
-            'user': user
-        } for c in chunks]
+            'keywords': req.keywords or ''
+        }
         
         try:
-            user_store.add_texts(chunks, metas)
+            # 同一用户同一标题视为同一文档，重复入库时只处理变化的分片
+            stats = user_store.upsert_document(req.title, chunks, meta, user=user)
+        except (AdmissionRejected, EmbeddingUnavailable):
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"向量入库失败: {e}")
-        return {"code": 0, "message": "OK", "data": {"ingested": len(chunks)}}
+        return ok({"ingested": len(chunks), **stats})
 
     elif isinstance(req, IngestDB):
         # 处理 DB 模式
@@ -193,34 +391,48 @@ def ingest( req: Union[IngestRaw, IngestDB]):
                 'user': user  # 保留用户信息到元数据中，便于追踪和权限管理
             })
         if not texts:
-            return {"code": 0, "message": "OK", "data": {"ingested": 0}}
+            return ok({"ingested": 0})
         user_store.add_texts(texts, metas)
-        return {"code": 0, "message": "OK", "data": {"ingested": len(texts)}}
+        return ok({"ingested": len(texts)})
     else:
         # 理论上 FastAPI 验证通过后不会走到这里
         raise HTTPException(status_code=400, detail="无效的请求参数")
 
 
-@app.post("/rag/search", response_model=Dict[str, Any])
+@app.post("/rag/search", response_class=FastJSONResponse)
 def search(req: SearchReq):
     """纯向量检索接口"""
     if not req.q:
         raise HTTPException(status_code=400, detail="参数 q 不能为空")
     # 使用全局共享的向量存储实例
-    user_store = vector_store
+    user_store = get_vector_store()
+    if query_log is not None:
+        query_log.record(req.user, req.q, req.category, req.topK)
     try:
         res = user_store.search(req.q, topK=req.topK, category=req.category, user=req.user)
+    except (AdmissionRejected, EmbeddingUnavailable):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"向量检索失败: {e}")
-    return {"code": 0, "message": "OK", "user": req.user, "data": res}
+    return ok(res, user=req.user)
 
-@app.post("/rag/hybrid-search", response_model=Dict[str, Any])
+@app.post("/rag/hybrid-search", response_class=FastJSONResponse)
 def hybrid_search(req: HybridSearchReq):
     """混合检索接口（向量+关键词）"""
     if not req.q:
         raise HTTPException(status_code=400, detail="参数 q 不能为空")
     # 使用全局共享的向量存储实例
-    user_store = vector_store
+    user_store = get_vector_store()
+    if user_store.hybrid_ready:
+        if query_log is not None:
+            query_log.record(req.user, req.q, req.category, req.topK, kind='hybrid')
+        # 稠密 + 稀疏向量在 Qdrant 内一次查询、服务端融合（RRF），不访问 MySQL；alpha/beta 不参与排序
+        res = user_store.hybrid_search(req.q, topK=req.topK, category=req.category, user=req.user,
+                                       candidates=max(req.topK * 2, req.topK))
+        return ok(slim(res, req.topK))
+    if query_log is not None:
+        # 这一路只有稠密检索有结果缓存，按实际调用的 topK 记录
+        query_log.record(req.user, req.q, req.category, max(req.topK * 2, req.topK))
     # 多取一些候选，避免两路各自去重后导致信息缺失，同时传递user参数
     vec_res = user_store.search(req.q, topK=max(req.topK * 2, req.topK), category=req.category, user=req.user)
     try:
@@ -229,13 +441,14 @@ def hybrid_search(req: HybridSearchReq):
         # 当数据库不可用时，关键词检索回退为空集合，保证接口仍可用
         kw_res = []
     merged = merge_results(vec_res, kw_res, alpha=req.alpha, beta=req.beta)
-    return {"code": 0, "message": "OK", "data": merged[:req.topK]}
+    # 只序列化前 topK 条，并去掉融合用的内部字段
+    return ok(slim(merged, req.topK))
 
-@app.post("/rag/sync-db", response_model=Dict[str, Any])
+@app.post("/rag/sync-db", response_class=FastJSONResponse)
 def sync_db(req: SyncDBReq):
     """批量同步数据库内容到向量库"""
     # 使用全局共享的向量存储实例
-    user_store = vector_store
+    user_store = get_vector_store()
     # 从 DB 批量读取构建索引（简单示例：按 LIKE 拉取全部）
     kw_res = like_search('', req.category, topK=req.limit, user=req.user)  # 空查询返回全部（实现上可能不支持，实际请改为全量 select）
     texts = [i.get('content', '') for i in kw_res]
@@ -245,35 +458,103 @@ def sync_db(req: SyncDBReq):
         'user': req.user  # 添加用户信息到元数据
     } for i in kw_res]
     if not texts:
-        return {"code": 0, "message": "OK", "data": {"ingested": 0}}
+        return ok({"ingested": 0})
     user_store.add_texts(texts, metas)
-    return {"code": 0, "message": "OK", "data": {"ingested": len(texts)}}
+    return ok({"ingested": len(texts)})
 
-@app.post("/rag/delete-by-title", response_model=Dict[str, Any])
+@app.post("/rag/delete-by-title", response_class=FastJSONResponse)
 def delete_by_title(req: DeleteByTitleReq):
     """根据标题删除用户向量库中的内容"""
     print(f"[API] 收到删除请求，用户: {req.user}，标题: {req.title}")
     try:
-        user_store = vector_store
+        user_store = get_vector_store()
         print(f"[API] 获取用户存储成功")
         deleted_count = user_store.delete_by_title(req.title, user=req.user)
         print(f"[API] 删除操作完成，删除数量: {deleted_count}")
-        return {"code": 0, "message": "OK", "data": {"deleted": deleted_count}}
+        return ok({"deleted": deleted_count})
     except Exception as e:
         print(f"[API] 删除失败: {e}")
         raise HTTPException(status_code=500, detail=f"删除失败: {e}")
 
-@app.post("/rag/delete-by-category", response_model=Dict[str, Any])
+@app.post("/rag/delete-by-category", response_class=FastJSONResponse)
 def delete_by_category(req: DeleteByCategoryReq):
     """根据类别删除用户向量库中的内容"""
     print(f"[API] 收到删除请求，用户: {req.user}，类别: {req.category}")
     try:
-        user_store = vector_store
+        user_store = get_vector_store()
         print(f"[API] 获取用户存储成功")
         deleted_count = user_store.delete_by_category(req.category, user=req.user)
         print(f"[API] 删除操作完成，删除数量: {deleted_count}")
-        return {"code": 0, "message": "OK", "data": {"deleted": deleted_count}}
+        return ok({"deleted": deleted_count})
     except Exception as e:
         print(f"[API] 删除失败: {e}")
         raise HTTPException(status_code=500, detail=f"删除失败: {e}")
 
+@app.post("/rag/delete-bulk", response_class=FastJSONResponse)
+def delete_bulk(req: DeleteBulkReq):
+    """批量删除：一次请求按多个标题/类别/文档ID组合删除"""
+    if not (req.titles or req.categories or req.docIds):
+        raise HTTPException(status_code=400, detail="titles、categories、docIds 至少提供一项")
+    user_store = get_vector_store()
+    kwargs = dict(
+        titles=req.titles, categories=req.categories, doc_ids=req.docIds,
+        user=req.user, count=req.countDeleted
+    )
+    if not req.wait:
+        # 提交到后台执行，立即返回，不占用请求线程
+        op_id = operations.submit("delete-bulk", user_store.delete_where, **kwargs)
+        return ok({"operationId": op_id, "status": "pending"})
+    try:
+        deleted_count = user_store.delete_where(**kwargs)
+    except Exception as e:
+        print(f"[API] 批量删除失败: {e}")
+        raise HTTPException(status_code=500, detail=f"删除失败: {e}")
+    return ok({"deleted": deleted_count})
+
+@app.post("/rag/export", response_class=FastJSONResponse)
+def export_snapshot(req: ExportReq):
+    """导出用户知识库快照（原始向量 + 列式载荷），恢复时无需重新调用嵌入接口"""
+    name = req.name or default_snapshot_name(req.user)
+    try:
+        directory = snapshot_path(SNAPSHOT_DIR, name)
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    user_store = get_vector_store()
+    if not req.wait:
+        op_id = operations.submit("export", export_tenant, user_store, req.user, directory)
+        return ok({"operationId": op_id, "status": "pending", "name": name})
+    try:
+        manifest = export_tenant(user_store, req.user, directory)
+    except Exception as e:
+        print(f"[API] 导出快照失败: {e}")
+        raise HTTPException(status_code=500, detail=f"导出失败: {e}")
+    return ok({"name": name, "manifest": manifest})
+
+@app.post("/rag/import", response_class=FastJSONResponse)
+def import_snapshot(req: ImportReq):
+    """从快照恢复/克隆用户知识库：批量写回向量，不调用嵌入接口"""
+    try:
+        directory = snapshot_path(SNAPSHOT_DIR, req.name)
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    user_store = get_vector_store()
+    kwargs = dict(user=req.user, replace=req.replace)
+    if not req.wait:
+        op_id = operations.submit("import", import_tenant, user_store, directory, **kwargs)
+        return ok({"operationId": op_id, "status": "pending"})
+    try:
+        result = import_tenant(user_store, directory, **kwargs)
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"[API] 导入快照失败: {e}")
+        raise HTTPException(status_code=500, detail=f"导入失败: {e}")
+    return ok(result)
+
+@app.post("/rag/operation-status", response_class=FastJSONResponse)
+def operation_status(req: OperationStatusReq):
+    """查询后台操作的执行状态"""
+    op = operations.get(req.operationId)
+    if op is None:
+        raise HTTPException(status_code=404, detail=f"操作不存在: {req.operationId}")
+    return ok(op)
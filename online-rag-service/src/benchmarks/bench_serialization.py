@@ -0,0 +1,98 @@
+"""
+响应序列化微基准：对比 FastAPI 默认路径（response_model 校验 + jsonable_encoder + JSONResponse）
+与 FastJSONResponse 直接序列化，在 topK=50 混合检索结果上的单次请求 CPU 耗时。
+
+用法（在 src 目录下）：
+    python -m benchmarks.bench_serialization --top-k 50 --rounds 2000
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from services.serialization import FastJSONResponse, slim  # noqa: E402
+
+
+def make_hybrid_results(top_k: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """构造与 /rag/hybrid-search 融合结果结构一致的数据（含 MySQL 返回的 datetime）"""
+    rng = random.Random(seed)
+    now = datetime.datetime(2024, 1, 1, 12, 0, 0)
+    items = []
+    for i in range(top_k * 2):
+        item = {
+            'id': i,
+            'title': f"文档标题 {i}",
+            'category': rng.choice(['技术', '产品', '运营']),
+            'keywords': '数据库,优化,性能',
+            'content': '项目管理是指在项目活动中运用专门的知识、技能、工具和方法。' * 8,
+            'user': 'bench_user',
+            'doc_id': f"{rng.getrandbits(128):032x}",
+            'chunk_hash': f"{rng.getrandbits(160):040x}",
+            'version': 3,
+            'score_vec': rng.random(),
+            '_norm_score_vec': rng.random(),
+            'score': rng.random(),
+        }
+        if i % 2:
+            item.update({'source': '内部文档', 'created_at': now - datetime.timedelta(minutes=i),
+                         'score_kw': 1.0, '_norm_score_kw': 1.0})
+        items.append(item)
+    items.sort(key=lambda x: x['score'], reverse=True)
+    return items
+
+
+def baseline(merged: List[Dict], top_k: int) -> bytes:
+    # 旧路径：返回 dict，FastAPI 按 response_model=Dict[str, Any] 校验，再 jsonable_encoder，再 JSONResponse 渲染
+    content = {"code": 0, "message": "OK", "data": merged[:top_k]}
+    validated = _ADAPTER.validate_python(content)
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def optimized(merged: List[Dict], top_k: int) -> bytes:
+    return FastJSONResponse({"code": 0, "message": "OK", "data": slim(merged, top_k)}).body
+
+
+_ADAPTER = TypeAdapter(Dict[str, Any])
+
+
+def measure(fn, merged, top_k: int, rounds: int) -> Dict[str, float]:
+    for _ in range(min(rounds, 100)):
+        fn(merged, top_k)
+    start = time.process_time()
+    for _ in range(rounds):
+        body = fn(merged, top_k)
+    cpu = time.process_time() - start
+    return {'cpu_us_per_request': round(cpu / rounds * 1e6, 2), 'body_bytes': len(body)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="响应序列化微基准")
+    parser.add_argument('--top-k', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    merged = make_hybrid_results(args.top_k)
+    base = measure(baseline, merged, args.top_k, args.rounds)
+    fast = measure(optimized, merged, args.top_k, args.rounds)
+    report = {
+        'topK': args.top_k,
+        'rounds': args.rounds,
+        'baseline': base,
+        'optimized': fast,
+        'speedup': round(base['cpu_us_per_request'] / fast['cpu_us_per_request'], 2),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
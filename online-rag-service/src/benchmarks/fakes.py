@@ -0,0 +1,142 @@
+"""
+基准测试用的本地替身：确定性的假嵌入模型、SQLite 版知识库表、可复现的语料生成。
+不依赖 DashScope / Qdrant 服务 / MySQL。
+"""
+import hashlib
+import random
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_]+|[一-鿿]")
+
+
+class FakeEmbedder:
+    """
+    确定性假嵌入：把词哈希到固定维度（特征哈希）后归一化。
+    相同文本永远得到相同向量，共享词越多的文本余弦相似度越高。
+    latency_ms 用于模拟远程嵌入接口的耗时。
+    """
+
+    def __init__(self, dim: int = 1536, latency_ms: float = 0.0):
+        self.dim = dim
+        self.latency_ms = latency_ms
+        self.model_name = "fake-embedding"
+        self.calls = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def dimension(self) -> int:
+        return self.dim
+
+    def _encode_one(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype='float32')
+        for tok in _TOKEN_RE.findall(text.lower()):
+            h = int.from_bytes(hashlib.blake2b(tok.encode('utf-8'), digest_size=8).digest(), 'little')
+            vec[h % self.dim] += 1.0 if (h >> 63) else -1.0
+        norm = float(np.linalg.norm(vec))
+        if norm == 0.0:
+            vec[0] = 1.0
+            return vec
+        return vec / norm
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        with self._lock:
+            self.calls += 1
+            self.texts += len(texts)
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        return np.stack([self._encode_one(t) for t in texts]).astype('float32')
+
+
+class SqliteKnowledgeDB:
+    """
+    用 SQLite 内存库代替 MySQL 的 knowledge 表，提供与 services.db.like_search 相同的签名。
+    """
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute(
+            "CREATE TABLE knowledge ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, user TEXT NOT NULL, "
+            "content TEXT NOT NULL, category TEXT, keywords TEXT, source TEXT, "
+            "is_deleted INTEGER DEFAULT 0, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        )
+        self.conn.execute("CREATE INDEX idx_user_category ON knowledge(user, category)")
+
+    def insert(self, rows: List[Dict]) -> None:
+        with self.lock:
+            self.conn.executemany(
+                "INSERT INTO knowledge (title, user, content, category, keywords, source) VALUES (?, ?, ?, ?, ?, ?)",
+                [(r['title'], r['user'], r['content'], r.get('category'), r.get('keywords'), r.get('source', 'bench'))
+                 for r in rows]
+            )
+            self.conn.commit()
+
+    def like_search(self, question: str, category: Optional[str], topK: int, user: str = None) -> List[Dict]:
+        sql = (
+            "SELECT id, title, content, category, keywords, source, created_at "
+            "FROM knowledge WHERE is_deleted=0 AND content LIKE ?"
+            + (" AND category=?" if category else "")
+            + (" AND user=?" if user else "")
+            + " ORDER BY created_at DESC LIMIT ?"
+        )
+        params = [f"%{question}%"]
+        if category:
+            params.append(category)
+        if user:
+            params.append(user)
+        params.append(topK)
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [{
+            'id': r[0], 'title': r[1], 'content': r[2], 'category': r[3],
+            'keywords': r[4], 'source': r[5], 'created_at': r[6]
+        } for r in rows]
+
+
+_WORDS = (
+    "项目 管理 软件 开发 流程 需求 设计 编码 测试 部署 维护 数据库 索引 查询 优化 性能 "
+    "缓存 向量 检索 嵌入 模型 知识 文档 用户 权限 安全 网络 服务 接口 日志 监控 告警 "
+    "qdrant mysql fastapi python docker kubernetes latency throughput shard replica "
+    "index cache vector search ranking recall precision batch stream queue worker"
+).split()
+
+
+class Corpus:
+    """可复现的合成语料：按种子生成用户、类别、文档与查询"""
+
+    def __init__(self, docs: int, users: int = 4, categories: int = 5, paragraphs: int = 4,
+                 words_per_paragraph: int = 60, seed: int = 42):
+        self.rng = random.Random(seed)
+        self.users = [f"bench_user_{i}" for i in range(users)]
+        self.categories = [f"cat_{i}" for i in range(categories)]
+        self.documents = []
+        for i in range(docs):
+            paras = [
+                " ".join(self.rng.choice(_WORDS) for _ in range(words_per_paragraph))
+                for _ in range(paragraphs)
+            ]
+            self.documents.append({
+                'title': f"doc_{i}",
+                'user': self.users[i % users],
+                'category': self.rng.choice(self.categories),
+                'keywords': ",".join(self.rng.sample(_WORDS, 3)),
+                'text': "\n\n".join(paras)
+            })
+
+    def query(self) -> Dict:
+        return {
+            'q': " ".join(self.rng.sample(_WORDS, 3)),
+            'user': self.rng.choice(self.users),
+            'category': self.rng.choice(self.categories + [None, None])
+        }
+
+    def keyword(self) -> str:
+        return self.rng.choice(_WORDS)
@@ -0,0 +1,212 @@
+"""
+RAG 服务离线基准测试。
+
+使用本地替身（假嵌入模型、Qdrant 内存模式、SQLite 知识库表），通过 ASGI 直接驱动
+/rag/ingest、/rag/search、/rag/hybrid-search、/rag/count，输出吞吐、p50/p95/p99 延迟和峰值 RSS（JSON）。
+
+用法（在 src 目录下）：
+    python -m benchmarks.run_bench --docs 200 --requests 500 --concurrency 8 --output bench.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+# 必须在导入 app 之前设置：使用 Qdrant 内存模式，关闭定期对账
+os.environ.setdefault('QDRANT_LOCATION', ':memory:')
+os.environ.setdefault('RAG_COUNTER_RECONCILE_SECONDS', '0')
+os.environ.setdefault('DASHSCOPE_API_KEY', 'offline-bench')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+from benchmarks.fakes import Corpus, FakeEmbedder, SqliteKnowledgeDB  # noqa: E402
+
+
+def peak_rss_mb() -> float:
+    # Linux 下 ru_maxrss 单位为 KB，macOS 下为字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return 'unknown'
+
+
+def summarize(name: str, latencies: List[float], errors: int, rejected: int, wall: float) -> Dict[str, Any]:
+    arr = np.asarray(latencies, dtype='float64') * 1000.0
+    total = len(latencies) + errors + rejected
+    res = {
+        'endpoint': name,
+        'requests': total,
+        'errors': errors,
+        'rejected': rejected,
+        'wall_s': round(wall, 4),
+        'throughput_rps': round(total / wall, 2) if wall > 0 else None,
+    }
+    if len(arr):
+        res.update({
+            'mean_ms': round(float(arr.mean()), 3),
+            'p50_ms': round(float(np.percentile(arr, 50)), 3),
+            'p95_ms': round(float(np.percentile(arr, 95)), 3),
+            'p99_ms': round(float(np.percentile(arr, 99)), 3),
+            'max_ms': round(float(arr.max()), 3),
+        })
+    return res
+
+
+async def run_phase(client: httpx.AsyncClient, name: str, path: str, bodies: List[Dict],
+                    concurrency: int) -> Dict[str, Any]:
+    """以固定并发度发送一组请求，记录每个请求的延迟"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for body in bodies:
+        queue.put_nowait(body)
+    latencies: List[float] = []
+    errors = 0
+    rejected = 0
+
+    async def worker():
+        nonlocal errors, rejected
+        while True:
+            try:
+                body = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                resp = await client.post(path, json=body)
+                if resp.status_code == 429:
+                    rejected += 1
+                    continue
+                if resp.status_code != 200:
+                    errors += 1
+                    continue
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    return summarize(name, latencies, errors, rejected, wall)
+
+
+def build_app(args, corpus: Corpus):
+    """导入 app 并替换为本地替身"""
+    import app as rag_app
+    from services.sparse import SparseEncoder
+    from services.vector_store import VectorStore
+
+    embedder = FakeEmbedder(dim=args.dim, latency_ms=args.embed_latency_ms)
+    rag_app.embedder = embedder
+    rag_app.vector_store = VectorStore(
+        embedder=embedder, admission=rag_app.admission if args.admission else None,
+        sparse=SparseEncoder() if args.sparse else None, planner=rag_app.planner)
+    # ASGITransport 不触发 lifespan，这里同步完成预热
+    rag_app.vector_store.warm_up()
+    rag_app.warmup_state['status'] = 'ready'
+
+    db = SqliteKnowledgeDB()
+    db.insert([{**d, 'content': d['text']} for d in corpus.documents])
+    rag_app.like_search = db.like_search
+    return rag_app, embedder
+
+
+async def main_async(args) -> Dict[str, Any]:
+    corpus = Corpus(docs=args.docs, users=args.users, paragraphs=args.paragraphs, seed=args.seed)
+    rag_app, embedder = build_app(args, corpus)
+
+    transport = httpx.ASGITransport(app=rag_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        phases: Dict[str, Callable[[], List[Dict]]] = {
+            'ingest': lambda: [{
+                'source': 'raw', 'title': d['title'], 'category': d['category'], 'text': d['text'],
+                'keywords': d['keywords'], 'user': d['user'],
+                'chunkSize': args.chunk_size, 'chunkOverlap': args.chunk_overlap
+            } for d in corpus.documents],
+            'search': lambda: [
+                {**corpus.query(), 'topK': args.top_k} for _ in range(args.requests)
+            ],
+            'hybrid-search': lambda: [
+                {**corpus.query(), 'q': corpus.keyword(), 'topK': args.top_k} for _ in range(args.requests)
+            ],
+            'count': lambda: [
+                {'user': q['user'], 'category': q['category']} for q in (corpus.query() for _ in range(args.requests))
+            ],
+        }
+        results = []
+        for name in args.endpoints:
+            embed_calls = embedder.calls
+            res = await run_phase(client, name, f'/rag/{name}', phases[name](), args.concurrency)
+            res['embed_calls'] = embedder.calls - embed_calls
+            results.append(res)
+            print(f"[Bench] {name}: {res.get('throughput_rps')} req/s, p95 {res.get('p95_ms')} ms", file=sys.stderr)
+
+    return {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'params': {
+            'docs': args.docs, 'users': args.users, 'paragraphs': args.paragraphs,
+            'requests': args.requests, 'concurrency': args.concurrency, 'topK': args.top_k,
+            'dim': args.dim, 'embed_latency_ms': args.embed_latency_ms, 'seed': args.seed,
+            'admission': args.admission,
+            'sparse': args.sparse,
+        },
+        'results': results,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="RAG 服务离线基准测试")
+    parser.add_argument('--docs', type=int, default=200, help="入库文档数")
+    parser.add_argument('--users', type=int, default=4, help="租户数")
+    parser.add_argument('--paragraphs', type=int, default=4, help="每篇文档段落数")
+    parser.add_argument('--requests', type=int, default=500, help="每个检索/计数接口的请求数")
+    parser.add_argument('--concurrency', type=int, default=8, help="并发度")
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--chunk-overlap', type=int, default=50)
+    parser.add_argument('--dim', type=int, default=1536, help="假嵌入向量维度")
+    parser.add_argument('--embed-latency-ms', type=float, default=0.0, help="模拟嵌入接口耗时")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--admission', action='store_true', help="启用嵌入准入控制（429 计入 rejected）")
+    parser.add_argument('--sparse', action='store_true', help="启用稀疏向量，混合检索在 Qdrant 内融合（不访问 MySQL）")
+    parser.add_argument('--endpoints', nargs='+', default=['ingest', 'search', 'hybrid-search', 'count'],
+                        choices=['ingest', 'search', 'hybrid-search', 'count'])
+    parser.add_argument('--output', help="结果 JSON 输出路径（默认输出到标准输出）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # 服务内部的调试输出转到标准错误，保证标准输出只有 JSON 结果
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(main_async(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -29,15 +29,142 @@ DB_CONFIG = {
     'database': os.getenv('RAG_DB_NAME', 'demo_db')
 }
 
+# 每个 worker 进程内的数据库连接池大小
+DB_POOL_SIZE = int(os.getenv('RAG_DB_POOL_SIZE', '4'))
+
+# 服务配置
+# mode: dev 为单进程 + DEBUG 日志；prod 为多 worker 进程 + 生产日志级别
+SERVICE_MODE = os.getenv('SERVICE_MODE', 'dev')
 SERVICE_CONFIG = {
-    'host': '0.0.0.0',
-    'port': 8000,
-    'log_level': 'info'
+    'host': os.getenv('SERVICE_HOST', '0.0.0.0'),
+    'port': int(os.getenv('SERVICE_PORT', '8000')),
+    'mode': SERVICE_MODE,
+    'log_level': os.getenv('SERVICE_LOG_LEVEL', 'warning' if SERVICE_MODE == 'prod' else 'info'),
+    # worker 进程数，0 表示 prod 模式下取 CPU 核数、dev 模式下为 1
+    'workers': int(os.getenv('SERVICE_WORKERS', '0')) or ((os.cpu_count() or 1) if SERVICE_MODE == 'prod' else 1),
+    # 日志文件，为空时只输出到标准输出
+    'log_file': os.getenv('SERVICE_LOG_FILE', '' if SERVICE_MODE == 'prod' else 'service.log'),
+    # 优雅退出/重载时等待在途请求完成的秒数
+    'graceful_timeout': int(os.getenv('SERVICE_GRACEFUL_TIMEOUT', '30')),
+    'pid_file': os.getenv('SERVICE_PID_FILE', ''),
 }
 
+# 多 worker 共享的磁盘缓存（SQLite），为空时不启用；多 worker 启动时默认放在数据目录下
+SHARED_CACHE_PATH = os.getenv('RAG_SHARED_CACHE_PATH', '')
+
 # Qdrant向量数据库配置
 QDRANT_CONFIG = {
     'host': os.getenv('QDRANT_HOST', 'localhost'),
     'port': int(os.getenv('QDRANT_PORT', '6333')),
-    'collection_name': os.getenv('QDRANT_COLLECTION_NAME', 'knowledge_base')
-}
\ No newline at end of file
+    'collection_name': os.getenv('QDRANT_COLLECTION_NAME', 'knowledge_base'),
+    # 本地模式：":memory:" 为内存模式，其他值视为本地存储目录；为空时连接 host:port 上的服务
+    'location': os.getenv('QDRANT_LOCATION'),
+    # 分片集合数量：>1 时使用 {collection_name}_s0 ... _s{N-1} 多个集合，按用户哈希路由
+    'shards': int(os.getenv('QDRANT_SHARDS', '1')),
+    # 分片所在的 Qdrant 节点（"host:port" 逗号分隔），分片 i 放在第 i % 节点数 个节点上；为空时都用 host:port
+    'shard_hosts': [h.strip() for h in os.getenv('QDRANT_SHARD_HOSTS', '').split(',') if h.strip()],
+}
+
+# 租户计数器配置：定期与Qdrant对账的间隔（秒），<=0 表示关闭定期对账
+# 定期对账只扫描计数失效的用户，以及每轮最多 stale_limit 个超过 stale_after 秒未对账的用户
+COUNTER_CONFIG = {
+    'reconcile_interval': float(os.getenv('RAG_COUNTER_RECONCILE_SECONDS', '300')),
+    'stale_after': float(os.getenv('RAG_COUNTER_STALE_SECONDS', '86400')),
+    'stale_limit': int(os.getenv('RAG_COUNTER_STALE_LIMIT', '20'))
+}
+
+# 嵌入调用准入控制（每个 worker 进程独立计算）
+# 速率单位为“文本条数/秒”；interactive 为交互检索通道，bulk 为批量入库通道
+ADMISSION_CONFIG = {
+    'enabled': os.getenv('RAG_ADMISSION_ENABLED', '1') == '1',
+    'global_rate': float(os.getenv('RAG_EMBED_GLOBAL_RATE', '100')),
+    'global_burst': float(os.getenv('RAG_EMBED_GLOBAL_BURST', '200')),
+    'user_rate': float(os.getenv('RAG_EMBED_USER_RATE', '20')),
+    'user_burst': float(os.getenv('RAG_EMBED_USER_BURST', '100')),
+    # 每用户批量入库通道的令牌桶，与检索通道分开计费
+    'user_bulk_rate': float(os.getenv('RAG_EMBED_USER_BULK_RATE', '20')),
+    'user_bulk_burst': float(os.getenv('RAG_EMBED_USER_BULK_BURST', '100')),
+    # 超过单次上限的批量嵌入拆分后，后续批次在限流时最多等待的秒数（按速率继续而不是中途失败）
+    'bulk_pace_wait': float(os.getenv('RAG_BULK_PACE_WAIT_SECONDS', '10')),
+    # 全局令牌中为交互检索保留的比例，批量入库不能使用这部分
+    'interactive_reserve': float(os.getenv('RAG_EMBED_INTERACTIVE_RESERVE', '0.2')),
+    'interactive_concurrency': int(os.getenv('RAG_INTERACTIVE_CONCURRENCY', '8')),
+    'interactive_queue': int(os.getenv('RAG_INTERACTIVE_QUEUE', '64')),
+    'interactive_wait': float(os.getenv('RAG_INTERACTIVE_WAIT_SECONDS', '1.0')),
+    'bulk_concurrency': int(os.getenv('RAG_BULK_CONCURRENCY', '2')),
+    'bulk_queue': int(os.getenv('RAG_BULK_QUEUE', '4')),
+    'bulk_wait': float(os.getenv('RAG_BULK_WAIT_SECONDS', '0.2')),
+    # 检索缓存预热专用的令牌桶（所有租户共用，不消耗用户配额）
+    'warmup_rate': float(os.getenv('RAG_EMBED_WARMUP_RATE', '5')),
+    'warmup_burst': float(os.getenv('RAG_EMBED_WARMUP_BURST', '20')),
+}
+
+# 向量降维投影：由 tools/fit_projection.py 拟合生成，与集合一一对应
+# 启用后集合按投影后的维度创建，入库向量与查询向量都先投影
+PROJECTION_CONFIG = {
+    'enabled': os.getenv('RAG_PROJECTION_ENABLED', '0') == '1',
+    'path': os.getenv('RAG_PROJECTION_PATH', osp.join(DATA_DIR, f"projection_{QDRANT_CONFIG['collection_name']}.npz")),
+}
+
+# 租户快照（向量 + 列式载荷）的存放目录，/rag/export 与 /rag/import 只访问该目录下的快照
+SNAPSHOT_DIR = os.getenv('RAG_SNAPSHOT_DIR', osp.join(DATA_DIR, 'snapshots'))
+
+# 嵌入服务容错：每次调用的截止时间、带抖动的重试、查询对冲请求与熔断
+RESILIENCE_CONFIG = {
+    'enabled': os.getenv('RAG_EMBED_RESILIENCE', '1') == '1',
+    # 批量入库整次调用（含重试）的截止时间（秒）
+    'timeout': float(os.getenv('RAG_EMBED_TIMEOUT_SECONDS', '10')),
+    # 查询嵌入整次调用（含重试与对冲）的截止时间（秒）
+    'query_timeout': float(os.getenv('RAG_EMBED_QUERY_TIMEOUT_SECONDS', '2')),
+    'retries': int(os.getenv('RAG_EMBED_RETRIES', '2')),
+    'backoff_base': float(os.getenv('RAG_EMBED_BACKOFF_BASE', '0.1')),
+    'backoff_max': float(os.getenv('RAG_EMBED_BACKOFF_MAX', '1.0')),
+    # 查询嵌入等待超过近期延迟的该分位数后发出对冲请求
+    'hedge': os.getenv('RAG_EMBED_HEDGE', '1') == '1',
+    'hedge_percentile': float(os.getenv('RAG_EMBED_HEDGE_PERCENTILE', '95')),
+    'hedge_min_delay': float(os.getenv('RAG_EMBED_HEDGE_MIN_DELAY', '0.05')),
+    # 同时在途的嵌入调用上限（含对冲与已超时但未返回的调用）
+    'max_in_flight': int(os.getenv('RAG_EMBED_MAX_IN_FLIGHT', '32')),
+    'breaker_failures': int(os.getenv('RAG_EMBED_BREAKER_FAILURES', '5')),
+    'breaker_reset': float(os.getenv('RAG_EMBED_BREAKER_RESET_SECONDS', '30')),
+    # 本地降级模型路径（sentence-transformers），为空时不降级；与 DashScope 向量空间不同，默认关闭
+    'fallback_model': os.getenv('RAG_EMBED_FALLBACK_MODEL', ''),
+}
+
+# 检索缓存与查询日志预热
+QUERY_CACHE_CONFIG = {
+    'enabled': os.getenv('RAG_QUERY_CACHE', '1') == '1',
+    # 查询向量缓存条数（按归一化查询文本）
+    'embedding_size': int(os.getenv('RAG_QUERY_EMBED_CACHE_SIZE', '10000')),
+    # 结果缓存条数与最长存活时间（秒）；租户有写入时对应结果立即失效
+    'result_size': int(os.getenv('RAG_QUERY_RESULT_CACHE_SIZE', '5000')),
+    'result_ttl': float(os.getenv('RAG_QUERY_RESULT_TTL_SECONDS', '300')),
+    # 查询日志：按租户记录归一化查询频次，定期写入磁盘
+    'log_enabled': os.getenv('RAG_QUERY_LOG', '1') == '1',
+    'log_path': os.getenv('RAG_QUERY_LOG_PATH', osp.join(DATA_DIR, 'query_log.db')),
+    'log_flush_interval': float(os.getenv('RAG_QUERY_LOG_FLUSH_SECONDS', '30')),
+    'log_max_per_user': int(os.getenv('RAG_QUERY_LOG_MAX_PER_USER', '500')),
+    'log_window_days': float(os.getenv('RAG_QUERY_LOG_WINDOW_DAYS', '7')),
+    # 启动后及之后每隔 warmup_interval 秒预热最常见的 warmup_top_n 个查询（<=0 只在启动时预热）
+    'warmup_top_n': int(os.getenv('RAG_QUERY_WARMUP_TOP_N', '200')),
+    'warmup_interval': float(os.getenv('RAG_QUERY_WARMUP_INTERVAL_SECONDS', '3600')),
+}
+
+# 稀疏词项向量（单引擎混合检索）：启用后新建的集合同时配置稀疏向量，入库时写入 BM25 风格的词项权重，
+# /rag/hybrid-search 在 Qdrant 内用 RRF 融合稠密与稀疏检索结果，不再访问 MySQL
+SPARSE_CONFIG = {
+    'enabled': os.getenv('RAG_SPARSE_ENABLED', '0') == '1',
+    'k1': float(os.getenv('RAG_SPARSE_K1', '1.2')),
+    'b': float(os.getenv('RAG_SPARSE_B', '0.75')),
+    # 分片的平均词项数，用于词频长度归一化
+    'avg_len': float(os.getenv('RAG_SPARSE_AVG_LEN', '256')),
+}
+
+# 检索计划：过滤后候选数不超过 exact_threshold 时精确检索，否则 HNSW（ef = topK * ef_per_k，限制在 [ef_min, ef_max]）
+PLANNER_CONFIG = {
+    'enabled': os.getenv('RAG_PLANNER_ENABLED', '1') == '1',
+    'exact_threshold': int(os.getenv('RAG_PLANNER_EXACT_THRESHOLD', '2000')),
+    'ef_min': int(os.getenv('RAG_PLANNER_EF_MIN', '64')),
+    'ef_max': int(os.getenv('RAG_PLANNER_EF_MAX', '512')),
+    'ef_per_k': int(os.getenv('RAG_PLANNER_EF_PER_K', '8')),
+}
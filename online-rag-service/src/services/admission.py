@@ -0,0 +1,206 @@
+import math
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+
+class AdmissionRejected(Exception):
+    """请求被准入控制拒绝（限流或排队已满），应返回 429"""
+
+    def __init__(self, reason: str, lane: str, retry_after: float = 1.0):
+        self.reason = reason
+        self.lane = lane
+        self.retry_after = retry_after
+        super().__init__(f"{lane} 通道拒绝请求: {reason}")
+
+
+class TokenBucket:
+    """
+    令牌桶：rate 为每秒补充的令牌数，capacity 为桶容量。
+    不允许欠账：单次消耗不能超过 capacity - reserve，更大的批次由调用方按 AdmissionController.max_batch 拆分。
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, n: float, reserve: float = 0.0) -> float:
+        """
+        尝试消耗 n 个令牌，reserve 为必须为其他通道保留的令牌数。
+        成功返回 0，失败返回建议的重试等待秒数。
+        """
+        with self.lock:
+            self._refill()
+            need = n + reserve
+            if self.tokens >= need:
+                self.tokens -= n
+                return 0.0
+            if need > self.capacity or self.rate <= 0:
+                # 永远无法满足（批次超过容量），调用方应先拆分
+                return 60.0
+            return (need - self.tokens) / self.rate
+
+    def refund(self, n: float) -> None:
+        """后续环节拒绝时退还已消耗的令牌"""
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + n)
+
+
+class _Lane:
+    """一个优先级通道：固定并发槽位 + 有界等待队列"""
+
+    def __init__(self, name: str, concurrency: int, queue: int, wait: float):
+        self.name = name
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.queue = queue
+        self.wait = wait
+        self.waiting = 0
+        self.lock = threading.Lock()
+
+
+class AdmissionController:
+    """
+    嵌入调用的准入控制：
+    - 全局令牌桶与每用户、每通道的令牌桶，按文本条数计费；同一用户的入库不会耗尽自己的检索配额
+    - 交互检索（interactive）与批量入库（bulk）使用独立通道，互不占用并发槽位；
+      批量通道只能使用全局令牌桶中超出预留部分的令牌，保证检索始终有配额
+    - 缓存预热（warmup）使用所有租户共用的专用令牌桶与单个并发槽位，不消耗任何用户的配额，
+      同样不能使用为检索预留的全局令牌
+    - 令牌桶不允许欠账，超过单次上限的批量嵌入由调用方按 max_batch 拆分后逐批准入
+    - 队列有界，超出或等待超时直接拒绝，而不是无限排队
+    """
+
+    def __init__(self, config: Dict):
+        self.enabled = config.get('enabled', True)
+        self.global_bucket = TokenBucket(config['global_rate'], config['global_burst'])
+        # 每用户令牌桶按通道区分：(速率, 容量)
+        self.user_limits = {
+            'interactive': (config['user_rate'], config['user_burst']),
+            'bulk': (config.get('user_bulk_rate', config['user_rate']), config.get('user_bulk_burst', config['user_burst'])),
+        }
+        self.interactive_reserve = config['global_burst'] * config.get('interactive_reserve', 0.0)
+        self.bulk_pace_wait = config.get('bulk_pace_wait', 0.0)
+        self.lanes = {
+            'interactive': _Lane('interactive', config['interactive_concurrency'],
+                                 config['interactive_queue'], config['interactive_wait']),
+            'bulk': _Lane('bulk', config['bulk_concurrency'], config['bulk_queue'], config['bulk_wait']),
+            'warmup': _Lane('warmup', 1, 0, 0.0),
+        }
+        self.warmup_bucket = TokenBucket(config.get('warmup_rate', 5.0), config.get('warmup_burst', 20.0))
+        self._users: Dict[Tuple[str, str], TokenBucket] = {}
+        self._users_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.admitted: Counter = Counter()
+        self.rejected: Counter = Counter()
+
+    def _user_bucket(self, user: str, lane: str) -> TokenBucket:
+        key = (user, lane)
+        bucket = self._users.get(key)
+        if bucket is None:
+            with self._users_lock:
+                bucket = self._users.setdefault(key, TokenBucket(*self.user_limits[lane]))
+        return bucket
+
+    def _rate_bucket(self, user: Optional[str], lane: str) -> Optional[TokenBucket]:
+        """通道级限流桶：检索/入库按用户计费；预热使用专用桶，不计入用户配额"""
+        if lane == 'warmup':
+            return self.warmup_bucket
+        return self._user_bucket(user, lane) if user else None
+
+    def _reserve(self, lane: str) -> float:
+        return 0.0 if lane == 'interactive' else self.interactive_reserve
+
+    def max_batch(self, lane: str) -> int:
+        """单次准入允许的最大文本条数（不超过全局桶可用容量与通道限流桶容量）"""
+        if not self.enabled:
+            return 0
+        lane_cap = self.warmup_bucket.capacity if lane == 'warmup' else self.user_limits[lane][1]
+        return max(1, int(min(self.global_bucket.capacity - self._reserve(lane), lane_cap)))
+
+    def _acquire(self, bucket: TokenBucket, cost: int, reserve: float, max_wait: float) -> float:
+        """限流时最多等待 max_wait 秒（按桶给出的补充时间睡眠后重试），仍不足则返回建议的重试秒数"""
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = bucket.try_acquire(cost, reserve=reserve)
+            if not wait or time.monotonic() + wait > deadline:
+                return wait
+            time.sleep(wait)
+
+    def _reject(self, reason: str, lane: str, retry_after: float) -> None:
+        with self.stats_lock:
+            self.rejected[(lane, reason)] += 1
+        raise AdmissionRejected(reason, lane, retry_after)
+
+    @contextmanager
+    def admit(self, user: Optional[str], lane: str = 'interactive', cost: int = 1, max_wait: float = 0.0):
+        """
+        在嵌入调用外层使用：with admission.admit(user, 'bulk', len(texts)): ...
+        cost 不能超过 max_batch(lane)；max_wait>0 时限流先等待令牌补充，用于已开始的批量入库按速率继续
+        """
+        if not self.enabled:
+            yield
+            return
+        ln = self.lanes[lane]
+
+        # 1. 限流：先查用户桶（预热为专用桶），再查全局桶（非检索通道需为检索保留一部分全局令牌）
+        user_bucket = self._rate_bucket(user, lane)
+        if user_bucket is not None:
+            wait = self._acquire(user_bucket, cost, 0.0, max_wait)
+            if wait:
+                self._reject('warmup_rate_limited' if lane == 'warmup' else 'user_rate_limited', lane, wait)
+        wait = self._acquire(self.global_bucket, cost, self._reserve(lane), max_wait)
+        if wait:
+            if user_bucket is not None:
+                user_bucket.refund(cost)
+            self._reject('global_rate_limited', lane, wait)
+
+        # 2. 有界排队：等待者超过队列长度直接拒绝，等待超时也拒绝
+        reason = None
+        if not ln.slots.acquire(blocking=False):
+            with ln.lock:
+                if ln.waiting >= ln.queue:
+                    reason = 'queue_full'
+                else:
+                    ln.waiting += 1
+            if reason is None:
+                try:
+                    if not ln.slots.acquire(timeout=ln.wait):
+                        reason = 'queue_timeout'
+                finally:
+                    with ln.lock:
+                        ln.waiting -= 1
+        if reason is not None:
+            self.global_bucket.refund(cost)
+            if user_bucket is not None:
+                user_bucket.refund(cost)
+            self._reject(reason, lane, ln.wait or 1.0)
+
+        with self.stats_lock:
+            self.admitted[lane] += 1
+        try:
+            yield
+        finally:
+            ln.slots.release()
+
+    def stats(self) -> Dict:
+        with self.stats_lock:
+            return {
+                'enabled': self.enabled,
+                'admitted': dict(self.admitted),
+                'rejected': {f"{lane}:{reason}": n for (lane, reason), n in self.rejected.items()},
+                'waiting': {name: ln.waiting for name, ln in self.lanes.items()},
+            }
+
+
+def retry_after_header(exc: AdmissionRejected) -> str:
+    return str(max(1, math.ceil(exc.retry_after)))
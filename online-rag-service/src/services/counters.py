@@ -0,0 +1,168 @@
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class TenantCounters:
+    """
+    按用户、按用户+类别维护的文档数与分片数计数器。
+    入库/删除时增量更新；定期只对账计数不可信（被标记失效）或长时间未对账的用户；读取为 O(1) 的内存查询。
+
+    - 分片数：(user, category) 下的点数量，category 为 None 表示该用户全部类别
+    - 文档数：(user, category) 下不同标题的数量
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # user -> {(title, category): 分片数}
+        self._detail: Dict[str, Dict[Tuple[str, Optional[str]], int]] = {}
+        # user -> {title: 该标题在所有类别下的分片数}，用于用户级文档计数
+        self._titles: Dict[str, Counter] = {}
+        # (user, category|None) -> 分片数 / 文档数
+        self._chunks: Counter = Counter()
+        self._docs: Counter = Counter()
+        # 已与 Qdrant 对账、计数可信的用户
+        self._loaded = set()
+        # 每个用户的修改代数，用于判断对账扫描期间是否有并发写入
+        self._gen: Counter = Counter()
+        # 每个用户最近一次对账成功的时间
+        self._reconciled_at: Dict[str, float] = {}
+
+    def _apply(self, user: str, title: str, category: Optional[str], delta: int) -> None:
+        # 调用方需持有 self.lock
+        if not delta:
+            return
+        detail = self._detail.setdefault(user, {})
+        titles = self._titles.setdefault(user, Counter())
+        key = (title, category)
+
+        before = detail.get(key, 0)
+        after = max(before + delta, 0)
+        delta = after - before
+        if after:
+            detail[key] = after
+        else:
+            detail.pop(key, None)
+
+        title_before = titles.get(title, 0)
+        title_after = title_before + delta
+        if title_after > 0:
+            titles[title] = title_after
+        else:
+            titles.pop(title, None)
+
+        self._chunks[(user, None)] += delta
+        self._chunks[(user, category)] += delta
+        if before == 0 and after > 0:
+            self._docs[(user, category)] += 1
+        elif before > 0 and after == 0:
+            self._docs[(user, category)] -= 1
+        if title_before == 0 and title_after > 0:
+            self._docs[(user, None)] += 1
+        elif title_before > 0 and title_after <= 0:
+            self._docs[(user, None)] -= 1
+
+    def add_chunks(self, user: str, title: str, category: Optional[str], n: int) -> None:
+        """新增 n 个分片"""
+        with self.lock:
+            self._gen[user] += 1
+            self._apply(user, title, category, n)
+
+    def set_document(self, user: str, title: str, category: Optional[str], chunks: int) -> None:
+        """文档重新入库后，直接设置其分片数（会清除该标题在其他类别下的旧计数）"""
+        with self.lock:
+            self._gen[user] += 1
+            for (t, c), n in list(self._detail.get(user, {}).items()):
+                if t == title:
+                    self._apply(user, t, c, -n)
+            self._apply(user, title, category, chunks)
+
+    def remove_documents(self, user: str, titles: Iterable[str] = (), categories: Iterable[str] = ()) -> None:
+        """删除命中任一标题或任一类别的全部分片"""
+        titles, categories = set(titles or ()), set(categories or ())
+        with self.lock:
+            self._gen[user] += 1
+            for (t, c), n in list(self._detail.get(user, {}).items()):
+                if t in titles or c in categories:
+                    self._apply(user, t, c, -n)
+
+    def invalidate(self, user: Optional[str] = None) -> None:
+        """标记计数不可信，下次读取时重新对账；user 为 None 表示全部用户"""
+        with self.lock:
+            if user is None:
+                for u in list(self._loaded):
+                    self._gen[u] += 1
+                self._loaded.clear()
+            else:
+                self._gen[user] += 1
+                self._loaded.discard(user)
+
+    def generation(self, user: str) -> int:
+        with self.lock:
+            return self._gen[user]
+
+    def generations(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self._gen)
+
+    def replace_user(self, user: str, detail: Dict[Tuple[str, Optional[str]], int], generation: int) -> bool:
+        """
+        用对账扫描结果替换某用户的计数。
+        如果扫描期间该用户有新的写入（代数变化），放弃本次结果，返回 False。
+        """
+        with self.lock:
+            if self._gen[user] != generation:
+                self._loaded.discard(user)
+                return False
+            for (t, c), n in list(self._detail.get(user, {}).items()):
+                self._apply(user, t, c, -n)
+            for (t, c), n in detail.items():
+                self._apply(user, t, c, n)
+            self._loaded.add(user)
+            self._reconciled_at[user] = time.monotonic()
+            return True
+
+    def drop_users_except(self, users: Iterable[str], generations: Dict[str, int]) -> None:
+        """全量对账时清理库中已不存在的用户"""
+        keep = set(users)
+        with self.lock:
+            for user in list(self._detail.keys()):
+                if user in keep or self._gen[user] != generations.get(user, 0):
+                    continue
+                for (t, c), n in list(self._detail[user].items()):
+                    self._apply(user, t, c, -n)
+                self._loaded.add(user)
+                self._reconciled_at[user] = time.monotonic()
+
+    def users(self) -> List[str]:
+        """本 worker 已知的全部用户"""
+        with self.lock:
+            return list(set(self._gen) | set(self._detail))
+
+    def users_to_reconcile(self, stale_after: float, stale_limit: int) -> List[str]:
+        """
+        需要后台对账的用户：计数不可信的用户全部返回；
+        另外按对账时间从旧到新，返回最多 stale_limit 个超过 stale_after 秒未对账的用户（stale_after<=0 时不返回）。
+        """
+        now = time.monotonic()
+        with self.lock:
+            known = set(self._gen) | set(self._detail)
+            dirty = [user for user in known if user not in self._loaded]
+            if stale_after <= 0 or stale_limit <= 0:
+                return dirty
+            stale = sorted(
+                (self._reconciled_at.get(user, 0.0), user) for user in self._loaded
+                if now - self._reconciled_at.get(user, 0.0) >= stale_after
+            )
+        return dirty + [user for _, user in stale[:stale_limit]]
+
+    def get(self, user: str, category: Optional[str] = None) -> Optional[Dict[str, int]]:
+        """读取计数；用户尚未对账时返回 None"""
+        with self.lock:
+            if user not in self._loaded:
+                return None
+            return {
+                'documents': self._docs[(user, category)],
+                'chunks': self._chunks[(user, category)]
+            }
@@ -1,17 +1,25 @@
+import logging
+import queue
+from contextlib import contextmanager
 from typing import List, Dict, Optional
 
 import pymysql
 
 try:
-    from rag_service.config import DB_CONFIG
+    from rag_service.config import DB_CONFIG, DB_POOL_SIZE
 except ImportError:
-    from config import DB_CONFIG
+    from config import DB_CONFIG, DB_POOL_SIZE
+
+logger = logging.getLogger("rag_service.db")
+
+
+# 进程内连接池：每个 worker 进程各自持有，复用连接避免每次查询重新握手
+_pool: "queue.LifoQueue" = queue.LifoQueue(maxsize=DB_POOL_SIZE)
 
 
 def get_conn():
     try:
-        # 打印当前使用的数据库配置信息用于调试
-        print(f"[DB Search Test] 使用数据库配置: 主机={DB_CONFIG['host']}, 端口={DB_CONFIG['port']}, 用户名={DB_CONFIG['user']}, 数据库={DB_CONFIG['database']}")
+        logger.debug(f"使用数据库配置: 主机={DB_CONFIG['host']}, 端口={DB_CONFIG['port']}, 用户名={DB_CONFIG['user']}, 数据库={DB_CONFIG['database']}")
         
         conn = pymysql.connect(
             host=DB_CONFIG['host'],
@@ -22,13 +30,51 @@ def get_conn():
             charset='utf8mb4',
             autocommit=True
         )
-        print(f"[DB Search Test] 数据库连接成功: {DB_CONFIG['host']}:{DB_CONFIG['port']}")
+        logger.debug(f"数据库连接成功: {DB_CONFIG['host']}:{DB_CONFIG['port']}")
         return conn
     except Exception as e:
-        print(f"[DB Search Test] 数据库连接异常: {e}")
+        logger.error(f"数据库连接异常: {e}")
         return None
 
 
+@contextmanager
+def pooled_conn():
+    """
+    从连接池借出一个连接，用完归还；池空或池中连接已失效时新建，池满时关闭。
+    使用过程中抛出异常的连接可能处于事务中途或已断开，直接关闭，不放回连接池。
+    """
+    conn = None
+    try:
+        conn = _pool.get_nowait()
+        conn.ping(reconnect=True)
+    except queue.Empty:
+        conn = None
+    except Exception as e:
+        logger.warning(f"连接池中的连接已失效，重新建立连接: {e}")
+        _close_quietly(conn)
+        conn = None
+    if conn is None:
+        conn = get_conn()
+    if conn is None:
+        raise RuntimeError("数据库连接失败")
+    try:
+        yield conn
+    except BaseException:
+        _close_quietly(conn)
+        raise
+    try:
+        _pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+
+def _close_quietly(conn) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
 def like_search(question: str, category: Optional[str], topK: int, user: str = None) -> List[Dict]:
     sql = (
         "SELECT id, title, content, category, keywords, source, created_at "
@@ -46,27 +92,27 @@ def like_search(question: str, category: Optional[str], topK: int, user: str = N
     params.append(topK)
     
     # 添加测试信息打印
-    print(f"[DB Search Test] 执行查询 - 问题: '{question}', 分类: '{category}', 用户: '{user}', 限制数量: {topK}")
-    print(f"[DB Search Test] SQL: {sql}")
-    print(f"[DB Search Test] 参数: {params}")
+    logger.debug(f"执行查询 - 问题: '{question}', 分类: '{category}', 用户: '{user}', 限制数量: {topK}")
+    logger.debug(f"SQL: {sql}")
+    logger.debug(f"参数: {params}")
     
     try:
-        with get_conn() as conn:
+        with pooled_conn() as conn:
             with conn.cursor() as cur:
                 cur.execute(sql, params)
                 rows = cur.fetchall()
                 
                 # 打印查询结果数量
-                print(f"[DB Search Test] 查询到 {len(rows)} 条记录")
+                logger.debug(f"查询到 {len(rows)} 条记录")
                 
                 # 打印前几条记录的简要信息（标题和ID）
                 if rows:
-                    print("[DB Search Test] 前3条记录:")
+                    logger.debug("前3条记录:")
                     for i, r in enumerate(rows[:3]):
-                        print(f"  [{i+1}] ID: {r[0]}, 标题: {r[1]}")
+                        logger.debug(f"  [{i+1}] ID: {r[0]}, 标题: {r[1]}")
     except Exception as e:
         # 打印异常信息
-        print(f"[DB Search Test] 数据库查询异常: {e}")
+        logger.error(f"数据库查询异常: {e}")
         # 数据库不可用时，返回空集合以保证服务可用
         rows = []
     
@@ -79,5 +125,5 @@ def like_search(question: str, category: Optional[str], topK: int, user: str = N
         })
     
     # 打印最终返回的数据条数
-    print(f"[DB Search Test] 返回 {len(res)} 条格式化数据")
+    logger.debug(f"返回 {len(res)} 条格式化数据")
     return res
\ No newline at end of file
@@ -1,12 +1,15 @@
-from typing import List
+import math
+from typing import List, Optional
 import numpy as np
 import dashscope
 from config import DASHSCOPE_API_KEY
 
 
 class Embedder:
-    def __init__(self, model_name: str = "text-embedding-v1"):
+    def __init__(self, model_name: str = "text-embedding-v1", request_timeout: Optional[float] = None):
         self.model_name = model_name
+        # HTTP 请求超时（秒）；为空时使用 SDK 默认值
+        self.request_timeout = request_timeout
         # 设置DashScope API密钥
         dashscope.api_key = DASHSCOPE_API_KEY
         if not dashscope.api_key:
@@ -16,14 +19,36 @@ class Embedder:
         # DashScope text-embedding-v1 模型的维度是1536
         return 1536
 
-    def encode(self, texts: List[str]) -> np.ndarray:
-        # 使用DashScope API获取embedding
+    def encode(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        # 使用DashScope API获取embedding；timeout 覆盖默认的 HTTP 超时，
+        # 让超过截止时间的调用尽快结束，而不是在后台继续占用线程
+        timeout = timeout or self.request_timeout
+        kwargs = {'request_timeout': max(1, math.ceil(timeout))} if timeout else {}
         response = dashscope.TextEmbedding.call(
             model=self.model_name,
-            input=texts
+            input=texts,
+            **kwargs
         )
         if response.status_code == 200:
             embeddings = [item['embedding'] for item in response.output['embeddings']]
             return np.array(embeddings, dtype='float32')
         else:
-            raise Exception(f"Embedding failed: {response.code} - {response.message}")
\ No newline at end of file
+            raise Exception(f"Embedding failed: {response.code} - {response.message}")
+
+class LocalEmbedder:
+    """
+    本地嵌入模型（sentence-transformers），仅作为 DashScope 不可用时的查询降级。
+    注意：与 DashScope 模型不在同一向量空间，即使维度一致，检索质量也会明显下降。
+    """
+
+    def __init__(self, model_path: str):
+        # 可选依赖，只有配置了本地降级模型时才需要安装
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_path
+        self.model = SentenceTransformer(model_path)
+
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, normalize_embeddings=True), dtype='float32')
@@ -0,0 +1,75 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class OperationRegistry:
+    """
+    后台操作登记表：把耗时操作（如大批量删除）提交到独立线程池执行，
+    立即返回操作ID，调用方之后通过操作ID轮询执行状态。
+    多 worker 部署时传入共享缓存 store，任一 worker 都能查询到其他 worker 提交的操作。
+    """
+
+    def __init__(self, max_workers: int = 2, max_history: int = 1000, store=None, ttl: float = 24 * 3600):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rag-op")
+        self.max_history = max_history
+        self.store = store
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self._ops: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args, **kwargs) -> str:
+        op_id = uuid.uuid4().hex
+        with self.lock:
+            self._ops[op_id] = {
+                'operationId': op_id,
+                'kind': kind,
+                'status': 'pending',
+                'result': None,
+                'error': None,
+                'createdAt': time.time(),
+                'finishedAt': None
+            }
+            # 只保留最近的操作记录，避免无限增长
+            while len(self._ops) > self.max_history:
+                self._ops.popitem(last=False)
+            self._publish(self._ops[op_id])
+        self.executor.submit(self._run, op_id, fn, args, kwargs)
+        return op_id
+
+    def _run(self, op_id: str, fn: Callable[..., Any], args, kwargs) -> None:
+        self._update(op_id, status='running')
+        try:
+            result = fn(*args, **kwargs)
+            self._update(op_id, status='done', result=result, finishedAt=time.time())
+        except Exception as e:
+            print(f"[Operations] 操作 {op_id} 执行失败: {e}")
+            self._update(op_id, status='failed', error=str(e), finishedAt=time.time())
+
+    def _update(self, op_id: str, **fields) -> None:
+        with self.lock:
+            op = self._ops.get(op_id)
+            if op is not None:
+                op.update(fields)
+                self._publish(op)
+
+    def _publish(self, op: Dict[str, Any]) -> None:
+        # 调用方需持有 self.lock
+        if self.store is None:
+            return
+        try:
+            self.store.set(f"op:{op['operationId']}", op, ttl=self.ttl)
+        except Exception as e:
+            print(f"[Operations] 写入共享缓存失败: {e}")
+
+    def get(self, op_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            op = self._ops.get(op_id)
+            if op is not None:
+                return dict(op)
+        if self.store is not None:
+            return self.store.get(f"op:{op_id}")
+        return None
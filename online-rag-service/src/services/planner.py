@@ -0,0 +1,72 @@
+import bisect
+import threading
+from collections import Counter
+from typing import Dict, Optional
+
+from qdrant_client.http.models import SearchParams
+
+# 检索耗时直方图的桶上界（毫秒），最后一个桶收集更慢的请求
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class SearchPlan:
+    """一次检索的执行计划：exact 为暴力精确检索，ann 为 HNSW 近似检索（带调好的 ef）"""
+
+    __slots__ = ('kind', 'estimate', 'source', 'params')
+
+    def __init__(self, kind: str, estimate: Optional[int], source: str, params: SearchParams):
+        self.kind = kind
+        self.estimate = estimate
+        self.source = source
+        self.params = params
+
+
+class SearchPlanner:
+    """
+    按过滤后的候选点数量选择检索方式：
+    - 候选数不超过 exact_threshold（小租户、选择性很强的类别过滤）时精确检索，
+      此时暴力计算比带过滤的 HNSW 遍历更快，且召回率为 100%
+    - 否则走 HNSW，ef 取 topK * ef_per_k 并限制在 [ef_min, ef_max]
+    候选数来自内存中的租户计数，未加载时由调用方用一次近似 count 估计。
+    """
+
+    def __init__(self, config: Dict):
+        self.exact_threshold = config['exact_threshold']
+        self.ef_min = config['ef_min']
+        self.ef_max = config['ef_max']
+        self.ef_per_k = config['ef_per_k']
+        self.lock = threading.Lock()
+        self.decisions: Counter = Counter()
+        self.sources: Counter = Counter()
+        self.timed: Counter = Counter()
+        self.total_ms: Counter = Counter()
+        self.histograms: Dict[str, list] = {}
+
+    def plan(self, estimate: Optional[int], source: str, top_k: int) -> SearchPlan:
+        if estimate is not None and estimate <= self.exact_threshold:
+            plan = SearchPlan('exact', estimate, source, SearchParams(exact=True))
+        else:
+            ef = min(self.ef_max, max(self.ef_min, top_k * self.ef_per_k))
+            plan = SearchPlan('ann', estimate, source, SearchParams(hnsw_ef=ef))
+        with self.lock:
+            self.decisions[plan.kind] += 1
+            self.sources[source] += 1
+        return plan
+
+    def record(self, plan: SearchPlan, seconds: float) -> None:
+        ms = seconds * 1000.0
+        with self.lock:
+            self.timed[plan.kind] += 1
+            self.total_ms[plan.kind] += ms
+            hist = self.histograms.setdefault(plan.kind, [0] * (len(LATENCY_BUCKETS_MS) + 1))
+            hist[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                'decisions': dict(self.decisions),
+                'estimate_sources': dict(self.sources),
+                'mean_ms': {k: round(self.total_ms[k] / n, 3) for k, n in self.timed.items() if n},
+                'latency_buckets_ms': list(LATENCY_BUCKETS_MS) + ['+Inf'],
+                'histograms': {k: list(v) for k, v in self.histograms.items()},
+            }
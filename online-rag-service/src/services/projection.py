@@ -0,0 +1,89 @@
+import os
+from typing import Optional
+
+import numpy as np
+
+
+class Projection:
+    """
+    向量降维投影：x -> normalize((x - mean) @ matrix)
+    matrix 形状为 (source_dim, target_dim)，列向量两两正交。
+    入库向量与查询向量必须使用同一个投影。
+    """
+
+    def __init__(self, matrix: np.ndarray, mean: np.ndarray, method: str, collection: str = ''):
+        self.matrix = np.ascontiguousarray(matrix, dtype='float32')
+        self.mean = np.asarray(mean, dtype='float32')
+        self.method = method
+        self.collection = collection
+
+    @property
+    def source_dim(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def target_dim(self) -> int:
+        return self.matrix.shape[1]
+
+    def apply(self, vecs: np.ndarray) -> np.ndarray:
+        vecs = np.asarray(vecs, dtype='float32')
+        out = (vecs - self.mean) @ self.matrix
+        # 集合使用余弦距离，这里归一化，方便离线评估时直接用点积
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (out / norms).astype('float32')
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # np.savez 会自动补 .npz 后缀，这里先写临时文件再替换，避免读到半截文件
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, matrix=self.matrix, mean=self.mean,
+                 method=np.array(self.method), collection=np.array(self.collection))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'Projection':
+        data = np.load(path)
+        return cls(data['matrix'], data['mean'], str(data['method']), str(data['collection']))
+
+
+def fit_pca(sample: np.ndarray, target_dim: int, collection: str = '') -> Projection:
+    """在语料样本上拟合 PCA 投影（取前 target_dim 个主成分）"""
+    sample = np.asarray(sample, dtype='float32')
+    if sample.shape[0] < target_dim:
+        raise ValueError(f"样本数 {sample.shape[0]} 少于目标维度 {target_dim}")
+    mean = sample.mean(axis=0)
+    _, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+    return Projection(vt[:target_dim].T, mean, 'pca', collection)
+
+
+def random_orthogonal(source_dim: int, target_dim: int, seed: int = 0, collection: str = '') -> Projection:
+    """随机正交投影：不需要样本，作为 PCA 的对照基线"""
+    rng = np.random.default_rng(seed)
+    q, _ = np.linalg.qr(rng.standard_normal((source_dim, target_dim)).astype('float32'))
+    return Projection(q, np.zeros(source_dim, dtype='float32'), 'random', collection)
+
+
+def _normalize(vecs: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vecs / norms
+
+
+def recall_at_k(corpus: np.ndarray, queries: np.ndarray, projection: Projection, k: int = 10) -> float:
+    """
+    以全维度精确检索的 top-k 为真值，计算投影后精确检索的 recall@k。
+    """
+    full_c, full_q = _normalize(np.asarray(corpus, dtype='float32')), _normalize(np.asarray(queries, dtype='float32'))
+    proj_c, proj_q = projection.apply(corpus), projection.apply(queries)
+    k = min(k, len(corpus))
+    truth = np.argpartition(-(full_q @ full_c.T), k - 1, axis=1)[:, :k]
+    found = np.argpartition(-(proj_q @ proj_c.T), k - 1, axis=1)[:, :k]
+    hits = sum(len(set(t).intersection(f)) for t, f in zip(truth, found))
+    return hits / float(truth.size)
+
+
+def load_projection(path: Optional[str]) -> Optional[Projection]:
+    if not path or not os.path.exists(path):
+        return None
+    return Projection.load(path)
@@ -0,0 +1,276 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+from .admission import AdmissionRejected
+
+logger = logging.getLogger("rag_service.query_cache")
+
+_SPACE_RE = re.compile(r'\s+')
+
+# 查询日志记录的检索方式，预热时按原方式重放，才能命中同一条结果缓存
+QUERY_KINDS = ('search', 'hybrid')
+
+
+def normalize_query(q: str) -> str:
+    """归一化查询文本：全角转半角、去首尾空白、合并连续空白、英文转小写"""
+    return _SPACE_RE.sub(' ', unicodedata.normalize('NFKC', q or '')).strip().lower()
+
+
+class LRUCache:
+    """线程安全的 LRU 缓存，可选 TTL（秒）"""
+
+    def __init__(self, max_items: int, ttl: float = 0):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        with self.lock:
+            entry = self._data.get(key)
+            if entry is None or (self.ttl and entry[0] < time.monotonic()):
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_items <= 0:
+            return
+        with self.lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+
+class QueryCache:
+    """
+    检索缓存：
+    - 查询向量缓存：按归一化查询文本缓存（已投影的）查询向量，与用户无关
+    - 结果缓存：按 (用户, 类别, topK, 归一化查询) 缓存检索结果，
+      同时记录写入时的租户数据版本，版本变化（该用户有入库/删除）即失效
+    """
+
+    def __init__(self, embedding_size: int, result_size: int, result_ttl: float):
+        self.embeddings = LRUCache(embedding_size)
+        self.results = LRUCache(result_size, result_ttl)
+
+    def get_results(self, key: Hashable, version: Hashable) -> Optional[List[Dict]]:
+        entry = self.results.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        # 返回副本，调用方（如混合检索的分数归一化）会修改结果字典
+        return [dict(item) for item in entry[1]]
+
+    def put_results(self, key: Hashable, version: Hashable, results: List[Dict]) -> None:
+        self.results.put(key, (version, [dict(item) for item in results]))
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {'embeddings': self.embeddings.stats(), 'results': self.results.stats()}
+
+
+class QueryLog:
+    """
+    按租户记录归一化查询的频次，区分检索方式（search / hybrid）。
+    请求路径上只在内存中计数，由后台线程定期合并写入 SQLite（每个用户只保留最常见的若干条）。
+    """
+
+    def __init__(self, path: str, max_per_user: int = 500, window_days: float = 7):
+        self.path = path
+        self.max_per_user = max_per_user
+        self.window = window_days * 86400
+        self.lock = threading.Lock()
+        self._pending: Counter = Counter()
+        self._top_k: Dict[tuple, int] = {}
+        self._conn = None
+        self._pid = None
+        self._db_lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_table(conn)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    @staticmethod
+    def _create_table(conn: sqlite3.Connection) -> None:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(query_log)")]
+            if columns and 'kind' not in columns:
+                # 旧表没有 kind 列且主键不含 kind，无法 ALTER，重建后把旧记录视为 search
+                conn.execute("ALTER TABLE query_log RENAME TO query_log_old")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_log ("
+                "user TEXT NOT NULL, query TEXT NOT NULL, category TEXT NOT NULL, kind TEXT NOT NULL, "
+                "top_k INTEGER NOT NULL, hits INTEGER NOT NULL, last_seen REAL NOT NULL, "
+                "PRIMARY KEY (user, query, category, kind)) WITHOUT ROWID"
+            )
+            if columns and 'kind' not in columns:
+                conn.execute(
+                    "INSERT INTO query_log (user, query, category, kind, top_k, hits, last_seen) "
+                    "SELECT user, query, category, 'search', top_k, hits, last_seen FROM query_log_old"
+                )
+                conn.execute("DROP TABLE query_log_old")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def record(self, user: Optional[str], query: str, category: Optional[str], top_k: int,
+               kind: str = 'search') -> None:
+        """kind 为 search（稠密检索）或 hybrid（Qdrant 内混合检索），top_k 为实际传给该检索方法的 topK"""
+        if kind not in QUERY_KINDS:
+            raise ValueError(f"未知的检索方式: {kind}")
+        norm = normalize_query(query)
+        if not norm:
+            return
+        key = (user or '', norm, category or '', kind)
+        with self.lock:
+            self._pending[key] += 1
+            self._top_k[key] = max(top_k, self._top_k.get(key, 0))
+
+    def flush(self) -> int:
+        """把内存中的计数合并写入磁盘，返回写入的条数"""
+        with self.lock:
+            pending, top_k = self._pending, self._top_k
+            self._pending, self._top_k = Counter(), {}
+        if not pending:
+            return 0
+        now = time.time()
+        rows = [(u, q, c, kind, top_k[(u, q, c, kind)], n, now) for (u, q, c, kind), n in pending.items()]
+        with self._db_lock:
+            db = self._db()
+            db.execute("BEGIN")
+            db.executemany(
+                "INSERT INTO query_log (user, query, category, kind, top_k, hits, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (user, query, category, kind) DO UPDATE SET "
+                "hits = hits + excluded.hits, last_seen = excluded.last_seen, top_k = max(top_k, excluded.top_k)",
+                rows
+            )
+            db.execute("DELETE FROM query_log WHERE last_seen < ?", (now - self.window,))
+            for user in {r[0] for r in rows}:
+                # 每个用户只保留频次最高的 max_per_user 条
+                db.execute(
+                    "DELETE FROM query_log WHERE user = ? AND (query, category, kind) NOT IN ("
+                    "SELECT query, category, kind FROM query_log WHERE user = ? ORDER BY hits DESC LIMIT ?)",
+                    (user, user, self.max_per_user)
+                )
+            db.execute("COMMIT")
+        return len(rows)
+
+    def top(self, limit: int) -> List[Dict[str, Any]]:
+        """跨租户取频次最高的查询"""
+        with self._db_lock:
+            rows = self._db().execute(
+                "SELECT user, query, category, kind, top_k, hits FROM query_log "
+                "WHERE last_seen >= ? ORDER BY hits DESC LIMIT ?",
+                (time.time() - self.window, limit)
+            ).fetchall()
+        return [
+            {'user': u or None, 'query': q, 'category': c or None, 'kind': kind, 'topK': k, 'hits': n}
+            for u, q, c, kind, k, n in rows
+        ]
+
+
+class QueryWarmer:
+    """
+    后台预热：启动时及之后每隔 interval 秒，取查询日志中最常见的 top_n 个查询，
+    以低优先级（预热通道：专用令牌桶，不消耗租户的检索/入库配额）重新执行检索，填充查询向量缓存与结果缓存。
+    检索仍以日志中的用户和检索方式执行（hybrid 与 /rag/hybrid-search 一样调用 hybrid_search），
+    结果缓存按该租户的数据版本存放。
+    """
+
+    def __init__(self, store, query_log: QueryLog, top_n: int, interval: float,
+                 flush_interval: float, pause: float = 0.05):
+        self.store = store
+        self.query_log = query_log
+        self.top_n = top_n
+        self.interval = interval
+        self.flush_interval = flush_interval
+        self.pause = pause
+        self.last_run: Dict[str, Any] = {}
+        self._thread = None
+
+    def warm(self) -> Dict[str, Any]:
+        start = time.time()
+        done = skipped = 0
+        for entry in self.query_log.top(self.top_n):
+            try:
+                if self._replay(entry):
+                    done += 1
+                else:
+                    skipped += 1
+            except AdmissionRejected as e:
+                # 限流时让出配额给在线请求
+                skipped += 1
+                time.sleep(min(e.retry_after, 5.0))
+            except Exception as e:
+                skipped += 1
+                logger.warning(f"预热查询失败: {e}")
+            time.sleep(self.pause)
+        self.last_run = {'warmed': done, 'skipped': skipped, 'seconds': round(time.time() - start, 2),
+                         'finishedAt': time.time()}
+        logger.info(f"预热完成: {self.last_run}")
+        return self.last_run
+
+    def _replay(self, entry: Dict[str, Any]) -> bool:
+        """按接口的调用参数重放，保证结果缓存键与在线请求一致；无法重放时返回 False"""
+        if entry['kind'] == 'hybrid':
+            if not self.store.hybrid_ready:
+                # 集合已不支持服务端混合检索，接口会退回稠密检索 + MySQL，只有稠密检索有结果缓存
+                return False
+            self.store.hybrid_search(entry['query'], topK=entry['topK'], category=entry['category'],
+                                     user=entry['user'], candidates=max(entry['topK'] * 2, entry['topK']),
+                                     lane='warmup')
+            return True
+        self.store.search(entry['query'], topK=entry['topK'], category=entry['category'],
+                          user=entry['user'], lane='warmup')
+        return True
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+
+        def _loop():
+            try:
+                self.warm()
+            except Exception as e:
+                logger.warning(f"预热失败: {e}")
+            next_warm = time.time() + self.interval if self.interval > 0 else None
+            while True:
+                time.sleep(self.flush_interval)
+                try:
+                    self.query_log.flush()
+                except Exception as e:
+                    logger.warning(f"查询日志写入失败: {e}")
+                if next_warm is not None and time.time() >= next_warm:
+                    try:
+                        self.warm()
+                    except Exception as e:
+                        logger.warning(f"预热失败: {e}")
+                    next_warm = time.time() + self.interval
+
+        self._thread = threading.Thread(target=_loop, name="query-warmer", daemon=True)
+        self._thread.start()
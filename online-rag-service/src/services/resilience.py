@@ -0,0 +1,231 @@
+import inspect
+import random
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class EmbeddingUnavailable(Exception):
+    """嵌入服务不可用（熔断、超时、并发已满或重试耗尽），应返回 503"""
+
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"嵌入服务不可用: {reason}")
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败 failure_threshold 次后打开，reset_timeout 秒内直接失败；
+    之后进入半开状态，只放行一个探测请求，成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._probe_owner = None
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._probing = False
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                self._probe_owner = threading.get_ident()
+                return True
+            return False
+
+    def abandon_probe(self) -> None:
+        """本线程的探测请求未能发出（如在途调用已满），释放探测名额，既不算成功也不算失败"""
+        with self.lock:
+            if self.state == 'half_open' and self._probing and self._probe_owner == threading.get_ident():
+                self._probing = False
+                self._probe_owner = None
+
+    def retry_after(self) -> float:
+        with self.lock:
+            if self.state != 'open':
+                return 1.0
+            return max(1.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    print(f"[Resilience] 嵌入服务熔断打开，连续失败 {self.failures} 次")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+
+class ResilientEmbedder:
+    """
+    嵌入服务容错层，与 Embedder 接口一致（dimension / encode），另提供 encode_query：
+    - 每次调用在独立线程池中执行并设置截止时间；在途调用数有上限，满了直接失败，
+      避免服务端故障时请求线程全部堆积在嵌入调用上
+    - 失败后按带抖动的指数退避重试
+    - 查询嵌入（单条、对延迟敏感）在等待超过近期 p95 延迟后发出对冲请求，取先返回的结果
+    - 熔断器打开时直接失败；查询嵌入可选退回本地嵌入模型
+    """
+
+    def __init__(self, primary, config: Dict, fallback=None):
+        self.primary = primary
+        self.config = config
+        self.breaker = CircuitBreaker(config['breaker_failures'], config['breaker_reset'])
+        self.executor = ThreadPoolExecutor(max_workers=config['max_in_flight'], thread_name_prefix='embed-call')
+        self._slots = threading.BoundedSemaphore(config['max_in_flight'])
+        # 主模型支持按调用设置 HTTP 超时时，把截止时间传下去，超时的调用会尽快释放在途名额
+        self._pass_timeout = 'timeout' in inspect.signature(primary.encode).parameters
+        self._latencies = deque(maxlen=256)
+        self._latency_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.counters: Counter = Counter()
+        self.fallback = fallback
+        if fallback is not None and fallback.dimension() != primary.dimension():
+            # 维度不同无法检索同一集合，直接停用
+            print(f"[Resilience] 本地嵌入模型维度 {fallback.dimension()} 与主模型 {primary.dimension()} 不一致，已停用降级")
+            self.fallback = None
+
+    @property
+    def model_name(self) -> Optional[str]:
+        return getattr(self.primary, 'model_name', None)
+
+    def dimension(self) -> int:
+        return self.primary.dimension()
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self.stats_lock:
+            self.counters[key] += n
+
+    def hedge_delay(self) -> float:
+        """对冲延迟：近期查询嵌入延迟的 p95，不低于配置的最小值"""
+        with self._latency_lock:
+            samples = list(self._latencies)
+        if len(samples) < 20:
+            return max(self.config['hedge_min_delay'], self.config['query_timeout'] / 2)
+        return max(self.config['hedge_min_delay'], float(np.percentile(samples, self.config['hedge_percentile'])))
+
+    def _timed_encode(self, texts: List[str], record: bool, timeout: float):
+        start = time.monotonic()
+        vecs = self.primary.encode(texts, timeout=timeout) if self._pass_timeout else self.primary.encode(texts)
+        if record:
+            with self._latency_lock:
+                self._latencies.append(time.monotonic() - start)
+        return vecs
+
+    def _submit(self, texts: List[str], record: bool, timeout: float):
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected_in_flight')
+            raise EmbeddingUnavailable('too_many_in_flight')
+        future = self.executor.submit(self._timed_encode, texts, record, timeout)
+        future.add_done_callback(lambda _f: self._slots.release())
+        return future
+
+    def _attempt(self, texts: List[str], deadline: float, hedge: bool):
+        """单次尝试（可能包含一个对冲请求），超过整次调用的截止时间抛出 TimeoutError"""
+        timeout = max(deadline - time.monotonic(), 0.01)
+        first = self._submit(texts, record=hedge, timeout=timeout)
+        pending = {first}
+        if hedge:
+            done, _ = wait(pending, timeout=min(self.hedge_delay(), timeout))
+            if not done:
+                try:
+                    pending.add(self._submit(texts, record=True, timeout=max(deadline - time.monotonic(), 0.1)))
+                    self._count('hedged')
+                except EmbeddingUnavailable:
+                    pass
+        last_error = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        self._count('hedge_wins')
+                    return future.result()
+                last_error = future.exception()
+        if last_error is not None and not pending:
+            raise last_error
+        # 超时的调用无法取消，会在后台执行完后释放在途名额
+        self._count('timeouts')
+        raise TimeoutError(f"嵌入调用超过 {timeout:.2f}s 未返回")
+
+    def _call(self, texts: List[str], timeout: float, hedge: bool):
+        # timeout 是整次调用（含全部重试、对冲与退避）的预算，每次尝试只能使用剩余部分
+        deadline = time.monotonic() + timeout
+        last_error = None
+        for attempt in range(self.config['retries'] + 1):
+            if deadline - time.monotonic() <= 0:
+                break
+            if not self.breaker.allow():
+                self._count('short_circuited')
+                raise EmbeddingUnavailable('circuit_open', self.breaker.retry_after())
+            try:
+                vecs = self._attempt(texts, deadline, hedge)
+            except EmbeddingUnavailable:
+                # 请求没有发出，不能据此判断服务是否恢复；半开状态下必须释放探测名额，
+                # 否则熔断器会一直停在半开状态、拒绝所有后续调用
+                self.breaker.abandon_probe()
+                raise
+            except Exception as e:
+                last_error = e
+                self._count('failures')
+                self.breaker.record_failure()
+                remaining = deadline - time.monotonic()
+                if attempt < self.config['retries'] and remaining > 0:
+                    self._count('retries')
+                    # 全抖动退避，避免大量请求同时重试；退避不超过剩余预算
+                    backoff = random.uniform(0, min(self.config['backoff_max'], self.config['backoff_base'] * 2 ** attempt))
+                    time.sleep(min(backoff, remaining))
+                continue
+            self.breaker.record_success()
+            return vecs
+        print(f"[Resilience] 嵌入调用重试耗尽: {last_error}")
+        raise EmbeddingUnavailable('provider_failed', self.breaker.retry_after()) from last_error
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """批量嵌入（入库用）：截止时间 + 重试，不对冲，也不降级到本地模型（避免把异构向量写入集合）"""
+        self._count('calls')
+        return self._call(texts, self.config['timeout'], hedge=False)
+
+    def encode_query(self, texts: List[str]) -> np.ndarray:
+        """查询嵌入：较短的截止时间 + 对冲请求，主服务不可用时可退回本地模型"""
+        self._count('query_calls')
+        try:
+            return self._call(texts, self.config['query_timeout'], hedge=self.config['hedge'])
+        except EmbeddingUnavailable:
+            if self.fallback is None:
+                raise
+            self._count('fallbacks')
+            return self.fallback.encode(texts)
+
+    def stats(self) -> Dict:
+        with self.stats_lock:
+            counters = dict(self.counters)
+        return {
+            'breaker': self.breaker.state,
+            'hedge_delay_ms': round(self.hedge_delay() * 1000, 1),
+            'fallback': self.fallback is not None,
+            **counters,
+        }
@@ -0,0 +1,56 @@
+import datetime
+import decimal
+import json
+from typing import Any
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时退回标准库 json
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    # orjson 原生支持 datetime / numpy，这里只处理其余少见类型（如 MySQL 的 Decimal、bytes）
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime.date, datetime.datetime, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, bytes):
+        return obj.decode('utf-8', errors='replace')
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"无法序列化类型: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(content, ensure_ascii=False, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONResponse(Response):
+    """
+    直接序列化为 JSON 的响应。
+    接口函数返回该对象时，FastAPI 会跳过 response_model 校验和 jsonable_encoder，
+    对刚生成的结果不再做一遍通用的校验与编码。
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def ok(data: Any = None, **extra) -> FastJSONResponse:
+    """统一成功响应：{"code": 0, "message": "OK", ..., "data": data}"""
+    return FastJSONResponse({"code": 0, "message": "OK", **extra, "data": data})
+
+
+def slim(items, limit: int):
+    """截取前 limit 条结果，并去掉融合排序用的内部字段（以下划线开头）"""
+    return [{k: v for k, v in item.items() if not k.startswith('_')} for item in items[:limit]]
@@ -0,0 +1,72 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+
+class SharedCache:
+    """
+    多 worker 进程共享的磁盘缓存层（SQLite WAL 模式）。
+    用于必须在所有 worker 间保持一致的少量状态，例如后台操作状态、租户计数的修改代数。
+    每个进程、每个线程各自持有连接，进程 fork 后首次使用时重新打开。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str, default: Any = None) -> Any:
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM kv WHERE key=?", (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return default
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        self._conn().execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False, default=str), expires_at)
+        )
+
+    def incr(self, key: str, delta: int = 1) -> int:
+        """原子自增并返回新值"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM kv WHERE key=?", (key,)).fetchone()
+            value = (json.loads(row[0]) if row else 0) + delta
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, NULL)",
+                (key, json.dumps(value))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM kv WHERE key=?", (key,))
+
+    def purge_expired(self) -> None:
+        self._conn().execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
@@ -0,0 +1,242 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from collections import Counter
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client.http.models import PointStruct
+
+from .vector_store import VectorStore, DOC_NAMESPACE, make_doc_id, dense_vector
+
+# 快照目录结构：
+#   manifest.json    元信息（用户、维度、点数、模型与投影指纹）
+#   vectors.f32      float32 原始数组，按行存放，形状为 (count, dim)
+#   payload.json.gz  gzip 压缩的 JSON Lines，每行一个点 {"id": 点ID, "payload": 载荷}，行序与 vectors.f32 一致
+# 格式 1 的载荷是整体列式 JSON，仍可导入，但需要一次性载入内存
+SNAPSHOT_FORMAT = 2
+_READABLE_FORMATS = (1, SNAPSHOT_FORMAT)
+MANIFEST_FILE = 'manifest.json'
+VECTORS_FILE = 'vectors.f32'
+PAYLOAD_FILE = 'payload.json.gz'
+
+_NAME_RE = re.compile(r'^[A-Za-z0-9_.\-]{1,128}$')
+_UNSAFE_RE = re.compile(r'[^A-Za-z0-9_\-]+')
+
+
+class SnapshotError(Exception):
+    """快照不存在、格式不符或与当前向量库不兼容"""
+
+
+def snapshot_path(root: str, name: str) -> str:
+    """快照名只允许字母数字与 _ . -，避免通过接口访问快照目录以外的路径"""
+    if not _NAME_RE.match(name or '') or name in ('.', '..'):
+        raise SnapshotError(f"非法的快照名: {name}")
+    return os.path.join(root, name)
+
+
+def default_snapshot_name(user: str) -> str:
+    """
+    默认快照名：用户_时间戳。用户ID含中文、邮箱等不允许的字符时，
+    替换为 - 并附加用户ID哈希，保证名称合法且不同用户不会撞名。
+    """
+    slug = _UNSAFE_RE.sub('-', user).strip('-')[:64]
+    if slug != user:
+        slug = f"{slug or 'user'}-{hashlib.sha1(user.encode('utf-8')).hexdigest()[:10]}"
+    return f"{slug}_{time.strftime('%Y%m%d%H%M%S')}"
+
+
+def projection_fingerprint(projection) -> Optional[str]:
+    if projection is None:
+        return None
+    digest = hashlib.sha1(projection.matrix.tobytes())
+    digest.update(projection.mean.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _decode_column(column: Dict[str, Any]) -> List[Any]:
+    if 'dict' in column:
+        dictionary = column['dict']
+        return [dictionary[c] for c in column['codes']]
+    return column['values']
+
+
+def export_tenant(store: VectorStore, user: str, directory: str, batch: int = 512) -> Dict[str, Any]:
+    """
+    导出某用户的全部向量与载荷。
+    先写入临时目录，完成后整体替换目标目录，中途失败不会留下半个快照。
+    """
+    tmp = directory.rstrip('/\\') + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    start = time.time()
+    count = 0
+    dim = None
+    try:
+        # 向量与载荷按批同步写出，内存占用只与 batch 有关
+        with open(os.path.join(tmp, VECTORS_FILE), 'wb') as vf, \
+                gzip.open(os.path.join(tmp, PAYLOAD_FILE), 'wt', encoding='utf-8') as pf:
+            for records in store.scroll_tenant(user, batch=batch):
+                vecs = np.asarray([dense_vector(r.vector) for r in records], dtype='<f4')
+                if dim is None:
+                    dim = vecs.shape[1]
+                vf.write(vecs.tobytes())
+                for r in records:
+                    pf.write(json.dumps({'id': r.id, 'payload': r.payload or {}}, ensure_ascii=False, separators=(',', ':')))
+                    pf.write('\n')
+                count += len(records)
+
+        manifest = {
+            'format': SNAPSHOT_FORMAT,
+            'user': user,
+            'count': count,
+            'dim': dim if dim is not None else store.vector_dimension(),
+            'dtype': 'float32',
+            'model': getattr(store.embedder, 'model_name', None),
+            'projection': projection_fingerprint(store.projection),
+            'collection': store.shard_for(user).collection_name,
+            'createdAt': time.time(),
+        }
+        with open(os.path.join(tmp, MANIFEST_FILE), 'w', encoding='utf-8') as mf:
+            json.dump(manifest, mf, ensure_ascii=False, indent=2)
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp, directory)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    print(f"[Snapshot] 已导出用户 {user} 的 {count} 个点到 {directory}，耗时 {time.time() - start:.2f}s")
+    return manifest
+
+
+def read_manifest(directory: str) -> Dict[str, Any]:
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise SnapshotError(f"快照不存在: {directory}")
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') not in _READABLE_FORMATS:
+        raise SnapshotError(f"不支持的快照格式: {manifest.get('format')}")
+    return manifest
+
+
+def _check_compatible(store: VectorStore, manifest: Dict[str, Any]) -> None:
+    # 向量不会重新计算，必须与当前集合处于同一向量空间
+    if manifest['dim'] != store.vector_dimension():
+        raise SnapshotError(f"快照向量维度 {manifest['dim']} 与当前集合维度 {store.vector_dimension()} 不一致")
+    if manifest.get('projection') != projection_fingerprint(store.projection):
+        raise SnapshotError("快照与当前向量库使用的降维投影不一致")
+    model = getattr(store.embedder, 'model_name', None)
+    if manifest.get('model') and model and manifest['model'] != model:
+        raise SnapshotError(f"快照嵌入模型 {manifest['model']} 与当前模型 {model} 不一致")
+
+
+def _iter_payload_rows(directory: str, fmt: int) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+    """按 vectors.f32 的行序逐个产出 (点ID, 载荷)"""
+    with gzip.open(os.path.join(directory, PAYLOAD_FILE), 'rt', encoding='utf-8') as pf:
+        if fmt == 1:
+            data = json.load(pf)
+            columns = {k: _decode_column(col) for k, col in data['columns'].items()}
+            for i, pid in enumerate(data['ids']):
+                yield pid, {k: values[i] for k, values in columns.items() if values[i] is not None}
+            return
+        for line in pf:
+            if line.strip():
+                row = json.loads(line)
+                yield row['id'], row['payload']
+
+
+def _remap_ids(ids: List[Any], payloads: List[Dict[str, Any]], user: str, occurrences: Counter) -> List[Any]:
+    """
+    导入到其他用户时重新生成点ID与 doc_id，避免与源用户的点冲突，
+    并保证之后按该用户增量入库同一文档时能识别出未变化的分片。
+    occurrences 跨批次累计同一文档内相同内容分片的出现次数。
+    """
+    new_ids = []
+    for pid, payload in zip(ids, payloads):
+        title = payload.get('title')
+        h = payload.get('chunk_hash')
+        if title is not None and h:
+            doc_id = make_doc_id(user, title)
+            n = occurrences[(doc_id, h)]
+            occurrences[(doc_id, h)] += 1
+            payload['doc_id'] = doc_id
+            new_ids.append(str(uuid.uuid5(uuid.UUID(doc_id), f"{h}:{n}")))
+        else:
+            # 旧版本入库的整数ID分片没有内容哈希，按原ID派生
+            new_ids.append(str(uuid.uuid5(DOC_NAMESPACE, f"{user}\x1f{pid}")))
+    return new_ids
+
+
+def import_tenant(store: VectorStore, directory: str, user: Optional[str] = None,
+                  replace: bool = False, force: bool = False, batch: int = 256) -> Dict[str, Any]:
+    """
+    把快照直接写回向量库，不调用嵌入模型。
+    user 为空时导入到快照的原用户，否则克隆到指定用户；
+    replace=True 时先清空目标用户的数据，否则按点ID覆盖写入。
+    force=True 时跳过模型/投影一致性检查（维度仍必须一致）。
+    """
+    start = time.time()
+    manifest = read_manifest(directory)
+    if force:
+        if manifest['dim'] != store.vector_dimension():
+            raise SnapshotError(f"快照向量维度 {manifest['dim']} 与当前集合维度 {store.vector_dimension()} 不一致")
+    else:
+        _check_compatible(store, manifest)
+
+    source_user = manifest['user']
+    target_user = user or source_user
+    count, dim = manifest['count'], manifest['dim']
+
+    vec_path = os.path.join(directory, VECTORS_FILE)
+    if os.path.getsize(vec_path) != count * dim * 4:
+        raise SnapshotError("向量文件大小与快照元信息不一致")
+    vectors = np.memmap(vec_path, dtype='<f4', mode='r', shape=(count, dim)) if count else np.zeros((0, dim), dtype='<f4')
+
+    # 载荷与向量按同样的批次读取，内存占用只与 batch 有关（格式 1 的列式载荷除外）
+    rows = _iter_payload_rows(directory, manifest['format'])
+    occurrences: Counter = Counter()
+    removed = store.clear_user(target_user) if replace else 0
+    try:
+        for i in range(0, count, batch):
+            chunk = list(islice(rows, batch))
+            end = i + len(chunk)
+            if end != min(i + batch, count):
+                raise SnapshotError(f"载荷行数 {end} 与快照元信息的点数 {count} 不一致")
+            ids = [pid for pid, _ in chunk]
+            payloads = [payload for _, payload in chunk]
+            for payload in payloads:
+                payload['user'] = target_user
+            if target_user != source_user:
+                ids = _remap_ids(ids, payloads, target_user, occurrences)
+            points = [
+                # 稀疏向量不导出，按内容重新计算（不调用嵌入模型）
+                PointStruct(id=pid, vector=store.point_vector(np.asarray(vec, dtype='float32'),
+                                                              payload.get('content'), target_user),
+                            payload=payload)
+                for pid, payload, vec in zip(ids, payloads, vectors[i:end])
+            ]
+            store.write_points(points, target_user)
+        if next(rows, None) is not None:
+            raise SnapshotError(f"载荷行数多于快照元信息的点数 {count}")
+    finally:
+        rows.close()
+        # 中途失败时已写入的部分点同样计入计数
+        store.refresh_tenant_counts(target_user)
+
+    result = {
+        'user': target_user,
+        'sourceUser': source_user,
+        'imported': count,
+        'removed': removed,
+        'seconds': round(time.time() - start, 3),
+    }
+    print(f"[Snapshot] 已从 {directory} 导入 {count} 个点到用户 {target_user}，耗时 {result['seconds']}s")
+    return result
@@ -0,0 +1,62 @@
+import re
+import unicodedata
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional
+
+from qdrant_client.http.models import SparseVector
+
+# 集合中稀疏向量的名称（稠密向量仍为默认的无名向量）
+SPARSE_VECTOR = 'text'
+
+# 英文/数字按词切分，中文按相邻两字切分（单字的中文片段保留单字）
+_TOKEN_RE = re.compile(r'[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff]+')
+_CJK_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff]')
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for run in _TOKEN_RE.findall(unicodedata.normalize('NFKC', text or '').lower()):
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def term_id(term: str) -> int:
+    """词项哈希为 32 位ID，不需要维护词表；偶发的哈希冲突只会让两个词共用权重"""
+    return zlib.crc32(term.encode('utf-8'))
+
+
+class SparseEncoder:
+    """
+    生成 BM25 风格的稀疏词项向量：
+    文档侧为饱和后的词频权重 tf*(k1+1)/(tf+k1*(1-b+b*len/avg_len))，
+    IDF 由 Qdrant 按集合统计在服务端计算（稀疏向量配置 modifier=IDF）；
+    查询侧每个词项权重为 1。
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, avg_len: float = 256):
+        self.k1 = k1
+        self.b = b
+        self.avg_len = avg_len
+
+    @staticmethod
+    def _to_vector(weights: Dict[int, float]) -> Optional[SparseVector]:
+        if not weights:
+            return None
+        indices = sorted(weights)
+        return SparseVector(indices=indices, values=[float(weights[i]) for i in indices])
+
+    def encode_document(self, text: str) -> Optional[SparseVector]:
+        tokens = tokenize(text)
+        tf = Counter(term_id(t) for t in tokens)
+        norm = self.k1 * (1 - self.b + self.b * len(tokens) / self.avg_len)
+        return self._to_vector({tid: n * (self.k1 + 1) / (n + norm) for tid, n in tf.items()})
+
+    def encode_query(self, text: str) -> Optional[SparseVector]:
+        return self._to_vector({term_id(t): 1.0 for t in tokenize(text)})
@@ -1,49 +1,331 @@
+import hashlib
 import json
+import logging
 import os
 import threading
 import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional
 
 import numpy as np
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import PointStruct, SearchRequest, Filter, FieldCondition, MatchValue
+from qdrant_client.http.models import PointStruct, Filter, FieldCondition, MatchValue, MatchAny, PointIdsList, FilterSelector, PayloadSchemaType
+from qdrant_client.http.models import VectorParams, SparseVectorParams, Modifier, Prefetch, FusionQuery, Fusion, PointVectors
 
 # 导入配置
 from config import QDRANT_CONFIG
 
+from .counters import TenantCounters
+from .query_cache import normalize_query
+from .sparse import SPARSE_VECTOR
+
+logger = logging.getLogger("rag_service.vector_store")
+
+
+# 文档ID命名空间：同一用户下同一标题的文档始终映射到同一个 doc_id
+DOC_NAMESPACE = uuid.UUID('6f1c2a3e-9b7d-4c5e-8a1f-2d3b4c5e6f70')
+
+# 需要建立载荷索引的字段（过滤/删除/对账都按这些字段筛选）
+PAYLOAD_INDEX_FIELDS = ('user', 'category', 'title', 'doc_id')
+
+# 文档级锁的条带数量（按 doc_id 哈希分桶，不同文档可并发入库）
+DOC_LOCK_STRIPES = 64
+
+
+class _SerializedClient:
+    """
+    本地模式（内存/本地目录）的 QdrantClient 不是线程安全的，
+    这里用一把锁串行化所有调用；连接 Qdrant 服务时不使用。
+    """
+
+    def __init__(self, client: QdrantClient):
+        self._client = client
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def _call(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return _call
+
+
+class _Shard:
+    """一个分片：所在节点的客户端 + 集合名"""
+
+    def __init__(self, index: int, client, collection_name: str, host: str):
+        self.index = index
+        self.client = client
+        self.collection_name = collection_name
+        self.host = host
+        # 集合是否配置了稀疏向量（预热时检查）
+        self.sparse = False
+
+
+def shard_index(user: Optional[str], shard_count: int) -> int:
+    """按用户哈希选择分片；同一用户的数据始终落在同一分片（无用户的数据按空字符串路由）"""
+    if shard_count <= 1:
+        return 0
+    return zlib.crc32((user or '').encode('utf-8')) % shard_count
+
+
+def shard_collection_name(base_name: str, index: int, shard_count: int) -> str:
+    """分片集合名：单分片时沿用基础集合名，多分片时为 {base}_s{i}"""
+    return base_name if shard_count <= 1 else f"{base_name}_s{index}"
+
+
+def dense_vector(vector) -> List[float]:
+    """从读取到的点向量中取出稠密向量（配置了稀疏向量的集合返回 {'': 稠密, 'text': 稀疏}）"""
+    return vector.get('') if isinstance(vector, dict) else vector
+
+
+def make_doc_id(user: Optional[str], title: str) -> str:
+    """根据用户和标题生成稳定的文档ID"""
+    return str(uuid.uuid5(DOC_NAMESPACE, f"{user or ''}\x1f{title}"))
+
+
+def chunk_hash(text: str) -> str:
+    """计算分片内容哈希，用于判断分片是否发生变化"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
 
 class VectorStore:
-    def __init__(self, embedder, user_id: Optional[str] = None):
+    def __init__(self, embedder, user_id: Optional[str] = None, client: Optional[QdrantClient] = None,
+                 shared_cache=None, admission=None, projection=None, query_cache=None, sparse=None,
+                 planner=None):
         self.embedder = embedder
         self.lock = threading.Lock()
+        self._doc_locks = [threading.Lock() for _ in range(DOC_LOCK_STRIPES)]
+        # 按用户/类别维护的文档数与分片数
+        self.counters = TenantCounters()
+        self._reconciler = None
+        # 多 worker 部署时，通过共享缓存中的修改代数感知其他 worker 的写入
+        self.shared_cache = shared_cache
+        self._seen_counter_gen: Dict[str, int] = {}
+        # 嵌入调用的准入控制（限流、优先级通道），为 None 时不限制
+        self.admission = admission
+        # 可选的降维投影：入库向量与查询向量都先投影再写入/检索
+        self.projection = projection
+        # 可选的查询向量缓存与检索结果缓存
+        self.query_cache = query_cache
+        # 不限定用户的删除会影响所有用户，用全局代数使所有结果缓存失效
+        self._global_epoch = 0
+        # 可选的稀疏词项向量编码器：启用后入库时同时写入稀疏向量，混合检索在 Qdrant 内完成融合
+        self.sparse = sparse
+        # 可选的检索计划器：按过滤后的候选数量在精确检索与 HNSW 之间选择
+        self.planner = planner
         # 保留user_id参数以便在元数据中使用，但不再用于集合命名
         self.user_id = user_id
         
-        # 使用Qdrant服务
-        self.client = QdrantClient(
-            host=QDRANT_CONFIG['host'],
-            port=QDRANT_CONFIG['port']
-        )
-        
-        # 所有用户共享同一个集合
-        self.collection_name = QDRANT_CONFIG.get('collection_name', 'knowledge_base')
-        print(f"[VectorStore] 使用共享集合: {self.collection_name}")
+        # 分片：单分片时沿用原集合名；多分片时为 {base}_s{i}，可分布在多个 Qdrant 节点上
+        base_name = QDRANT_CONFIG.get('collection_name', 'knowledge_base')
+        shard_count = max(1, int(QDRANT_CONFIG.get('shards', 1)))
+        self.shards: List[_Shard] = []
+        clients = {}
+        for i in range(shard_count):
+            name = shard_collection_name(base_name, i, shard_count)
+            if client is not None:
+                host, shard_client = 'custom', client
+            elif QDRANT_CONFIG.get('location'):
+                # 本地模式（内存或本地目录），用于离线开发与基准测试；所有分片共用一个本地客户端
+                host = QDRANT_CONFIG['location']
+                if host not in clients:
+                    local = QdrantClient(location=host) if host == ':memory:' else QdrantClient(path=host)
+                    clients[host] = _SerializedClient(local)
+                shard_client = clients[host]
+            else:
+                hosts = QDRANT_CONFIG.get('shard_hosts') or [f"{QDRANT_CONFIG['host']}:{QDRANT_CONFIG['port']}"]
+                host = hosts[i % len(hosts)]
+                if host not in clients:
+                    # 使用Qdrant服务
+                    # 跳过构造时的版本检查，避免 Qdrant 不可用时阻塞启动
+                    hostname, _, port = host.rpartition(':')
+                    clients[host] = QdrantClient(host=hostname, port=int(port), check_compatibility=False)
+                shard_client = clients[host]
+            self.shards.append(_Shard(i, shard_client, name, host))
+
+        # 不限定用户的检索/计数/删除需要访问全部分片，用线程池并发执行
+        self._fanout = ThreadPoolExecutor(max_workers=min(shard_count, 16), thread_name_prefix='shard-fanout') \
+            if shard_count > 1 else None
+
+        if shard_count == 1:
+            # 所有用户共享同一个集合
+            logger.info(f"使用共享集合: {self.collection_name}")
+        else:
+            logger.info(f"使用 {shard_count} 个分片集合: {', '.join(f'{s.collection_name}@{s.host}' for s in self.shards)}")
         
-        # 确保集合存在
-        self._ensure_collection()
+        # 构造函数不做任何网络调用；集合检查、载荷索引、计数预热都在 warm_up() 中完成
+        self.ready = False
+
+    # 单分片时 client / collection_name 即唯一的分片；多分片时指向 0 号分片，
+    # 需要覆盖全部数据的操作应遍历 self.shards
+    @property
+    def client(self):
+        return self.shards[0].client
+
+    @property
+    def collection_name(self) -> str:
+        return self.shards[0].collection_name
+
+    @collection_name.setter
+    def collection_name(self, name: str) -> None:
+        self.shards[0].collection_name = name
+
+    def use_collection(self, base_name: str) -> None:
+        """改用另一个基础集合名，各分片按与构造时相同的规则命名（分片数量与所在节点不变）"""
+        for shard in self.shards:
+            shard.collection_name = shard_collection_name(base_name, shard.index, len(self.shards))
+
+    def shard_for(self, user: Optional[str]) -> _Shard:
+        return self.shards[shard_index(user, len(self.shards))]
+
+    def _target_shards(self, user: Optional[str]) -> List[_Shard]:
+        """限定用户的操作只访问该用户所在分片，否则访问全部分片"""
+        return [self.shard_for(user)] if user else self.shards
 
+    def _map_shards(self, fn, shards: List[_Shard]) -> List[Any]:
+        """在多个分片上执行 fn(shard)，多于一个分片时并发执行，结果按分片顺序返回"""
+        if len(shards) == 1 or self._fanout is None:
+            return [fn(shard) for shard in shards]
+        return list(self._fanout.map(fn, shards))
 
-    def _ensure_collection(self):
+
+    def _encode(self, texts: List[str], user: Optional[str], lane: str) -> np.ndarray:
+        """经过准入控制后调用嵌入模型；被拒绝时抛出 AdmissionRejected"""
+        # 交互检索优先走查询嵌入路径（更短的截止时间、对冲请求、可降级）
+        encode = self.embedder.encode
+        if lane == 'interactive' and hasattr(self.embedder, 'encode_query'):
+            encode = self.embedder.encode_query
+        if self.admission is None:
+            vecs = np.asarray(encode(texts), dtype='float32')
+        else:
+            # 令牌桶不允许欠账：超过单次上限的批量按上限拆分；第一批被限流时直接拒绝，
+            # 之后的批次限流时按补充速率等待，避免已嵌入的部分白白作废
+            batch = self.admission.max_batch(lane) or len(texts) or 1
+            parts = []
+            for start in range(0, max(len(texts), 1), batch):
+                chunk = texts[start:start + batch]
+                max_wait = self.admission.bulk_pace_wait if start else 0.0
+                with self.admission.admit(user, lane=lane, cost=len(chunk), max_wait=max_wait):
+                    parts.append(np.asarray(encode(chunk), dtype='float32'))
+            vecs = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        if self.projection is not None:
+            vecs = self.projection.apply(vecs)
+        return vecs
+
+    def vector_dimension(self) -> int:
+        """集合中存储的向量维度（启用投影时为投影后的维度）"""
+        if self.projection is not None:
+            return self.projection.target_dim
+        return self.embedder.dimension()
+
+    def _ensure_collection(self, shard: _Shard):
         # 创建集合（如果不存在）
-        try:
-            self.client.create_collection(
-                collection_name=self.collection_name,
-                vectors_config={"size": self.embedder.dimension(), "distance": "Cosine"}
-            )
-            print(f"[VectorStore] 已创建集合: {self.collection_name}")
-        except Exception as e:
-            # 集合可能已存在
-            print(f"[VectorStore] 集合 {self.collection_name} 可能已存在或创建失败: {str(e)}")
+        if shard.client.collection_exists(collection_name=shard.collection_name):
+            logger.debug(f"集合已存在: {shard.collection_name}")
+            params = shard.client.get_collection(collection_name=shard.collection_name).config.params
+            # 配置了命名向量时取默认（未命名）的稠密向量
+            vectors = params.vectors.get('') if isinstance(params.vectors, dict) else params.vectors
+            if vectors is not None and vectors.size != self.vector_dimension():
+                raise ValueError(
+                    f"集合 {shard.collection_name} 的向量维度为 {vectors.size}，当前配置需要 {self.vector_dimension()}"
+                    f"（{'已启用降维投影' if self.projection is not None else '未启用降维投影'}）；"
+                    f"请检查 RAG_PROJECTION_ENABLED / RAG_PROJECTION_PATH 与 QDRANT_COLLECTION_NAME 是否对应同一集合"
+                )
+            sparse_vectors = params.sparse_vectors
+            shard.sparse = bool(sparse_vectors and SPARSE_VECTOR in sparse_vectors)
+            if self.sparse is not None and not shard.sparse:
+                # Qdrant 不支持给已有集合新增稀疏向量，需要新建集合并重新导入
+                logger.warning(f"集合 {shard.collection_name} 未配置稀疏向量，混合检索将使用 MySQL 关键词检索")
+            return
+        sparse_config = {SPARSE_VECTOR: SparseVectorParams(modifier=Modifier.IDF)} if self.sparse is not None else None
+        shard.client.create_collection(
+            collection_name=shard.collection_name,
+            vectors_config=VectorParams(size=self.vector_dimension(), distance="Cosine"),
+            sparse_vectors_config=sparse_config
+        )
+        shard.sparse = sparse_config is not None
+        logger.info(f"已创建集合: {shard.collection_name}")
+
+    @property
+    def hybrid_ready(self) -> bool:
+        """所有分片都支持稀疏向量时，混合检索可以完全在 Qdrant 内完成"""
+        return self.sparse is not None and all(shard.sparse for shard in self.shards)
+
+    def point_vector(self, dense, content: Optional[str], user: Optional[str]):
+        """构造要写入的点向量：分片支持稀疏向量时同时写入内容的稀疏词项向量"""
+        dense = dense.tolist() if hasattr(dense, 'tolist') else list(dense)
+        if self.sparse is None or not content or not self.shard_for(user).sparse:
+            return dense
+        sparse = self.sparse.encode_document(content)
+        return {'': dense, SPARSE_VECTOR: sparse} if sparse is not None else dense
+
+    def backfill_sparse(self, batch: int = 256) -> int:
+        """为已有的点（按载荷中的 content）补写稀疏向量，不调用嵌入模型；返回处理的点数"""
+        if self.sparse is None:
+            return 0
+        updated = 0
+        for shard in self.shards:
+            if not shard.sparse:
+                continue
+            offset = None
+            while True:
+                records, offset = shard.client.scroll(
+                    collection_name=shard.collection_name,
+                    limit=batch,
+                    offset=offset,
+                    with_payload=['content'],
+                    with_vectors=False
+                )
+                vectors = []
+                for record in records:
+                    sparse = self.sparse.encode_document((record.payload or {}).get('content') or '')
+                    if sparse is not None:
+                        vectors.append(PointVectors(id=record.id, vector={SPARSE_VECTOR: sparse}))
+                if vectors:
+                    shard.client.update_vectors(collection_name=shard.collection_name, points=vectors)
+                    updated += len(vectors)
+                if offset is None:
+                    break
+        logger.info(f"稀疏向量补写完成: {updated} 个点")
+        return updated
+
+    def _ensure_payload_indexes(self, shard: _Shard):
+        # 为常用过滤字段建立 keyword 索引，已存在时 Qdrant 会忽略
+        for field in PAYLOAD_INDEX_FIELDS:
+            try:
+                shard.client.create_payload_index(
+                    collection_name=shard.collection_name,
+                    field_name=field,
+                    field_schema=PayloadSchemaType.KEYWORD
+                )
+            except Exception as e:
+                logger.warning(f"创建载荷索引 {shard.collection_name}.{field} 失败: {e}")
+
+    def ensure_collections(self) -> None:
+        """确保各分片集合与载荷索引存在（不加载计数），供只需写入的离线工具使用"""
+        if self.projection is not None and self.projection.source_dim != self.embedder.dimension():
+            raise ValueError(f"投影输入维度 {self.projection.source_dim} 与嵌入模型维度 {self.embedder.dimension()} 不一致")
+        for shard in self.shards:
+            self._ensure_collection(shard)
+            self._ensure_payload_indexes(shard)
+
+    def warm_up(self, reconcile_interval: float = 0, stale_after: float = 0, stale_limit: int = 0) -> None:
+        """
+        预热：确保集合与载荷索引存在，全量预加载租户计数，并启动定期对账（只对账失效或过期的用户）。
+        出错时抛出异常，由调用方决定是否重试；全部完成后 ready 置为 True。
+        """
+        start = time.time()
+        self.ensure_collections()
+        self.reconcile_all_counts()
+        self.start_counter_reconciler(reconcile_interval, stale_after, stale_limit)
+        self.ready = True
+        logger.info(f"预热完成，耗时 {time.time() - start:.2f}s")
 
 
     def count(self, user: str = None, category: str = None) -> int:
@@ -51,71 +333,328 @@ class VectorStore:
             # 构建过滤条件
             filter_conditions = []
             if user:
-                filter_conditions.append({"key": "user", "match": {"value": user}})
+                filter_conditions.append(FieldCondition(key="user", match=MatchValue(value=user)))
             if category:
-                filter_conditions.append({"key": "category", "match": {"value": category}})
+                filter_conditions.append(FieldCondition(key="category", match=MatchValue(value=category)))
             
-            # 如果有过滤条件，则使用过滤查询
-            if filter_conditions:
-                filter_condition = {"must": filter_conditions}
-                return self.client.count(collection_name=self.collection_name, filter=filter_condition).count
-            else:
-                # 无过滤条件，返回所有记录数
-                return self.client.count(collection_name=self.collection_name).count
+            # 如果有过滤条件，则使用过滤查询；无过滤条件时 count_filter 为 None，返回所有记录数
+            filter_condition = Filter(must=filter_conditions) if filter_conditions else None
+            counts = self._map_shards(
+                lambda shard: shard.client.count(collection_name=shard.collection_name, count_filter=filter_condition).count,
+                self._target_shards(user)
+            )
+            return sum(counts)
         except Exception:
             return 0
 
+    def _scroll_payloads(self, scroll_filter: Optional[Filter], fields: List[str], shards: Optional[List[_Shard]] = None):
+        """按过滤条件遍历集合中的点（只取指定载荷字段，不取向量），默认遍历全部分片"""
+        for shard in shards or self.shards:
+            offset = None
+            while True:
+                records, offset = shard.client.scroll(
+                    collection_name=shard.collection_name,
+                    scroll_filter=scroll_filter,
+                    limit=1024,
+                    offset=offset,
+                    with_payload=fields,
+                    with_vectors=False
+                )
+                for record in records:
+                    yield record.payload or {}
+                if offset is None:
+                    break
+
+    def reconcile_counts(self, user: str) -> bool:
+        """与 Qdrant 对账单个用户的计数"""
+        generation = self.counters.generation(user)
+        detail = {}
+        scroll_filter = Filter(must=[FieldCondition(key="user", match=MatchValue(value=user))])
+        for payload in self._scroll_payloads(scroll_filter, ['title', 'category'], [self.shard_for(user)]):
+            key = (payload.get('title'), payload.get('category'))
+            detail[key] = detail.get(key, 0) + 1
+        return self.counters.replace_user(user, detail, generation)
+
+    def reconcile_all_counts(self) -> None:
+        """全量对账：扫描整个集合，重建所有用户的计数"""
+        generations = self.counters.generations()
+        details = {}
+        for payload in self._scroll_payloads(None, ['user', 'title', 'category']):
+            user = payload.get('user')
+            if not user:
+                continue
+            detail = details.setdefault(user, {})
+            key = (payload.get('title'), payload.get('category'))
+            detail[key] = detail.get(key, 0) + 1
+        for user, detail in details.items():
+            self.counters.replace_user(user, detail, generations.get(user, 0))
+        self.counters.drop_users_except(details.keys(), generations)
+        logger.info(f"计数对账完成，用户数: {len(details)}")
+
+    def reconcile_pending_counts(self, stale_after: float = 0, stale_limit: int = 0) -> int:
+        """
+        增量对账：只按用户过滤扫描计数失效（本 worker 或其他 worker 写入后）的用户，
+        以及最多 stale_limit 个超过 stale_after 秒未对账的用户；返回对账的用户数。
+        """
+        for user in self.counters.users():
+            self._sync_counter_change(user)
+        users = self.counters.users_to_reconcile(stale_after, stale_limit)
+        for user in users:
+            self.reconcile_counts(user)
+        return len(users)
+
+    def start_counter_reconciler(self, interval: float, stale_after: float = 0, stale_limit: int = 0) -> None:
+        """启动后台线程，定期增量对账计数（不再全量扫描集合）"""
+        if self._reconciler is not None or interval <= 0:
+            return
+
+        def _loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reconcile_pending_counts(stale_after, stale_limit)
+                except Exception as e:
+                    logger.error(f"计数对账失败: {e}")
+
+        self._reconciler = threading.Thread(target=_loop, name="counter-reconciler", daemon=True)
+        self._reconciler.start()
+
+    def _publish_counter_change(self, user: Optional[str]) -> None:
+        """本 worker 修改了某用户的数据后，递增共享缓存中的修改代数"""
+        if user is None:
+            self._global_epoch += 1
+        if self.shared_cache is None:
+            return
+        key = f"counters:gen:{user or '*'}"
+        try:
+            gen = self.shared_cache.incr(key)
+        except Exception as e:
+            logger.warning(f"写入共享缓存失败: {e}")
+            return
+        # 代数跳变说明其间有其他 worker 写入过，本地计数不再可信
+        if gen != self._seen_counter_gen.get(key, 0) + 1:
+            self.counters.invalidate(user)
+        self._seen_counter_gen[key] = gen
+
+    def _sync_counter_change(self, user: str) -> None:
+        """读取计数前检查其他 worker 是否修改过该用户（或全部用户）的数据"""
+        if self.shared_cache is None:
+            return
+        for key in (f"counters:gen:{user}", "counters:gen:*"):
+            try:
+                gen = self.shared_cache.get(key, 0)
+            except Exception:
+                return
+            if gen != self._seen_counter_gen.get(key, 0):
+                self.counters.invalidate(user)
+                if key == "counters:gen:*":
+                    self._global_epoch += 1
+                self._seen_counter_gen[key] = gen
+
+    def data_version(self, user: str):
+        """某用户数据的版本号：本 worker 或其他 worker 写入该用户（或全部用户）后都会变化"""
+        self._sync_counter_change(user)
+        return self.counters.generation(user), self._global_epoch
+
+    def tenant_counts(self, user: str, category: Optional[str] = None, exact: bool = False) -> Dict[str, int]:
+        """
+        获取用户（可选类别）的文档数和分片数。
+        默认读取内存计数；exact=True 时先与 Qdrant 对账再返回（用于审计）。
+        """
+        self._sync_counter_change(user)
+        if not exact:
+            counts = self.counters.get(user, category)
+            if counts is not None:
+                return counts
+        self.reconcile_counts(user)
+        counts = self.counters.get(user, category)
+        if counts is None:
+            # 对账期间有并发写入，退回 Qdrant 精确计数
+            return {'documents': None, 'chunks': self.count(user=user, category=category)}
+        return counts
+
     def add_texts(self, texts: List[str], metas: List[Dict[str, Any]]):
+        """
+        追加/覆盖写入分片（DB 模式入库与数据库同步使用），不删除文档中未出现的旧分片。
+        点ID与 upsert_document 的规则相同（用户+标题 -> doc_id，再按内容哈希与出现序号生成），
+        因此重复同步同一内容会覆盖原有的点，不同用户、不同文档之间的点ID也不会冲突。
+        """
         assert len(texts) == len(metas), 'texts 与 metas 长度需一致'
         
         # 记录数据存储的详细信息
-        print(f"[VectorStore] 开始添加数据: {len(texts)} 条记录")
-        print(f"[VectorStore] 向量维度: {self.embedder.dimension()}")
-        print(f"[VectorStore] Qdrant集合: {self.collection_name}")
+        logger.debug(f"开始添加数据: {len(texts)} 条记录")
+        logger.debug(f"向量维度: {self.vector_dimension()}")
         
-        # 记录部分元数据样例用于调试
-        if metas:
-            print(f"[VectorStore] 元数据示例: {json.dumps(metas[0], ensure_ascii=False, indent=2)}")
+        # 记录部分元数据样例用于调试（生产日志级别下不序列化）
+        if metas and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"元数据示例: {json.dumps(metas[0], ensure_ascii=False, indent=2)}")
             if len(metas) > 1:
-                print(f"[VectorStore] 最后一条元数据示例: {json.dumps(metas[-1], ensure_ascii=False, indent=2)}")
-        
-        # 从元数据中提取用户信息（只需要第一个用户信息用于统计）
-        user = None
-        if metas and 'user' in metas[0]:
-            user = metas[0]['user']
-        
-        vecs = self.embedder.encode(texts)
-        vecs = np.asarray(vecs, dtype='float32')
-        
-        with self.lock:
-            # 记录添加前的索引大小（传递用户参数）
-            before_count = self.count(user=user)
-            
-            # 准备要添加的点
-            points = []
-            for i, (vec, meta) in enumerate(zip(vecs, metas)):
-                # 使用自增整数作为唯一ID
-                point_id = before_count + i + 1
-                points.append(PointStruct(id=point_id, vector=vec.tolist(), payload=meta))
-            
-            # 添加到Qdrant
-            self.client.upsert(collection_name=self.collection_name, points=points)
-            
-            # 记录添加后的索引大小（传递用户参数）
-            after_count = self.count(user=user)
-            print(f"[VectorStore] 索引更新: 从 {before_count} 条增加到 {after_count} 条记录")
-        
-            # 保存更改（Qdrant自动保存）
-            print(f"[VectorStore] 数据已保存到Qdrant")
+                logger.debug(f"最后一条元数据示例: {json.dumps(metas[-1], ensure_ascii=False, indent=2)}")
+
+        # 按用户分组：每个用户的数据写入各自所在的分片，嵌入调用也按用户计费
+        groups: Dict[Optional[str], List[int]] = {}
+        for i, meta in enumerate(metas):
+            groups.setdefault(meta.get('user'), []).append(i)
+
+        for user, indexes in groups.items():
+            shard = self.shard_for(user)
+            logger.debug(f"Qdrant集合: {shard.collection_name}，用户: {user}，记录数: {len(indexes)}")
+
+            # 与 upsert_document 相同的点ID：同一文档内重复内容用出现序号区分
+            point_ids, payloads = [], []
+            seen = {}
+            for i in indexes:
+                meta, text = metas[i], texts[i]
+                doc_id = make_doc_id(user, meta.get('title') or '')
+                h = chunk_hash(text)
+                n = seen.get((doc_id, h), 0)
+                seen[(doc_id, h)] = n + 1
+                point_ids.append(str(uuid.uuid5(uuid.UUID(doc_id), f"{h}:{n}")))
+                payloads.append({**meta, 'doc_id': doc_id, 'chunk_hash': h})
+
+            vecs = self._encode([texts[i] for i in indexes], user, 'bulk')
+            points = [
+                PointStruct(id=pid, vector=self.point_vector(vec, texts[i], user), payload=payload)
+                for pid, vec, i, payload in zip(point_ids, vecs, indexes, payloads)
+            ]
+
+            with self.lock:
+                # 已存在的点会被覆盖，不重复计数
+                existing = {str(r.id) for r in shard.client.retrieve(
+                    collection_name=shard.collection_name, ids=point_ids, with_payload=False, with_vectors=False)}
+                shard.client.upsert(collection_name=shard.collection_name, points=points)
+
+                if user:
+                    if existing:
+                        # 覆盖的点可能改了标题之外的类别等字段，交给对账重建计数
+                        self.counters.invalidate(user)
+                    else:
+                        for payload in payloads:
+                            self.counters.add_chunks(user, payload.get('title'), payload.get('category'), 1)
+                    self._publish_counter_change(user)
 
-    def search(self, q: str, topK: int = 5, category: Optional[str] = None, user: str = None) -> List[Dict]:
+            logger.debug(f"用户 {user} 写入 {len(points)} 条记录，其中覆盖已有 {len(existing)} 条")
+
+    def _doc_lock(self, doc_id: str) -> threading.Lock:
+        return self._doc_locks[int(doc_id[:8], 16) % DOC_LOCK_STRIPES]
+
+    def _scroll_document(self, title: str, user: Optional[str]) -> Dict[Any, Dict[str, Any]]:
+        """读取某文档当前在库中的全部分片（只取版本与哈希字段，不取向量）"""
+        conditions = [FieldCondition(key="title", match=MatchValue(value=title))]
+        if user:
+            conditions.append(FieldCondition(key="user", match=MatchValue(value=user)))
+        scroll_filter = Filter(must=conditions)
+        shard = self.shard_for(user)
+
+        existing = {}
+        offset = None
+        while True:
+            records, offset = shard.client.scroll(
+                collection_name=shard.collection_name,
+                scroll_filter=scroll_filter,
+                limit=256,
+                offset=offset,
+                with_payload=['version', 'chunk_hash'],
+                with_vectors=False
+            )
+            for record in records:
+                existing[record.id] = record.payload or {}
+            if offset is None:
+                break
+        return existing
+
+    def upsert_document(self, title: str, chunks: List[str], meta: Dict[str, Any], user: Optional[str] = None) -> Dict[str, int]:
         """
-        在Qdrant中检索相似文本 (使用 query_points 的修正版)
+        按版本增量入库一个文档：
+        - 每个分片按内容哈希生成稳定的点ID
+        - 只对新增/变化的分片调用嵌入并写入
+        - 删除本次已不存在的旧分片（包括旧版本入库时产生的整数ID分片）
+        - 未变化的分片不重新嵌入，仅同步元数据与版本号
         """
-        # 生成查询向量
-        qv = self.embedder.encode([q])
-        qv = np.asarray(qv, dtype='float32')
-        
+        doc_id = make_doc_id(user, title)
+        doc_ns = uuid.UUID(doc_id)
+
+        # 计算期望的分片集合；同一文档内重复内容用出现序号区分
+        desired = {}
+        seen = {}
+        for c in chunks:
+            h = chunk_hash(c)
+            n = seen.get(h, 0)
+            seen[h] = n + 1
+            desired[str(uuid.uuid5(doc_ns, f"{h}:{n}"))] = (c, h)
+
+        shard = self.shard_for(user)
+        with self._doc_lock(doc_id):
+            existing = self._scroll_document(title, user)
+            version = max((int(p.get('version') or 0) for p in existing.values()), default=0) + 1
+
+            existing_ids = {str(pid) for pid in existing}
+            new_ids = [pid for pid in desired if pid not in existing_ids]
+            kept_ids = [pid for pid in desired if pid in existing_ids]
+            stale_ids = [pid for pid in existing if str(pid) not in desired]
+
+            base_payload = {**meta, 'title': title, 'user': user, 'doc_id': doc_id, 'version': version}
+
+            if new_ids:
+                texts = [desired[pid][0] for pid in new_ids]
+                vecs = self._encode(texts, user, 'bulk')
+                points = [
+                    PointStruct(
+                        id=pid,
+                        vector=self.point_vector(vec, desired[pid][0], user),
+                        payload={**base_payload, 'content': desired[pid][0], 'chunk_hash': desired[pid][1]}
+                    )
+                    for pid, vec in zip(new_ids, vecs)
+                ]
+                shard.client.upsert(collection_name=shard.collection_name, points=points)
+
+            if kept_ids:
+                # 未变化的分片：只更新元数据（类别、关键词等可能已修改）和版本号
+                shard.client.set_payload(
+                    collection_name=shard.collection_name,
+                    payload=base_payload,
+                    points=kept_ids
+                )
+
+            if stale_ids:
+                shard.client.delete(
+                    collection_name=shard.collection_name,
+                    points_selector=PointIdsList(points=stale_ids)
+                )
+
+            if user:
+                self.counters.set_document(user, title, meta.get('category'), len(desired))
+                self._publish_counter_change(user)
+
+        logger.debug(f"文档 '{title}' 更新到版本 {version}: 新增 {len(new_ids)}，删除 {len(stale_ids)}，未变化 {len(kept_ids)}")
+        return {
+            'docId': doc_id,
+            'version': version,
+            'added': len(new_ids),
+            'deleted': len(stale_ids),
+            'unchanged': len(kept_ids)
+        }
+
+    def _cached_results(self, kind: str, norm: Optional[str], topK: int, category: Optional[str], user: Optional[str]):
+        """查结果缓存（仅限定用户的检索），返回 (缓存键, 数据版本, 命中的结果)"""
+        if self.query_cache is None or not user:
+            return None, None, None
+        key = (kind, user, category, topK, norm)
+        version = self.data_version(user)
+        return key, version, self.query_cache.get_results(key, version)
+
+    def _query_vector(self, q: str, norm: Optional[str], user: Optional[str], lane: str) -> List[float]:
+        """生成查询向量，启用查询缓存时先查查询向量缓存"""
+        cache = self.query_cache
+        qv = cache.embeddings.get(norm) if cache is not None else None
+        if qv is None:
+            qv = self._encode([q], user, lane)
+            if cache is not None:
+                cache.embeddings.put(norm, qv)
+        return qv[0].tolist()
+
+    @staticmethod
+    def _search_filter(user: Optional[str], category: Optional[str]) -> Optional[Filter]:
         # 构建过滤条件
         conditions = []
         # 添加用户过滤条件，确保用户只能访问自己的数据
@@ -124,86 +663,247 @@ class VectorStore:
         # 添加类别过滤条件
         if category:
             conditions.append(FieldCondition(key="category", match=MatchValue(value=category)))
-        
-        filters = Filter(must=conditions) if conditions else None
+        return Filter(must=conditions) if conditions else None
+
+    def estimate_cardinality(self, user: Optional[str], category: Optional[str]):
+        """
+        估计过滤后的候选点数量，返回 (数量, 来源)：
+        优先读内存中的租户计数；未加载时对目标分片做一次近似 count；不限定用户和类别时不估计
+        """
+        if user:
+            counts = self.counters.get(user, category)
+            if counts is not None:
+                return counts['chunks'], 'counters'
+        elif not category:
+            return None, 'none'
+        filters = self._search_filter(user, category)
+        try:
+            estimate = sum(self._map_shards(
+                lambda shard: shard.client.count(
+                    collection_name=shard.collection_name, count_filter=filters, exact=False
+                ).count,
+                self._target_shards(user)
+            ))
+        except Exception as e:
+            logger.warning(f"估计候选数量失败: {e}")
+            return None, 'error'
+        return estimate, 'count'
+
+    def _plan(self, user: Optional[str], category: Optional[str], topK: int):
+        if self.planner is None:
+            return None
+        estimate, source = self.estimate_cardinality(user, category)
+        return self.planner.plan(estimate, source, topK)
+
+    def _query_shards(self, user: Optional[str], topK: int, score_key: str, **query_kwargs) -> List[Dict]:
+        """在目标分片上执行 query_points，多个分片时按分数合并取前 topK，结果为 载荷 + 分数"""
+        def _query(shard: _Shard):
+            # 使用 query_points (确定你的客户端有这个方法)
+            results = shard.client.query_points(
+                collection_name=shard.collection_name,
+                limit=topK,
+                with_payload=True,
+                with_vectors=False,
+                **query_kwargs
+            )
+            # --- 核心修复：必须访问 .points 属性 ---
+            # query_points 返回的是一个对象，包含 points 列表
+            return results.points
+
+        shard_results = self._map_shards(_query, self._target_shards(user))
+        points_list = [p for points in shard_results for p in points]
+        if len(shard_results) > 1:
+            # 各分片使用相同的距离度量/融合方式，分数可直接比较
+            points_list = sorted(points_list, key=lambda p: p.score, reverse=True)[:topK]
 
-        
-        # 使用 query_points (确定你的客户端有这个方法)
-        results = self.client.query_points(
-            collection_name=self.collection_name,
-            query=qv[0].tolist(),  # 在 query_points 中参数名通常是 query
-            query_filter=filters,
-            limit=topK,
-            with_payload=True,
-            with_vectors=False
-        )
-        
         # 格式化结果
         res = []
-        # --- 核心修复：必须访问 .points 属性 ---
-        # query_points 返回的是一个对象，包含 points 列表
-        points_list = results.points 
-        
         for result in points_list:
             item = dict(result.payload)
-            item['score_vec'] = float(result.score)
+            item[score_key] = float(result.score)
             res.append(item)
-            
         return res
-    
-    
+
+    def search(self, q: str, topK: int = 5, category: Optional[str] = None, user: str = None,
+               lane: str = 'interactive') -> List[Dict]:
+        """
+        在Qdrant中检索相似文本 (使用 query_points 的修正版)
+        限定用户时只查询该用户所在分片；否则并发查询全部分片，合并后取前 topK
+        启用查询缓存时，先查结果缓存（仅限定用户的检索），再查查询向量缓存
+        """
+        norm = normalize_query(q) if self.query_cache is not None else None
+        key, version, cached = self._cached_results('dense', norm, topK, category, user)
+        if cached is not None:
+            return cached
+
+        query = self._query_vector(q, norm, user, lane)
+        plan = self._plan(user, category, topK)
+        start = time.perf_counter()
+        res = self._query_shards(
+            user, topK, 'score_vec',
+            query=query,  # 在 query_points 中参数名通常是 query
+            query_filter=self._search_filter(user, category),
+            search_params=plan.params if plan is not None else None
+        )
+        if plan is not None:
+            self.planner.record(plan, time.perf_counter() - start)
+        if key is not None:
+            self.query_cache.put_results(key, version, res)
+        return res
+
+    def hybrid_search(self, q: str, topK: int = 5, category: Optional[str] = None, user: str = None,
+                      candidates: Optional[int] = None, lane: str = 'interactive') -> List[Dict]:
+        """
+        单次 Qdrant 查询完成混合检索：稠密向量与稀疏词项向量各自预取 candidates 个候选，
+        在服务端用 RRF 融合排序，结果的 score 为融合分数。需要 hybrid_ready 为 True。
+        """
+        norm = normalize_query(q) if self.query_cache is not None else None
+        key, version, cached = self._cached_results('hybrid', norm, topK, category, user)
+        if cached is not None:
+            return cached
+
+        filters = self._search_filter(user, category)
+        candidates = candidates or topK * 2
+        query = self._query_vector(q, norm, user, lane)
+        # 计划只作用于稠密向量预取；稀疏向量检索本身就是倒排索引上的精确计算
+        plan = self._plan(user, category, candidates)
+        prefetch = [Prefetch(query=query, filter=filters, limit=candidates,
+                             params=plan.params if plan is not None else None)]
+        sparse = self.sparse.encode_query(q)
+        if sparse is not None:
+            prefetch.append(Prefetch(query=sparse, using=SPARSE_VECTOR, filter=filters, limit=candidates))
+        start = time.perf_counter()
+        res = self._query_shards(user, topK, 'score', prefetch=prefetch, query=FusionQuery(fusion=Fusion.RRF))
+        if plan is not None:
+            self.planner.record(plan, time.perf_counter() - start)
+        if key is not None:
+            self.query_cache.put_results(key, version, res)
+        return res
+
+    def scroll_tenant(self, user: str, batch: int = 512):
+        """逐批读取某用户的全部点（含向量与载荷），用于快照导出"""
+        shard = self.shard_for(user)
+        scroll_filter = Filter(must=[FieldCondition(key="user", match=MatchValue(value=user))])
+        offset = None
+        while True:
+            records, offset = shard.client.scroll(
+                collection_name=shard.collection_name,
+                scroll_filter=scroll_filter,
+                limit=batch,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            if records:
+                yield records
+            if offset is None:
+                break
+
+    def write_points(self, points: List[PointStruct], user: str) -> None:
+        """直接写入已有向量的点（不调用嵌入模型），写入用户所在分片；计数需调用方随后刷新"""
+        shard = self.shard_for(user)
+        shard.client.upsert(collection_name=shard.collection_name, points=points, wait=True)
+
+    def clear_user(self, user: str) -> int:
+        """删除某用户的全部数据，返回删除数量"""
+        shard = self.shard_for(user)
+        user_filter = Filter(must=[FieldCondition(key="user", match=MatchValue(value=user))])
+        deleted = shard.client.count(collection_name=shard.collection_name, count_filter=user_filter, exact=True).count
+        if deleted:
+            shard.client.delete(
+                collection_name=shard.collection_name,
+                points_selector=FilterSelector(filter=user_filter),
+                wait=True
+            )
+        self.refresh_tenant_counts(user)
+        return deleted
+
+    def refresh_tenant_counts(self, user: str) -> None:
+        """批量直写后重建某用户的计数，并通知其他 worker"""
+        self.counters.invalidate(user)
+        self._publish_counter_change(user)
+        self.reconcile_counts(user)
+
+    def build_delete_filter(self, titles: Optional[List[str]] = None, categories: Optional[List[str]] = None,
+                            doc_ids: Optional[List[str]] = None, user: str = None) -> Optional[Filter]:
+        """把多个标题/类别/文档ID合并为一个过滤器：命中任意一项即删除，且限定在用户范围内"""
+        should = []
+        if titles:
+            should.append(FieldCondition(key="title", match=MatchAny(any=list(titles))))
+        if categories:
+            should.append(FieldCondition(key="category", match=MatchAny(any=list(categories))))
+        if doc_ids:
+            should.append(FieldCondition(key="doc_id", match=MatchAny(any=list(doc_ids))))
+        if not should:
+            return None
+        must = []
+        # 添加用户过滤条件，确保用户只能删除自己的数据
+        if user:
+            must.append(FieldCondition(key="user", match=MatchValue(value=user)))
+        return Filter(must=must or None, should=should)
+
+    def delete_where(self, titles: Optional[List[str]] = None, categories: Optional[List[str]] = None,
+                     doc_ids: Optional[List[str]] = None, user: str = None,
+                     count: bool = False, wait: bool = True) -> Optional[int]:
+        """
+        按组合条件批量删除，一次请求完成。
+        count=True 时先做一次过滤计数，返回真实删除数量；否则返回 None。
+        删除由 Qdrant 原子执行，不占用全局写锁，不会排在入库操作之后。
+        """
+        delete_filter = self.build_delete_filter(titles, categories, doc_ids, user)
+        if delete_filter is None:
+            return 0
+
+        shards = self._target_shards(user)
+        deleted = None
+        if count:
+            deleted = sum(self._map_shards(
+                lambda shard: shard.client.count(
+                    collection_name=shard.collection_name,
+                    count_filter=delete_filter,
+                    exact=True
+                ).count,
+                shards
+            ))
+            if deleted == 0:
+                return 0
+
+        self._map_shards(
+            lambda shard: shard.client.delete(
+                collection_name=shard.collection_name,
+                points_selector=FilterSelector(filter=delete_filter),
+                wait=wait
+            ),
+            shards
+        )
+
+        # 增量更新计数；按文档ID删除或跨用户删除时无法直接推算，标记为待对账
+        if user and not doc_ids:
+            self.counters.remove_documents(user, titles=titles, categories=categories)
+        else:
+            self.counters.invalidate(user)
+        self._publish_counter_change(user)
+        logger.debug(f"批量删除完成，用户: {user}，标题: {len(titles or [])} 个，类别: {len(categories or [])} 个，文档: {len(doc_ids or [])} 个，删除数量: {deleted}")
+        return deleted
+
     def delete_by_title(self, title: str, user: str = None) -> int:
-        """根据标题直接删除 (优化版)"""
-        print(f"[VectorStore] 开始删除标题为 '{title}' 的记录，用户: {user}")
+        """根据标题删除，返回实际删除数量"""
+        logger.debug(f"开始删除标题为 '{title}' 的记录，用户: {user}")
         if not title:
             return 0
-            
-        with self.lock:
-            # 1. 构建过滤器
-            conditions = [FieldCondition(key="title", match=MatchValue(value=title))]
-            # 添加用户过滤条件，确保用户只能删除自己的数据
-            if user:
-                conditions.append(FieldCondition(key="user", match=MatchValue(value=user)))
-            
-            filter = Filter(must=conditions)
-            
-            # 2. 直接按条件删除 (原子操作，更快)
-            # 注意：delete 操作通常返回 UpdateResult，不直接包含删除行数
-            # 如果非常需要知道删除了多少条，必须先 count，但这会降低性能。
-            # 这里我们假设只要不报错就是成功。
-            try:
-                self.client.delete(
-                    collection_name=self.collection_name,
-                    points_selector=filter
-                    #points=Filter(must=[FieldCondition(key=’rand_number’, range=Range(gte=0.7))])
-                )
-                print(f"[VectorStore] 已执行删除标题 '{title}' 的操作")
-                return 1 # 返回 1 表示操作成功提交
-            except Exception as e:
-                print(f"[VectorStore] 删除失败: {e}")
-                return 0
+        try:
+            return self.delete_where(titles=[title], user=user, count=True)
+        except Exception as e:
+            logger.error(f"删除失败: {e}")
+            return 0
 
     def delete_by_category(self, category: str, user: str = None) -> int:
-        """根据类别直接删除 (优化版)"""
-        print(f"[VectorStore] 开始删除类别为 '{category}' 的记录，用户: {user}")
+        """根据类别删除，返回实际删除数量"""
+        logger.debug(f"开始删除类别为 '{category}' 的记录，用户: {user}")
         if not category:
             return 0
-            
-        with self.lock:
-            conditions = [FieldCondition(key="category", match=MatchValue(value=category))]
-            # 添加用户过滤条件，确保用户只能删除自己的数据
-            if user:
-                conditions.append(FieldCondition(key="user", match=MatchValue(value=user)))
-            
-            filter = Filter(must=conditions)
-            
-            try:
-                self.client.delete(
-                    collection_name=self.collection_name,
-                    points_selector=filter
-                )
-                print(f"[VectorStore] 已执行删除类别 '{category}' 的操作")
-                return 1
-            except Exception as e:
-                print(f"[VectorStore] 删除失败: {e}")
-                return 0
\ No newline at end of file
+        try:
+            return self.delete_where(categories=[category], user=user, count=True)
+        except Exception as e:
+            logger.error(f"删除失败: {e}")
+            return 0
@@ -3,50 +3,75 @@ import sys
 import logging
 import traceback
 
-# 配置日志
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("service.log"),
-        logging.StreamHandler()
-    ]
-)
+from config import SERVICE_CONFIG, DATA_DIR
 
+
+def setup_logging():
+    # dev 模式：DEBUG 级别，同时输出到文件和标准输出
+    # prod 模式：使用 SERVICE_LOG_LEVEL（默认 warning），默认只输出到标准输出
+    level = logging.DEBUG if SERVICE_CONFIG['mode'] != 'prod' else getattr(
+        logging, SERVICE_CONFIG['log_level'].upper(), logging.WARNING)
+    handlers = [logging.StreamHandler()]
+    if SERVICE_CONFIG['log_file']:
+        handlers.append(logging.FileHandler(SERVICE_CONFIG['log_file']))
+    logging.basicConfig(
+        level=level,
+        format='%(asctime)s - %(process)d - %(name)s - %(levelname)s - %(message)s',
+        handlers=handlers
+    )
+
+
+setup_logging()
 logger = logging.getLogger("rag_service")
 
+
 def main():
     try:
-        logger.info("Starting RAG service...")
+        workers = SERVICE_CONFIG['workers']
+        logger.info(f"Starting RAG service in {SERVICE_CONFIG['mode']} mode with {workers} worker(s)...")
         logger.info(f"Current directory: {os.getcwd()}")
-        logger.info(f"Python path: {sys.path}")
-        
+        logger.debug(f"Python path: {sys.path}")
+
         # 尝试导入必要的模块
         logger.info("Importing modules...")
-        from fastapi import FastAPI
         import uvicorn
-        
-        # 导入配置
-        logger.info("Importing config...")
-        from config import SERVICE_CONFIG, DATA_DIR
+
         # 创建必要的目录
         os.makedirs(DATA_DIR, exist_ok=True)
-        
-        # 确认 app 模块可以正常导入
-        logger.info("Importing app module...")
-        import app
-        logger.info(f"App imported successfully: {app}")
-        
+
+        if workers > 1:
+            # 多 worker：每个 worker 进程各自导入 app 并创建自己的客户端与连接池，
+            # 主进程不导入 app，避免白白建立一套连接。
+            # 需要跨 worker 一致的状态放在共享磁盘缓存中（通过环境变量传给 worker）
+            # .env 中留空的 RAG_SHARED_CACHE_PATH= 会被加载为空字符串，同样视为未配置
+            if not os.environ.get('RAG_SHARED_CACHE_PATH'):
+                os.environ['RAG_SHARED_CACHE_PATH'] = os.path.join(DATA_DIR, 'shared_cache.db')
+            logger.info(f"Shared cache: {os.environ['RAG_SHARED_CACHE_PATH']}")
+        else:
+            # 单进程：提前导入 app，尽早暴露导入错误
+            logger.info("Importing app module...")
+            import app
+            logger.info(f"App imported successfully: {app}")
+
+        if SERVICE_CONFIG['pid_file']:
+            with open(SERVICE_CONFIG['pid_file'], 'w') as f:
+                f.write(str(os.getpid()))
+
         # 启动服务
+        # 多 worker 模式下向主进程发送 SIGHUP 可逐个重启 worker（优雅重载），
+        # SIGTERM 会等待在途请求完成（最长 graceful_timeout 秒）后退出
         logger.info("Starting uvicorn server...")
         uvicorn.run(
             "app:app",
             host=SERVICE_CONFIG['host'],
             port=SERVICE_CONFIG['port'],
             log_level=SERVICE_CONFIG['log_level'],
+            workers=workers,
+            timeout_graceful_shutdown=SERVICE_CONFIG['graceful_timeout'],
+            access_log=SERVICE_CONFIG['mode'] != 'prod',
             reload=False
         )
-        
+
     except ImportError as e:
         logger.error(f"Import error: {e}")
         logger.error(traceback.format_exc())
@@ -60,4 +85,4 @@ def main():
 
 if __name__ == "__main__":
     print("Starting RAG service with error handling...")
-    main()
\ No newline at end of file
+    main()
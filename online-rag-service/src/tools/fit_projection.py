@@ -0,0 +1,184 @@
+"""
+拟合向量降维投影并评估 recall@k。
+
+从现有（全维度）集合的全部分片中抽样向量，拟合 PCA 或随机正交投影，
+以全维度精确检索为真值报告投影后的 recall@k、单向量内存与暴力检索耗时。
+--migrate-to：把原集合各分片的向量投影后写入新集合的对应分片（不调用嵌入接口），投影按新集合命名保存；
+--output：把投影保存到指定路径。两者都未指定时只评估、不保存投影——
+原集合仍是全维度，把投影写到默认路径并启用会导致维度不一致。
+
+用法（在 src 目录下）：
+    python -m tools.fit_projection --method pca --dim 256 --sample 5000 --k 10
+    python -m tools.fit_projection --dim 256 --output /tmp/projection_256.npz
+    python -m tools.fit_projection --dim 256 --migrate-to knowledge_base_256
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qdrant_client.http.models import PointStruct  # noqa: E402
+
+from config import QDRANT_CONFIG, SPARSE_CONFIG, DATA_DIR  # noqa: E402
+from services.projection import fit_pca, random_orthogonal, recall_at_k  # noqa: E402
+from services.sparse import SparseEncoder  # noqa: E402
+from services.vector_store import VectorStore, dense_vector  # noqa: E402
+
+
+class _DimOnly:
+    """只提供维度信息的占位嵌入模型：本工具只读写已有向量，不调用嵌入接口"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts):
+        raise RuntimeError("fit_projection 不调用嵌入接口")
+
+
+def _scroll_shard(shard, limit: int, batch: int):
+    """从一个分片集合中读取最多 limit 个点"""
+    records_out = []
+    offset = None
+    while len(records_out) < limit:
+        records, offset = shard.client.scroll(
+            collection_name=shard.collection_name,
+            limit=min(batch, limit - len(records_out)),
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        records_out.extend(records)
+        if offset is None:
+            break
+    return records_out
+
+
+def scroll_vectors(store: VectorStore, limit: int, batch: int = 512):
+    """从全部分片中读取最多 limit 个点的向量与载荷，各分片按点数比例抽取"""
+    counts = [shard.client.count(collection_name=shard.collection_name, exact=True).count for shard in store.shards]
+    total = sum(counts)
+    ids, vecs, payloads = [], [], []
+    for shard, count in zip(store.shards, counts):
+        quota = count if total <= limit else -(-limit * count // total)
+        for r in _scroll_shard(shard, min(quota, limit - len(ids)), batch):
+            ids.append(r.id)
+            vecs.append(dense_vector(r.vector))
+            payloads.append(r.payload)
+    return ids, np.asarray(vecs, dtype='float32'), payloads
+
+
+def brute_force_ms(corpus: np.ndarray, queries: np.ndarray, k: int) -> float:
+    start = time.perf_counter()
+    scores = queries @ corpus.T
+    np.argpartition(-scores, min(k, corpus.shape[0]) - 1, axis=1)
+    return (time.perf_counter() - start) * 1000.0 / len(queries)
+
+
+def migrate(source: VectorStore, target_name: str, projection, batch: int = 256) -> int:
+    """把源集合全部分片的点投影后写入新集合的对应分片（分片号相同，用户路由不变）"""
+    sparse = SparseEncoder(SPARSE_CONFIG['k1'], SPARSE_CONFIG['b'], SPARSE_CONFIG['avg_len']) if SPARSE_CONFIG['enabled'] else None
+    target = VectorStore(embedder=_DimOnly(projection.source_dim), client=source.client, projection=projection, sparse=sparse)
+    # 目标分片复用源分片所在节点的客户端（本地模式下同一存储也只能有一个客户端）
+    for dst, src in zip(target.shards, source.shards):
+        dst.client, dst.host = src.client, src.host
+    target.use_collection(target_name)
+    target.warm_up()
+    moved = 0
+    for src, dst in zip(source.shards, target.shards):
+        offset = None
+        while True:
+            records, offset = src.client.scroll(
+                collection_name=src.collection_name, limit=batch, offset=offset,
+                with_payload=True, with_vectors=True
+            )
+            if records:
+                vecs = projection.apply(np.asarray([dense_vector(r.vector) for r in records], dtype='float32'))
+                dst.client.upsert(
+                    collection_name=dst.collection_name,
+                    points=[
+                        PointStruct(id=r.id, vector=target.point_vector(v, r.payload.get('content'), r.payload.get('user')),
+                                    payload=r.payload)
+                        for r, v in zip(records, vecs)
+                    ]
+                )
+                moved += len(records)
+            if offset is None:
+                break
+    return moved
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="拟合向量降维投影并评估 recall@k")
+    parser.add_argument('--collection', default=QDRANT_CONFIG['collection_name'], help="源集合基础名（全维度，多分片时为 {名称}_s{i}）")
+    parser.add_argument('--method', choices=['pca', 'random'], default='pca')
+    parser.add_argument('--dim', type=int, default=256, help="目标维度")
+    parser.add_argument('--sample', type=int, default=5000, help="拟合用的样本点数")
+    parser.add_argument('--queries', type=int, default=200, help="评估用的查询数（从样本中留出）")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="投影保存路径（指定 --migrate-to 时默认按新集合命名，存放在数据目录）")
+    parser.add_argument('--migrate-to', help="把源集合投影后写入该新集合（基础名，分片规则与源集合相同）")
+    args = parser.parse_args(argv)
+
+    source = VectorStore(embedder=_DimOnly(0))
+    source.use_collection(args.collection)
+    _, vecs, _ = scroll_vectors(source, args.sample + args.queries)
+    if len(vecs) <= args.queries:
+        raise SystemExit(f"集合 {args.collection} 中的点数不足: {len(vecs)}")
+
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(vecs))
+    queries, corpus = vecs[order[:args.queries]], vecs[order[args.queries:]]
+
+    target_collection = args.migrate_to or args.collection
+    if args.method == 'pca':
+        projection = fit_pca(corpus, args.dim, collection=target_collection)
+    else:
+        projection = random_orthogonal(vecs.shape[1], args.dim, seed=args.seed, collection=target_collection)
+
+    full_norm = corpus / np.maximum(np.linalg.norm(corpus, axis=1, keepdims=True), 1e-12)
+    query_norm = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    report = {
+        'collection': args.collection,
+        'method': args.method,
+        'source_dim': int(vecs.shape[1]),
+        'target_dim': args.dim,
+        'corpus': int(len(corpus)),
+        'queries': int(len(queries)),
+        f'recall@{args.k}': round(recall_at_k(corpus, queries, projection, args.k), 4),
+        'bytes_per_vector_full': int(vecs.shape[1] * 4),
+        'bytes_per_vector_projected': int(args.dim * 4),
+        'memory_ratio': round(vecs.shape[1] / args.dim, 2),
+        'brute_force_ms_per_query_full': round(brute_force_ms(full_norm, query_norm, args.k), 4),
+        'brute_force_ms_per_query_projected': round(
+            brute_force_ms(projection.apply(corpus), projection.apply(queries), args.k), 4),
+    }
+
+    if args.output:
+        output = args.output
+    elif args.migrate_to:
+        output = os.path.join(DATA_DIR, f"projection_{args.migrate_to}.npz")
+    else:
+        # 不写默认路径 PROJECTION_CONFIG['path']：源集合仍是全维度，启用该投影后所有读写都会维度不一致
+        output = None
+        print("[fit_projection] 未指定 --migrate-to 或 --output，只评估、不保存投影", file=sys.stderr)
+    if output:
+        projection.save(output)
+    report['projection_path'] = output
+
+    if args.migrate_to:
+        report['migrated'] = migrate(source, args.migrate_to, projection)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
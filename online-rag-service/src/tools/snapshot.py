@@ -0,0 +1,77 @@
+"""
+导出/导入用户知识库快照（原始 float32 向量 + 列式载荷），全程不调用嵌入接口。
+
+用法（在 src 目录下）：
+    python -m tools.snapshot export --user alice
+    python -m tools.snapshot export --user alice --output /backup/alice
+    python -m tools.snapshot import --input /backup/alice
+    python -m tools.snapshot import --input /backup/alice --user alice_staging --replace
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import MODEL_NAME, PROJECTION_CONFIG, SNAPSHOT_DIR  # noqa: E402
+from services.projection import load_projection  # noqa: E402
+from services.snapshot import default_snapshot_name, export_tenant, import_tenant  # noqa: E402
+from services.vector_store import VectorStore  # noqa: E402
+
+
+class _OfflineEmbedder:
+    """只提供维度与模型名的占位嵌入模型：快照导出/导入不调用嵌入接口"""
+
+    def __init__(self, dim: int, model_name: str):
+        self.dim = dim
+        self.model_name = model_name
+
+    def dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts):
+        raise RuntimeError("快照工具不调用嵌入接口")
+
+
+def build_store(args) -> VectorStore:
+    projection = None
+    if PROJECTION_CONFIG['enabled']:
+        projection = load_projection(PROJECTION_CONFIG['path'])
+        if projection is None:
+            raise SystemExit(f"已启用降维投影，但投影文件不存在: {PROJECTION_CONFIG['path']}")
+    return VectorStore(embedder=_OfflineEmbedder(args.dim, args.model), projection=projection)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="导出/导入用户知识库快照")
+    parser.add_argument('--dim', type=int, default=1536, help="嵌入模型维度（未启用投影时即集合维度）")
+    parser.add_argument('--model', default=MODEL_NAME, help="嵌入模型名，用于校验快照是否属于同一向量空间")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    exp = sub.add_parser('export', help="导出用户数据")
+    exp.add_argument('--user', required=True)
+    exp.add_argument('--output', help="快照目录（默认放在快照目录下，按 用户_时间戳 命名）")
+
+    imp = sub.add_parser('import', help="导入快照")
+    imp.add_argument('--input', required=True, help="快照目录")
+    imp.add_argument('--user', help="导入到的用户，默认为快照的原用户")
+    imp.add_argument('--replace', action='store_true', help="先清空目标用户的数据")
+    imp.add_argument('--force', action='store_true', help="跳过嵌入模型/投影一致性检查")
+    imp.add_argument('--batch', type=int, default=256)
+    args = parser.parse_args(argv)
+
+    store = build_store(args)
+    if args.command == 'export':
+        output = args.output or os.path.join(SNAPSHOT_DIR, default_snapshot_name(args.user))
+        report = {'path': output, 'manifest': export_tenant(store, args.user, output)}
+    else:
+        # 导入前确保集合与载荷索引存在；计数只需对账导入的用户（import_tenant 完成后刷新），不做全量对账
+        store.ensure_collections()
+        report = import_tenant(store, args.input, user=args.user, replace=args.replace,
+                               force=args.force, batch=args.batch)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
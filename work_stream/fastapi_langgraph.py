@@ -1,15 +1,28 @@
 from typing import TypedDict, Annotated, List, Dict, Any
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from langgraph.graph import StateGraph, END, START
 from langgraph.graph.message import add_messages
 
 from langchain_core.messages import BaseMessage
 from dotenv import load_dotenv
 import os
+import json
+import time
+import asyncio
+import uuid
 
 # 导入节点和工具
-from nodes import node_llm, node_uppercase, node_lowercase, node_quadratic_equation, classify_input, decide_next_node, handle_search, handle_chat
-from models import NodeConfig, EdgeConfig, WorkflowConfig, WorkflowExecutionRequest
+from nodes import node_llm, node_uppercase, node_lowercase, node_quadratic_equation, node_quadratic_equation_batch, classify_input, decide_next_node, handle_search, handle_chat
+from models import NodeConfig, EdgeConfig, WorkflowConfig, WorkflowSelection, WorkflowExecutionRequest, WorkflowBatchRequest
+from services import CompiledGraphCache, WorkflowRegistry, workflow_key
+from services import llm_client
+from services.metrics import LatencyStats
+from services.llm_cache import get_llm_cache
+from services.node_executor import NodeSpec, executors_from_env
+from services.run_store import open_run_storage, close_run_storage, current_run_id
+from services.tracing import RunTrace, TraceStore, current_trace
 
 # 加载环境变量
 load_dotenv()
@@ -50,17 +63,22 @@ def print_state(state: AgentState) -> None:
 
 
 # 2. 定义功能注册表 (Node Registry)
+# 每个节点类型登记执行方式：异步与极轻量的节点在事件循环中执行，会占用 CPU 的同步节点放到线程池/进程池
 NODE_REGISTRY = {
-    "chat": node_llm,
-    "llm_node": node_llm,
-    "uppercase_node": node_uppercase,
-    "lowercase_node": node_lowercase,
-    "quadratic_equation_node": node_quadratic_equation,
-    "classify_input": classify_input,
-    "handle_search": handle_search,
-    "handle_chat": handle_chat
+    "chat": NodeSpec(node_llm),
+    "llm_node": NodeSpec(node_llm),
+    "uppercase_node": NodeSpec(node_uppercase),
+    "lowercase_node": NodeSpec(node_lowercase),
+    "quadratic_equation_node": NodeSpec(node_quadratic_equation, executor="thread", timeout=10),
+    "quadratic_equation_batch_node": NodeSpec(node_quadratic_equation_batch, executor="thread", timeout=30),
+    "classify_input": NodeSpec(classify_input),
+    "handle_search": NodeSpec(handle_search),
+    "handle_chat": NodeSpec(handle_chat)
 }
 
+# 节点执行池（大小由 WORKFLOW_THREAD_POOL_SIZE / WORKFLOW_PROCESS_POOL_SIZE 配置）
+node_executors = executors_from_env()
+
 #  定义路由注册表
 ROUTER_REGISTRY = {
     "decide_next_node": decide_next_node,
@@ -75,7 +93,11 @@ def build_graph_from_config(config: WorkflowConfig):
     for node in config.nodes:
         if node.type not in NODE_REGISTRY:
             raise HTTPException(400, f"未知节点类型: {node.type}")
-        workflow.add_node(node.id, NODE_REGISTRY[node.type])
+        spec = NODE_REGISTRY[node.type]
+        if node.config and not spec.accepts_config():
+            raise HTTPException(400, f"节点类型 {node.type} 不支持节点配置")
+        # 按登记的执行方式包装节点，节点参数在构建时绑定到节点函数上
+        workflow.add_node(node.id, node_executors.wrap(node.id, node.type, spec, node.config))
             
     # 动态添加连线
     for edge in config.edges:
@@ -102,8 +124,105 @@ def build_graph_from_config(config: WorkflowConfig):
             
     return workflow.compile()
 
+# 已编译工作流缓存与工作流注册表
+graph_cache = CompiledGraphCache(build_graph_from_config, int(os.getenv("WORKFLOW_GRAPH_CACHE_SIZE", "128")))
+workflow_registry = WorkflowRegistry(int(os.getenv("WORKFLOW_REGISTRY_SIZE", "1000")))
+
+# LLM 响应缓存（节点配置 cache=true 时使用）
+llm_cache = get_llm_cache()
+
+# 流式执行指标：首个 token 延迟（TTFT）与整次执行耗时
+stream_ttft = LatencyStats()
+stream_duration = LatencyStats()
+
+
+# 批量执行：单批最大条数、默认并发与并发上限
+BATCH_MAX_ITEMS = int(os.getenv("WORKFLOW_BATCH_MAX_ITEMS", "1000"))
+BATCH_CONCURRENCY = int(os.getenv("WORKFLOW_BATCH_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("WORKFLOW_BATCH_MAX_CONCURRENCY", "64"))
+
+
+# 最近的追踪记录，可按 trace_id 导出为 Chrome trace-event 格式
+trace_store = TraceStore(int(os.getenv("WORKFLOW_TRACE_HISTORY", "100")))
+
+# 可恢复运行：检查点保存器与运行元信息（启动时打开），以及正在执行的运行ID
+checkpointer = None
+run_store = None
+active_runs = set()
+
+
+def resolve_workflow_config(execution_request: WorkflowSelection):
+    """根据执行请求取得 (工作流配置, 配置哈希)（按配置或按已注册的工作流ID）"""
+    if execution_request.workflow_id is not None:
+        config = workflow_registry.get(execution_request.workflow_id)
+        if config is None:
+            raise HTTPException(404, f"工作流不存在或已过期，请重新注册: {execution_request.workflow_id}")
+        return config, execution_request.workflow_id
+    return execution_request.workflow_config, workflow_key(execution_request.workflow_config)
+
+
+def resolve_workflow(execution_request: WorkflowSelection):
+    """根据执行请求取得编译后的工作流（相同配置直接复用缓存）"""
+    config, key = resolve_workflow_config(execution_request)
+    graph, _ = graph_cache.get(config, key=key)
+    return graph
+
+
+def require_run_store():
+    if run_store is None:
+        raise HTTPException(503, "可恢复运行不可用：未安装 langgraph-checkpoint-sqlite")
+    return run_store
+
+
+async def run_checkpointed(app_workflow, run_id: str, graph_input):
+    """
+    带检查点执行：每个节点完成后保存状态（thread_id=运行ID）。
+    graph_input 为 None 时从最后一个检查点继续，已成功的节点不会重新执行。
+    """
+    if run_id in active_runs:
+        raise HTTPException(409, f"运行 {run_id} 正在执行中")
+    active_runs.add(run_id)
+    token = current_run_id.set(run_id)
+    try:
+        # 缓存中的图是共享的，复制一份并挂上检查点保存器
+        graph = app_workflow.copy(update={"checkpointer": checkpointer})
+        result = await graph.ainvoke(graph_input, config={"configurable": {"thread_id": run_id}})
+    except Exception as e:
+        await run_store.set_status(run_id, "failed", str(e))
+        raise HTTPException(
+            status_code=500,
+            detail=f"工作流执行失败: {str(e)}（运行ID: {run_id}，可调用 /api/runs/{run_id}/resume 从失败的节点继续）",
+            headers={"X-Run-Id": run_id}
+        )
+    finally:
+        current_run_id.reset(token)
+        active_runs.discard(run_id)
+    await run_store.set_status(run_id, "succeeded")
+    return result
+
+
+async def load_run(run_id: str):
+    """取得运行元信息及挂上检查点保存器的工作流"""
+    run = await require_run_store().get(run_id)
+    if run is None:
+        raise HTTPException(404, f"运行不存在: {run_id}")
+    graph, _ = graph_cache.get(run["workflow_config"], key=run["workflow_id"])
+    return run, graph
+
 # 5. API 端点
 
+@app.on_event("startup")
+async def open_checkpoints():
+    global checkpointer, run_store
+    checkpointer, run_store = await open_run_storage(
+        os.getenv("WORKFLOW_CHECKPOINT_PATH", os.path.join("data", "checkpoints.db"))
+    )
+
+@app.on_event("shutdown")
+async def shutdown_executors():
+    node_executors.shutdown()
+    await close_run_storage(checkpointer)
+
 @app.get("/api/nodes", response_model=Dict[str, str])
 async def get_available_nodes():
     """获取可用的节点类型"""
@@ -112,6 +231,7 @@ async def get_available_nodes():
         "uppercase_node": "将最后一条消息转换为大写",
         "lowercase_node": "将最后一条消息转换为小写",
         "quadratic_equation_node": "解一元二次方程的节点，支持格式：a,b,c 或 ax² + bx + c = 0",
+        "quadratic_equation_batch_node": "批量解一元二次方程的节点，每行（或以分号分隔）一个方程",
         "classify_input": "分类节点：决定用户意图（如天气查询或闲聊）",
         "handle_search": "搜索节点：处理天气查询请求",
         "handle_chat": "闲聊节点：处理普通对话请求"
@@ -122,20 +242,95 @@ async def get_available_nodes():
 async def validate_workflow(workflow_config: WorkflowConfig):
     """验证工作流配置"""
     try:
-        # 尝试构建工作流以验证配置
-        build_graph_from_config(workflow_config)
+        # 尝试构建工作流以验证配置（构建结果进入缓存，随后执行同一配置时直接复用）
+        graph_cache.get(workflow_config)
         return {"message": "工作流配置有效"}
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"工作流配置无效: {str(e)}")
 
+@app.post("/api/workflows/register")
+async def register_workflow(workflow_config: WorkflowConfig):
+    """注册工作流：校验并编译一次，返回工作流ID，之后可按ID执行"""
+    try:
+        key = workflow_key(workflow_config)
+        graph_cache.get(workflow_config, key=key)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"工作流配置无效: {str(e)}")
+    workflow_registry.register(workflow_config, key)
+    return {"message": "工作流注册成功", "workflow_id": key}
+
+@app.get("/api/workflows/{workflow_id}")
+async def get_workflow(workflow_id: str):
+    """查看已注册的工作流配置"""
+    config = workflow_registry.get(workflow_id)
+    if config is None:
+        raise HTTPException(status_code=404, detail=f"工作流不存在或已过期: {workflow_id}")
+    return {"workflow_id": workflow_id, "workflow_config": config.model_dump()}
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """运行指标：已编译工作流缓存命中情况等"""
+    return {
+        "graph_cache": graph_cache.stats(),
+        "registered_workflows": len(workflow_registry),
+        "llm_clients": llm_client.client_count(),
+        "llm_cache": llm_cache.stats() if llm_cache else None,
+        "node_executors": node_executors.stats(),
+        "node_latency": node_executors.latency.stats(),
+        "stream": {
+            "ttft": stream_ttft.stats(),
+            "duration": stream_duration.stats()
+        }
+    }
+
 @app.post("/api/workflows/execute", response_model=Dict[str, Any])
 async def execute_workflow(execution_request: WorkflowExecutionRequest):
-    """执行工作流"""
+    """执行工作流（trace=true 时在响应中附带节点级追踪）"""
+    if not execution_request.trace:
+        return await run_execution(execution_request)
+    trace = RunTrace()
+    token = current_trace.set(trace)
     try:
-        # 构建工作流
-        app_workflow = build_graph_from_config(execution_request.workflow_config)
+        response = await run_execution(execution_request)
+    except HTTPException as e:
+        # 执行失败时仍保存追踪记录，可通过响应头中的 trace_id 导出
+        e.headers = {**(e.headers or {}), "X-Trace-Id": trace.trace_id}
+        raise e
+    finally:
+        current_trace.reset(token)
+        trace.finish()
+        trace_store.put(trace)
+    return {**response, "trace": trace.summary()}
+
+@app.get("/api/traces/{trace_id}")
+async def get_trace(trace_id: str, format: str = Query("chrome", pattern="^(chrome|summary)$")):
+    """导出追踪记录：chrome 为 Chrome trace-event JSON（chrome://tracing / Perfetto），summary 为节点耗时汇总"""
+    trace = trace_store.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"追踪记录不存在或已过期: {trace_id}")
+    return trace.chrome_trace() if format == "chrome" else trace.summary()
+
+async def run_execution(execution_request: WorkflowExecutionRequest) -> Dict[str, Any]:
+    try:
+        # 取得编译后的工作流（相同配置直接复用缓存）
+        config, key = resolve_workflow_config(execution_request)
+        app_workflow, _ = graph_cache.get(config, key=key)
+        
+        if execution_request.checkpoint or execution_request.run_id is not None:
+            # 可恢复运行：登记运行后带检查点执行
+            run_id = execution_request.run_id or uuid.uuid4().hex
+            if not await require_run_store().create(run_id, key, config):
+                raise HTTPException(409, f"运行ID已存在: {run_id}，请使用 /api/runs/{run_id}/resume 继续执行")
+            result = await run_checkpointed(app_workflow, run_id, execution_request.initial_state)
+            return {
+                "message": "工作流执行成功",
+                "run_id": run_id,
+                "result": result
+            }
         
         # 执行工作流（使用异步API）
         result = await app_workflow.ainvoke(execution_request.initial_state)
@@ -149,13 +344,213 @@ async def execute_workflow(execution_request: WorkflowExecutionRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"工作流执行失败: {str(e)}")
 
+@app.post("/api/runs/{run_id}/resume")
+async def resume_run(run_id: str):
+    """从最后一个检查点继续执行失败或中断的运行，只重新执行未完成的节点"""
+    run, app_workflow = await load_run(run_id)
+    if run["status"] == "succeeded":
+        raise HTTPException(409, f"运行 {run_id} 已成功完成，无需恢复")
+    snapshot = await app_workflow.copy(update={"checkpointer": checkpointer}).aget_state(
+        {"configurable": {"thread_id": run_id}}
+    )
+    if not snapshot.next:
+        raise HTTPException(409, f"运行 {run_id} 没有可恢复的检查点，请重新执行")
+    await run_store.set_status(run_id, "running")
+    result = await run_checkpointed(app_workflow, run_id, None)
+    return {
+        "message": "工作流恢复执行成功",
+        "run_id": run_id,
+        "resumed_from": list(snapshot.next),
+        "result": result
+    }
+
+@app.get("/api/runs/{run_id}")
+async def get_run(run_id: str):
+    """查看运行状态及最新检查点的中间状态（next 为下一步待执行的节点）"""
+    run, app_workflow = await load_run(run_id)
+    snapshot = await app_workflow.copy(update={"checkpointer": checkpointer}).aget_state(
+        {"configurable": {"thread_id": run_id}}
+    )
+    return {
+        "run_id": run_id,
+        "workflow_id": run["workflow_id"],
+        "status": run["status"],
+        "error": run["error"],
+        "created_at": run["created_at"],
+        "updated_at": run["updated_at"],
+        "step": (snapshot.metadata or {}).get("step"),
+        "next": list(snapshot.next),
+        "state": snapshot.values
+    }
+
+@app.get("/api/runs/{run_id}/history")
+async def get_run_history(run_id: str, limit: int = Query(20, ge=1, le=200)):
+    """按时间倒序列出运行的检查点（每一步执行后的状态）"""
+    _, app_workflow = await load_run(run_id)
+    graph = app_workflow.copy(update={"checkpointer": checkpointer})
+    history = []
+    async for snapshot in graph.aget_state_history({"configurable": {"thread_id": run_id}}, limit=limit):
+        history.append({
+            "checkpoint_id": snapshot.config["configurable"].get("checkpoint_id"),
+            "step": (snapshot.metadata or {}).get("step"),
+            "source": (snapshot.metadata or {}).get("source"),
+            "created_at": snapshot.created_at,
+            "next": list(snapshot.next),
+            "state": snapshot.values
+        })
+    return {"run_id": run_id, "history": history}
+
+def sse_event(event: str, data: Any) -> str:
+    """格式化一条 Server-Sent Events 消息"""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+async def stream_workflow_events(app_workflow, initial_state: Dict[str, Any]):
+    """
+    把工作流的事件流转换为 SSE：
+    - node_start / node_end：节点开始与结束（node_end 附带节点输出）
+    - token：LLM 生成的 token
+    - done：执行完成，附带最终状态、首个 token 延迟与总耗时
+    - error：执行失败
+    """
+    start = time.perf_counter()
+    ttft = None
+    root_run_id = None
+    result = None
+    try:
+        async for event in app_workflow.astream_events(initial_state, version="v2"):
+            kind = event["event"]
+            node = event.get("metadata", {}).get("langgraph_node")
+            if root_run_id is None and kind == "on_chain_start" and not event.get("parent_ids"):
+                root_run_id = event["run_id"]
+            if kind == "on_chat_model_stream":
+                content = event["data"]["chunk"].content
+                if not isinstance(content, str) or not content:
+                    continue
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                    stream_ttft.record(ttft)
+                yield sse_event("token", {"node": node, "content": content})
+            elif kind in ("on_chain_start", "on_chain_end") and node and event["name"] == node:
+                if kind == "on_chain_start":
+                    yield sse_event("node_start", {"node": node, "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)})
+                else:
+                    yield sse_event("node_end", {
+                        "node": node,
+                        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+                        "output": event["data"].get("output")
+                    })
+            elif kind == "on_chain_end" and event["run_id"] == root_run_id:
+                result = event["data"].get("output")
+    except Exception as e:
+        yield sse_event("error", {"detail": f"工作流执行失败: {str(e)}"})
+        return
+    duration = time.perf_counter() - start
+    stream_duration.record(duration)
+    yield sse_event("done", {
+        "message": "工作流执行成功",
+        "result": result,
+        "ttft_ms": round(ttft * 1000, 2) if ttft is not None else None,
+        "duration_ms": round(duration * 1000, 2)
+    })
+
+@app.post("/api/workflows/execute/stream")
+async def execute_workflow_stream(execution_request: WorkflowExecutionRequest):
+    """流式执行工作流（Server-Sent Events），边执行边推送节点事件与 LLM token"""
+    try:
+        # 在开始推送之前解析工作流，配置错误仍以普通 HTTP 错误返回
+        app_workflow = resolve_workflow(execution_request)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"工作流配置无效: {str(e)}")
+    return StreamingResponse(
+        stream_workflow_events(app_workflow, execution_request.initial_state),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def run_batch_item(app_workflow, index: int, initial_state: Dict[str, Any], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    """执行批量中的一条，失败只影响该条的结果"""
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            result = await app_workflow.ainvoke(initial_state)
+            return {"index": index, "status": "ok", "result": result,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 2)}
+        except Exception as e:
+            return {"index": index, "status": "error", "error": f"工作流执行失败: {str(e)}",
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+def batch_summary(items: List[Dict[str, Any]], start: float) -> Dict[str, Any]:
+    failed = sum(1 for item in items if item["status"] == "error")
+    return {
+        "message": "批量执行完成",
+        "total": len(items),
+        "succeeded": len(items) - failed,
+        "failed": failed,
+        "duration_ms": round((time.perf_counter() - start) * 1000, 2)
+    }
+
+async def stream_batch_results(tasks: List[asyncio.Task], start: float):
+    """按完成顺序推送每条结果（item 事件），最后推送汇总（done 事件）"""
+    items = []
+    try:
+        for finished in asyncio.as_completed(tasks):
+            item = await finished
+            items.append(item)
+            yield sse_event("item", item)
+        yield sse_event("done", batch_summary(items, start))
+    finally:
+        # 客户端断开时取消尚未完成的条目
+        for task in tasks:
+            task.cancel()
+
+@app.post("/api/workflows/execute-batch")
+async def execute_workflow_batch(batch_request: WorkflowBatchRequest):
+    """
+    批量执行工作流：工作流只解析、编译一次，所有初始状态在并发上限内执行。
+    每条结果带有自己的状态与错误信息，个别失败不影响整批。
+    stream=false 时按输入顺序返回全部结果；stream=true 时以 SSE 按完成顺序推送。
+    """
+    if not batch_request.initial_states:
+        raise HTTPException(status_code=400, detail="initial_states 不能为空")
+    if len(batch_request.initial_states) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"单批最多 {BATCH_MAX_ITEMS} 条，当前 {len(batch_request.initial_states)} 条")
+    try:
+        app_workflow = resolve_workflow(batch_request)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"工作流配置无效: {str(e)}")
+
+    concurrency = max(1, min(batch_request.max_concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+    tasks = [
+        asyncio.create_task(run_batch_item(app_workflow, i, state, semaphore))
+        for i, state in enumerate(batch_request.initial_states)
+    ]
+    if batch_request.stream:
+        return StreamingResponse(
+            stream_batch_results(tasks, start),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    try:
+        items = await asyncio.gather(*tasks)
+    except asyncio.CancelledError:
+        for task in tasks:
+            task.cancel()
+        raise
+    return {**batch_summary(items, start), "concurrency": concurrency, "results": items}
+
 @app.post("/api/workflows/test", response_model=Dict[str, Any])
 async def test_simple_workflow():
     """测试简单工作流的执行"""
     # 创建一个简单的工作流配置
     simple_config = WorkflowConfig(
         nodes=[
-            NodeConfig(id="step1", type="llm_node"),
+            NodeConfig(id="step1", type="llm_node", config={"temperature": 0, "cache": True}),
             NodeConfig(id="step2", type="uppercase_node")
         ],
         edges=[
@@ -169,7 +564,7 @@ async def test_simple_workflow():
     try:
         app_workflow = build_graph_from_config(simple_config)
         initial_state = {"messages": [("user", "hello world")]}
-        result = app_workflow.invoke(initial_state)
+        result = await app_workflow.ainvoke(initial_state)
         
         return {
             "message": "测试工作流执行成功",
@@ -1,8 +1,10 @@
-from .workflow_models import NodeConfig, EdgeConfig, WorkflowConfig, WorkflowExecutionRequest
+from .workflow_models import NodeConfig, EdgeConfig, WorkflowConfig, WorkflowSelection, WorkflowExecutionRequest, WorkflowBatchRequest
 
 __all__ = [
     "NodeConfig",
     "EdgeConfig",
     "WorkflowConfig",
-    "WorkflowExecutionRequest"
+    "WorkflowSelection",
+    "WorkflowExecutionRequest",
+    "WorkflowBatchRequest"
 ]
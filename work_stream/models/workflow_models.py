@@ -1,11 +1,12 @@
-from pydantic import BaseModel
-from typing import List, Dict, Any
+from pydantic import BaseModel, model_validator
+from typing import List, Dict, Any, Optional
 
 
 class NodeConfig(BaseModel):
     """节点配置模型"""
     id: str
     type: str
+    config: Optional[Dict[str, Any]] = None  # 节点参数，如 LLM 节点的 model / temperature / cache
 
 
 class EdgeConfig(BaseModel):
@@ -13,9 +14,9 @@ class EdgeConfig(BaseModel):
     source: str
     target: str
     is_condition: bool = False
-    condition_type: str = None
-    route_function: str = None
-    path_map: Dict[str, str] = None
+    condition_type: Optional[str] = None
+    route_function: Optional[str] = None
+    path_map: Optional[Dict[str, str]] = None
 
 
 class WorkflowConfig(BaseModel):
@@ -24,7 +25,28 @@ class WorkflowConfig(BaseModel):
     edges: List[EdgeConfig]
 
 
-class WorkflowExecutionRequest(BaseModel):
+class WorkflowSelection(BaseModel):
+    """指定要执行的工作流：workflow_config 与 workflow_id（已注册的工作流）二选一"""
+    workflow_config: Optional[WorkflowConfig] = None
+    workflow_id: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_workflow(self):
+        if (self.workflow_config is None) == (self.workflow_id is None):
+            raise ValueError("workflow_config 与 workflow_id 必须且只能提供一个")
+        return self
+
+
+class WorkflowExecutionRequest(WorkflowSelection):
     """工作流执行请求模型"""
-    workflow_config: WorkflowConfig
     initial_state: Dict[str, Any]
+    checkpoint: bool = False  # 为 true 时保存每一步的检查点，失败后可从失败的节点恢复
+    run_id: Optional[str] = None  # 可恢复运行的ID；指定时自动开启检查点，不指定则自动生成
+    trace: bool = False  # 为 true 时在响应中返回每个节点的耗时、token 用量与状态大小
+
+
+class WorkflowBatchRequest(WorkflowSelection):
+    """批量执行请求模型：同一工作流、多个初始状态"""
+    initial_states: List[Dict[str, Any]]
+    max_concurrency: Optional[int] = None  # 并发上限，默认 WORKFLOW_BATCH_CONCURRENCY
+    stream: bool = False  # 为 true 时按完成顺序以 SSE 推送每条结果
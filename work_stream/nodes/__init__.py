@@ -1,7 +1,7 @@
 # 导出所有节点函数
 from .llm_node import node_llm
 from .text_processing import node_uppercase, node_lowercase
-from .quadratic_equation import node_quadratic_equation
+from .quadratic_equation import node_quadratic_equation, node_quadratic_equation_batch
 
 # 从condition_node导入函数
 from .condition_node import classify_input, decide_next_node, handle_search, handle_chat
@@ -12,6 +12,7 @@ __all__ = [
     "node_uppercase",
     "node_lowercase",
     "node_quadratic_equation",
+    "node_quadratic_equation_batch",
     "classify_input",
     "decide_next_node",
     "handle_search",
@@ -1,19 +1,27 @@
-from typing import Dict, Any, List
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
+from typing import Dict, Any, List, Optional
+from langchain_core.messages import BaseMessage, HumanMessage, ToolMessage
 from langchain_core.tools import tool, StructuredTool
 from pydantic import BaseModel, Field
 import os
 import json
+import time
+import asyncio
 
 # 导入工具
-from tools.quadratic_solver_tool import solve_quadratic_equation, tool_metadata
+from tools.quadratic_solver_tool import solve_quadratic_equation, solve_quadratic_equations, tool_metadata
+from services.llm_client import get_chat_model, default_base_url
+from services.llm_cache import get_llm_cache, cache_key
+from services.run_store import current_run_id
 
 # 定义工具参数模型
 class QuadraticEquationArgs(BaseModel):
     """解二次方程工具的参数模型"""
     equation: str = Field(..., description='要解的二次方程，可以是 "a,b,c" 格式或 "ax² + bx + c = 0" 格式')
 
+class QuadraticEquationBatchArgs(BaseModel):
+    """批量解二次方程工具的参数模型"""
+    equations: List[str] = Field(..., description='要解的二次方程列表，每个方程可以是 "a,b,c" 格式或 "ax² + bx + c = 0" 格式')
+
 # 将函数转换为结构化工具
 def _solve_quadratic_equation_wrapper(equation: str) -> str:
     """解一元二次方程的工具包装器"""
@@ -27,11 +35,75 @@ quadratic_tool = StructuredTool.from_function(
     args_schema=QuadraticEquationArgs
 )
 
+# 批量求解工具：需要解多个方程时一次调用即可
+quadratic_batch_tool = StructuredTool.from_function(
+    func=solve_quadratic_equations,
+    name="solve_quadratic_equations",
+    description="批量解一元二次方程的工具，需要同时求解多个方程时使用，一次调用传入全部方程",
+    args_schema=QuadraticEquationBatchArgs
+)
+
 # 工具列表
-tools = [quadratic_tool]
+tools = [quadratic_tool, quadratic_batch_tool]
+
+# 按名称查找工具
+tools_by_name = {t.name: t for t in tools}
 
-async def node_llm(state: Dict[str, Any]):
-    """LLM 节点：使用通义千问生成AI回复，支持工具调用"""
+def _cache_enabled(node_config: Dict[str, Any]) -> bool:
+    """响应缓存需要节点显式开启；temperature > 0 的节点输出不确定，不缓存"""
+    temperature = node_config.get("temperature")
+    return bool(node_config.get("cache")) and (temperature is None or temperature <= 0)
+
+async def _call_model(messages: List[BaseMessage], model: str, api_key: str,
+                      temperature: Optional[float], node_config: Dict[str, Any]) -> BaseMessage:
+    """调用模型生成一轮回复；开启缓存的节点先查磁盘缓存，命中时不调用模型"""
+    cache = get_llm_cache() if _cache_enabled(node_config) else None
+    key = None
+    if cache is not None:
+        key = cache_key(model, default_base_url(), messages, tools, {"temperature": temperature})
+        cached = await cache.get(key)
+        if cached:
+            return cached[0]
+    
+    # 取得共享的通义千问模型客户端（进程内复用，工具只绑定一次）
+    llm_with_tools = get_chat_model(model, api_key=api_key, tools=tools, temperature=temperature)
+    
+    # 异步调用模型生成回复，等待期间不阻塞事件循环
+    response = await llm_with_tools.ainvoke(messages)
+    if cache is not None:
+        await cache.put(key, [response], node_config.get("cache_ttl"))
+    return response
+
+async def _run_tool(tool_call: Dict[str, Any]) -> ToolMessage:
+    """执行一次工具调用，结果（包括错误）以 ToolMessage 返回给模型"""
+    tool = tools_by_name.get(tool_call["name"])
+    if tool is None:
+        return ToolMessage(content=f"未知工具: {tool_call['name']}", tool_call_id=tool_call["id"],
+                           name=tool_call["name"], status="error")
+    try:
+        if tool.coroutine is not None:
+            result = await tool.ainvoke(tool_call["args"])
+        else:
+            # 同步工具放到线程池中执行，避免阻塞事件循环
+            result = await asyncio.to_thread(tool.invoke, tool_call["args"])
+        return ToolMessage(content=str(result), tool_call_id=tool_call["id"], name=tool.name)
+    except Exception as e:
+        return ToolMessage(content=f"工具调用失败: {str(e)}", tool_call_id=tool_call["id"],
+                           name=tool.name, status="error")
+
+async def node_llm(state: Dict[str, Any], node_config: Optional[Dict[str, Any]] = None):
+    """
+    LLM 节点：使用通义千问生成AI回复，支持多轮工具调用
+    每轮回复中的全部工具调用并发执行，结果以工具消息返回模型，直到模型不再调用工具，
+    轮数与总耗时分别受 max_iterations 与 deadline（秒）限制。
+    节点配置（NodeConfig.config）可选项：model、temperature、cache（是否缓存响应）、cache_ttl（秒）、
+    max_iterations、deadline
+    带检查点执行时，LLM 调用失败（含未设置 API 密钥、超过截止时间）直接抛出，运行记为失败，可从本节点恢复；
+    其他情况下错误以 AI 消息返回。
+    """
+    checkpointed = current_run_id.get() is not None
+    node_config = node_config or {}
+    new_messages: List[Any] = []
     try:
         # 获取最后一条用户消息
         last_msg = state["messages"][-1]
@@ -43,33 +115,45 @@ async def node_llm(state: Dict[str, Any]):
         # 检查API密钥是否存在
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
+            if checkpointed:
+                raise RuntimeError("未设置 OPENAI_API_KEY 环境变量")
             return {"messages": [("ai", "错误：未设置 OPENAI_API_KEY 环境变量。请在 .env 文件中添加您的API密钥。")]}
         
-        # 初始化通义千问模型，添加工具
-        llm = ChatOpenAI(
-            model="qwen-turbo",
-            api_key=api_key,
-            base_url=os.getenv("OPENAI_API_BASE", "https://dashscope.aliyuncs.com/compatible-mode/v1")
-        )
+        model = node_config.get("model") or os.getenv("LLM_MODEL", "qwen-turbo")
+        temperature = node_config.get("temperature")
+        max_iterations = int(node_config.get("max_iterations") or os.getenv("LLM_TOOL_MAX_ITERATIONS", "5"))
+        deadline = time.monotonic() + float(node_config.get("deadline") or os.getenv("LLM_NODE_DEADLINE", "120"))
+        messages: List[BaseMessage] = [HumanMessage(content=user_content)]
         
-        # 将LLM与工具绑定
-        llm_with_tools = llm.bind_tools(tools)
-        
-        # 调用模型生成回复
-        response = llm_with_tools.invoke([HumanMessage(content=user_content)])
-        
-        # 处理工具调用
-        if hasattr(response, 'tool_calls') and response.tool_calls:
-            tool_call = response.tool_calls[0]
-            if tool_call['name'] == 'solve_quadratic_equation':
-                # 执行工具调用
-                equation = tool_call['args']['equation']
-                result = solve_quadratic_equation(equation)
-                # 将工具调用结果添加到消息中（使用与response相同的格式）
-                return {"messages": [response, ("ai", result)]}
+        for _ in range(max_iterations):
+            response = await asyncio.wait_for(
+                _call_model(messages, model, api_key, temperature, node_config),
+                timeout=max(0.0, deadline - time.monotonic())
+            )
+            new_messages.append(response)
+            if not getattr(response, "tool_calls", None):
+                return {"messages": new_messages}
+            
+            # 本轮的全部工具调用并发执行
+            tool_messages = await asyncio.wait_for(
+                asyncio.gather(*(_run_tool(call) for call in response.tool_calls)),
+                timeout=max(0.0, deadline - time.monotonic())
+            )
+            new_messages.extend(tool_messages)
+            messages = messages + [response, *tool_messages]
         
-        return {"messages": [response]}
+        # 达到最大轮数时模型仍在调用工具，直接返回最后一轮的工具结果
+        results = "\n".join(m.content for m in new_messages[-len(response.tool_calls):])
+        new_messages.append(("ai", f"已达到最大工具调用轮数（{max_iterations}），最后一轮工具结果：\n{results}"))
+        return {"messages": new_messages}
+    except asyncio.TimeoutError:
+        if checkpointed:
+            raise TimeoutError("LLM调用超过节点截止时间")
+        new_messages.append(("ai", "LLM调用失败: 超过节点截止时间，已停止工具调用循环"))
+        return {"messages": new_messages}
     except Exception as e:
+        if checkpointed:
+            raise
         # 如果LLM调用失败，返回详细错误信息
         error_msg = f"LLM调用失败: {str(e)}"
         # 添加调试信息
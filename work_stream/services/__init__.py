@@ -0,0 +1,9 @@
+from .graph_cache import CompiledGraphCache, WorkflowRegistry, workflow_key
+from .llm_client import get_chat_model
+
+__all__ = [
+    "CompiledGraphCache",
+    "WorkflowRegistry",
+    "workflow_key",
+    "get_chat_model"
+]
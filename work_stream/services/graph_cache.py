@@ -0,0 +1,99 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from models import WorkflowConfig
+
+
+def workflow_key(config: WorkflowConfig) -> str:
+    """
+    工作流配置的规范化哈希：字段按键排序，节点与边按内容排序，
+    因此只是顺序不同的同一张图会得到同一个键。
+    """
+    data = config.model_dump(mode="json")
+    nodes = sorted(json.dumps(n, sort_keys=True, ensure_ascii=False) for n in data["nodes"])
+    edges = sorted(json.dumps(e, sort_keys=True, ensure_ascii=False) for e in data["edges"])
+    canonical = json.dumps({"nodes": nodes, "edges": edges}, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CompiledGraphCache:
+    """
+    已编译工作流的 LRU 缓存：同一配置只构建、编译一次。
+    编译后的图不保存执行状态，可被并发请求共享。构建失败（配置无效）不会被缓存。
+    """
+
+    def __init__(self, builder: Callable[[WorkflowConfig], Any], max_size: int = 128):
+        self.builder = builder
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self._graphs: "OrderedDict[str, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, config: WorkflowConfig, key: Optional[str] = None) -> Tuple[Any, str]:
+        """返回 (编译后的图, 配置哈希)"""
+        key = key or workflow_key(config)
+        with self.lock:
+            graph = self._graphs.get(key)
+            if graph is not None:
+                self._graphs.move_to_end(key)
+                self.hits += 1
+                return graph, key
+            self.misses += 1
+        # 在锁外构建，避免编译耗时阻塞其他请求；并发构建同一配置时以先写入的为准
+        graph = self.builder(config)
+        with self.lock:
+            graph = self._graphs.setdefault(key, graph)
+            self._graphs.move_to_end(key)
+            while len(self._graphs) > self.max_size:
+                self._graphs.popitem(last=False)
+                self.evictions += 1
+        return graph, key
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._graphs),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+            }
+
+
+class WorkflowRegistry:
+    """
+    已注册的工作流：注册时校验一次配置，返回工作流ID（配置哈希），之后按ID执行，
+    不必每次重新发送与校验配置。ID 由内容决定，重复注册同一配置得到同一个ID。
+    超过上限时淘汰最久未使用的注册，客户端收到 404 后重新注册即可。
+    """
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self._configs: "OrderedDict[str, WorkflowConfig]" = OrderedDict()
+
+    def register(self, config: WorkflowConfig, key: str) -> str:
+        with self.lock:
+            self._configs[key] = config
+            self._configs.move_to_end(key)
+            while len(self._configs) > self.max_size:
+                self._configs.popitem(last=False)
+        return key
+
+    def get(self, workflow_id: str) -> Optional[WorkflowConfig]:
+        with self.lock:
+            config = self._configs.get(workflow_id)
+            if config is not None:
+                self._configs.move_to_end(workflow_id)
+            return config
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self._configs)
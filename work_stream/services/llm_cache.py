@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+def _normalize_message(message: BaseMessage) -> Dict[str, Any]:
+    """只保留影响模型输出的字段（去掉 id、response_metadata 等每次都不同的内容）"""
+    data = {"type": message.type, "content": message.content}
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        data["tool_calls"] = [{"name": c["name"], "args": c["args"], "id": c.get("id")} for c in tool_calls]
+    if getattr(message, "tool_call_id", None):
+        data["tool_call_id"] = message.tool_call_id
+    return data
+
+
+def cache_key(model: str, base_url: str, messages: Sequence[BaseMessage],
+              tools: Sequence = (), params: Optional[Dict[str, Any]] = None) -> str:
+    """按模型、接口地址、规范化后的消息、绑定工具的 schema 与采样参数计算缓存键"""
+    payload = {
+        "model": model,
+        "base_url": base_url,
+        "messages": [_normalize_message(m) for m in messages],
+        "tools": [convert_to_openai_tool(t) for t in tools],
+        "params": params or {}
+    }
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    LLM 响应的磁盘缓存（SQLite）：
+    - 条目超过 ttl 秒即失效
+    - 条目数超过 max_entries 或总大小超过 max_bytes 时按最近使用时间淘汰
+    数据库操作在线程池中执行，不阻塞事件循环。
+    """
+
+    # 每写入若干条执行一次淘汰，避免每次写入都扫描全表
+    PURGE_EVERY = 32
+
+    def __init__(self, path: str, ttl: float = 86400, max_entries: int = 10000, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, last_used REAL NOT NULL) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)")
+            self._conn = conn
+        return self._conn
+
+    def _get(self, key: str) -> Optional[List[BaseMessage]]:
+        now = time.time()
+        with self.lock:
+            db = self._db()
+            row = db.execute("SELECT response, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            db.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return messages_from_dict(json.loads(row[0]))
+
+    def _put(self, key: str, messages: List[BaseMessage], ttl: Optional[float]) -> None:
+        data = json.dumps([message_to_dict(m) for m in messages], ensure_ascii=False)
+        now = time.time()
+        with self.lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, size, expires_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data.encode("utf-8")), now + (ttl if ttl is not None else self.ttl), now)
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._purge(db, now)
+
+    def _purge(self, db: sqlite3.Connection, now: float) -> None:
+        removed = db.execute("DELETE FROM llm_cache WHERE expires_at < ?", (now,)).rowcount
+        removed += db.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+        removed += db.execute(
+            "DELETE FROM llm_cache WHERE key IN (SELECT key FROM ("
+            "SELECT key, SUM(size) OVER (ORDER BY last_used DESC) AS total FROM llm_cache) WHERE total > ?)",
+            (self.max_bytes,)
+        ).rowcount
+        self.evictions += removed
+
+    async def get(self, key: str) -> Optional[List[BaseMessage]]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def put(self, key: str, messages: List[BaseMessage], ttl: Optional[float] = None) -> None:
+        await asyncio.to_thread(self._put, key, messages, ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            if self._conn is None:
+                entries, size = 0, 0
+            else:
+                entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+            total = self.hits + self.misses
+            return {
+                "entries": entries,
+                "bytes": size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """进程内共享的响应缓存；LLM_CACHE_ENABLED=0 时整体关闭"""
+    global _cache
+    if os.getenv("LLM_CACHE_ENABLED", "1") != "1":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMResponseCache(
+                    os.getenv("LLM_CACHE_PATH", os.path.join("data", "llm_cache.db")),
+                    ttl=float(os.getenv("LLM_CACHE_TTL", "86400")),
+                    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+                    max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024)
+                )
+    return _cache
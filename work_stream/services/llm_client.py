@@ -0,0 +1,52 @@
+import os
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+from langchain_openai import ChatOpenAI
+
+DEFAULT_MODEL = "qwen-turbo"
+DEFAULT_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+
+# 进程内共享的模型客户端：(模型, base_url, api_key, temperature, 工具名) -> 已绑定工具的模型
+# ChatOpenAI 内部持有 AsyncOpenAI 客户端及其 HTTP 连接池，复用同一实例即可复用连接
+_clients: Dict[Tuple, object] = {}
+_lock = threading.Lock()
+
+
+def default_base_url() -> str:
+    return os.getenv("OPENAI_API_BASE", DEFAULT_BASE_URL)
+
+
+def get_chat_model(model: str = DEFAULT_MODEL, base_url: Optional[str] = None,
+                   api_key: Optional[str] = None, tools: Sequence = (),
+                   temperature: Optional[float] = None):
+    """
+    取得共享的模型客户端，首次使用时创建并绑定工具，之后直接复用。
+    base_url / api_key 为空时读取环境变量 OPENAI_API_BASE / OPENAI_API_KEY。
+    """
+    base_url = base_url or default_base_url()
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    key = (model, base_url, api_key, temperature, tuple(t.name for t in tools))
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            kwargs = {"temperature": temperature} if temperature is not None else {}
+            llm = ChatOpenAI(
+                model=model,
+                api_key=api_key,
+                base_url=base_url,
+                timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+                max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+                **kwargs
+            )
+            client = llm.bind_tools(list(tools)) if tools else llm
+            _clients[key] = client
+            print(f"[LLMClient] 创建模型客户端: {model} @ {base_url}")
+        return client
+
+
+def client_count() -> int:
+    return len(_clients)
@@ -0,0 +1,36 @@
+import threading
+from collections import deque
+from typing import Dict
+
+
+class LatencyStats:
+    """延迟统计：保留最近 window 个样本，计算均值与分位数（毫秒）"""
+
+    def __init__(self, window: int = 1024):
+        self.lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds: float) -> None:
+        with self.lock:
+            self._samples.append(seconds * 1000.0)
+            self.count += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            samples = sorted(self._samples)
+            count = self.count
+        if not samples:
+            return {"count": count}
+
+        def pct(p: float) -> float:
+            return round(samples[min(len(samples) - 1, int(p / 100.0 * len(samples)))], 2)
+
+        return {
+            "count": count,
+            "mean_ms": round(sum(samples) / len(samples), 2),
+            "p50_ms": pct(50),
+            "p95_ms": pct(95),
+            "p99_ms": pct(99),
+            "max_ms": round(samples[-1], 2)
+        }
@@ -0,0 +1,148 @@
+import asyncio
+import inspect
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from .tracing import NodeLatencyHistograms, current_trace
+
+EXECUTORS = ("inline", "thread", "process")
+
+
+def _timed(func: Callable, state: Dict[str, Any]):
+    """在执行方（线程/子进程）中记录实际开始与结束时间，用于区分排队时间与执行时间"""
+    started = time.time()
+    result = func(state)
+    return started, time.time(), result
+
+
+async def _timed_async(func: Callable, state: Dict[str, Any]):
+    started = time.time()
+    result = await func(state)
+    return started, time.time(), result
+
+
+class NodeSpec:
+    """
+    节点注册信息：节点函数及其执行方式
+    - inline：按 LangGraph 默认方式执行：异步节点在事件循环中执行，同步节点在事件循环的默认线程池中执行
+      （该线程池与 asyncio.to_thread 等调用共用），适合异步节点和轻量的同步节点
+    - thread：在独立的节点线程池中执行，适合会长时间阻塞的同步节点（同步 I/O、释放 GIL 的计算库），
+      不会占满默认线程池
+    - process：在进程池中执行，适合纯 Python 的 CPU 密集型节点（不受 GIL 限制）；
+      函数必须是模块级同步函数，状态与返回值需可序列化
+    timeout 为节点执行的超时时间（秒），为空表示不限制。
+    """
+
+    __slots__ = ("func", "executor", "timeout", "is_async")
+
+    def __init__(self, func: Callable, executor: str = "inline", timeout: Optional[float] = None):
+        if executor not in EXECUTORS:
+            raise ValueError(f"未知执行方式: {executor}，可选：{', '.join(EXECUTORS)}")
+        self.func = func
+        self.executor = executor
+        self.timeout = timeout
+        self.is_async = inspect.iscoroutinefunction(func)
+        if self.is_async and executor != "inline":
+            raise ValueError(f"异步节点 {func.__name__} 只能使用 inline 执行方式")
+
+    def accepts_config(self) -> bool:
+        return "node_config" in inspect.signature(self.func).parameters
+
+
+class NodeExecutors:
+    """节点执行池：按 NodeSpec 把节点函数包装为异步节点，线程池与进程池在首次使用时创建"""
+
+    def __init__(self, thread_workers: int, process_workers: int, start_method: str = "spawn"):
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.start_method = start_method
+        self.lock = threading.Lock()
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self.counters: Counter = Counter()
+        self.latency = NodeLatencyHistograms()
+
+    def _pool(self, executor: str):
+        with self.lock:
+            if executor == "thread":
+                if self._threads is None:
+                    self._threads = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="workflow-node")
+                return self._threads
+            if self._processes is None:
+                # 默认 spawn：服务进程是多线程的，fork 可能在子进程中继承被持有的锁
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context(self.start_method)
+                )
+            return self._processes
+
+    def wrap(self, name: str, node_type: str, spec: NodeSpec, node_config: Optional[Dict[str, Any]] = None) -> Callable:
+        """
+        返回可直接加入 StateGraph 的异步节点函数。
+        每次执行都按节点类型记录耗时直方图；当前执行开启追踪时另外记录排队时间、token 用量与状态大小。
+        """
+        func = partial(spec.func, node_config=node_config) if node_config else spec.func
+
+        async def run_node(state: Dict[str, Any]):
+            submitted = time.time()
+            if spec.is_async:
+                call = _timed_async(func, state)
+            elif spec.executor == "inline":
+                call = asyncio.to_thread(_timed, func, state)
+            else:
+                loop = asyncio.get_running_loop()
+                call = loop.run_in_executor(self._pool(spec.executor), _timed, func, state)
+            with self.lock:
+                self.counters[spec.executor] += 1
+            try:
+                started, finished, result = await asyncio.wait_for(call, timeout=spec.timeout)
+            except Exception as e:
+                now = time.time()
+                self.latency.record(node_type, now - submitted, 0.0, error=True)
+                trace = current_trace.get()
+                if trace is not None:
+                    trace.add_node(name, node_type, spec.executor, submitted, submitted, now, state, error=str(e) or type(e).__name__)
+                if isinstance(e, asyncio.TimeoutError):
+                    # 已提交到池中的任务无法中断，会在后台执行完毕，结果被丢弃
+                    with self.lock:
+                        self.counters["timeouts"] += 1
+                    raise TimeoutError(f"节点 {name} 执行超过 {spec.timeout}s")
+                raise
+            self.latency.record(node_type, finished - started, started - submitted)
+            trace = current_trace.get()
+            if trace is not None:
+                trace.add_node(name, node_type, spec.executor, submitted, started, finished, state, result)
+            return result
+
+        run_node.__name__ = name
+        return run_node
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "thread_workers": self.thread_workers,
+            "process_workers": self.process_workers,
+            "process_pool_started": self._processes is not None,
+            **dict(self.counters)
+        }
+
+    def shutdown(self) -> None:
+        with self.lock:
+            if self._threads is not None:
+                self._threads.shutdown(wait=False, cancel_futures=True)
+            if self._processes is not None:
+                self._processes.shutdown(wait=False, cancel_futures=True)
+            self._threads = self._processes = None
+
+
+def executors_from_env() -> NodeExecutors:
+    return NodeExecutors(
+        thread_workers=int(os.getenv("WORKFLOW_THREAD_POOL_SIZE", str(min(32, (os.cpu_count() or 1) + 4)))),
+        process_workers=int(os.getenv("WORKFLOW_PROCESS_POOL_SIZE", str(os.cpu_count() or 1))),
+        start_method=os.getenv("WORKFLOW_PROCESS_START_METHOD", "spawn")
+    )
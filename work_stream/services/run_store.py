@@ -0,0 +1,98 @@
+import json
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from models import WorkflowConfig
+
+try:
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+except ImportError:  # 未安装 langgraph-checkpoint-sqlite 时不支持可恢复运行
+    aiosqlite = None
+    AsyncSqliteSaver = None
+
+# 当前带检查点执行的运行ID；不为 None 时节点应抛出可重试的错误（如 LLM 调用失败），
+# 让运行记为失败、可从失败的节点恢复，而不是把错误写成消息后记为成功
+current_run_id: ContextVar[Optional[str]] = ContextVar("workflow_run_id", default=None)
+
+
+class RunStore:
+    """
+    可恢复运行的元信息：运行ID -> 工作流配置、状态（running / succeeded / failed）与错误信息。
+    与检查点共用同一个 SQLite 连接及其锁；检查点本身（每一步后的状态）由 AsyncSqliteSaver 按 thread_id=运行ID 保存。
+    """
+
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+
+    async def setup(self) -> None:
+        async with self.lock:
+            await self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS workflow_runs ("
+                "run_id TEXT PRIMARY KEY, workflow_key TEXT NOT NULL, workflow_config TEXT NOT NULL, "
+                "status TEXT NOT NULL, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            await self.conn.commit()
+
+    async def create(self, run_id: str, workflow_key: str, workflow_config: WorkflowConfig) -> bool:
+        """登记新的运行，运行ID已存在时返回 False"""
+        now = time.time()
+        async with self.lock:
+            cursor = await self.conn.execute(
+                "INSERT OR IGNORE INTO workflow_runs (run_id, workflow_key, workflow_config, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'running', ?, ?)",
+                (run_id, workflow_key, json.dumps(workflow_config.model_dump(mode="json"), ensure_ascii=False), now, now)
+            )
+            await self.conn.commit()
+        return cursor.rowcount == 1
+
+    async def set_status(self, run_id: str, status: str, error: Optional[str] = None) -> None:
+        async with self.lock:
+            await self.conn.execute(
+                "UPDATE workflow_runs SET status = ?, error = ?, updated_at = ? WHERE run_id = ?",
+                (status, error, time.time(), run_id)
+            )
+            await self.conn.commit()
+
+    async def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        async with self.lock, self.conn.execute(
+            "SELECT workflow_key, workflow_config, status, error, created_at, updated_at FROM workflow_runs WHERE run_id = ?",
+            (run_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        return {
+            "run_id": run_id,
+            "workflow_id": row[0],
+            "workflow_config": WorkflowConfig(**json.loads(row[1])),
+            "status": row[2],
+            "error": row[3],
+            "created_at": row[4],
+            "updated_at": row[5]
+        }
+
+
+async def open_run_storage(path: str) -> Tuple[Any, Optional[RunStore]]:
+    """打开检查点数据库，返回 (检查点保存器, 运行元信息存储)；依赖未安装时返回 (None, None)"""
+    if AsyncSqliteSaver is None:
+        print("[RunStore] 未安装 langgraph-checkpoint-sqlite，可恢复运行不可用")
+        return None, None
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = await aiosqlite.connect(path)
+    await conn.execute("PRAGMA journal_mode=WAL")
+    await conn.execute("PRAGMA synchronous=NORMAL")
+    saver = AsyncSqliteSaver(conn)
+    await saver.setup()
+    run_store = RunStore(conn, saver.lock)
+    await run_store.setup()
+    print(f"[RunStore] 检查点数据库: {path}")
+    return saver, run_store
+
+
+async def close_run_storage(saver) -> None:
+    if saver is not None:
+        await saver.conn.close()
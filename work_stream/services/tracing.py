@@ -0,0 +1,162 @@
+import bisect
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+# 节点耗时直方图的桶上界（毫秒），最后一个桶收集更慢的执行
+LATENCY_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 30000)
+
+# 当前执行的追踪记录；未开启追踪时为 None，节点包装层只多一次 ContextVar 读取
+current_trace: ContextVar[Optional["RunTrace"]] = ContextVar("workflow_trace", default=None)
+
+
+def _state_bytes(value: Any) -> int:
+    try:
+        return len(json.dumps(jsonable_encoder(value), ensure_ascii=False, default=str).encode("utf-8"))
+    except Exception:
+        return -1
+
+
+def _token_usage(output: Any) -> Dict[str, int]:
+    """汇总节点输出消息中的 LLM token 用量（usage_metadata）"""
+    usage = {"input_tokens": 0, "output_tokens": 0}
+    messages = output.get("messages", []) if isinstance(output, dict) else []
+    for message in messages:
+        meta = getattr(message, "usage_metadata", None)
+        if meta:
+            usage["input_tokens"] += meta.get("input_tokens", 0)
+            usage["output_tokens"] += meta.get("output_tokens", 0)
+    return usage
+
+
+class RunTrace:
+    """
+    一次工作流执行的追踪记录：每个节点的排队时间、执行时间、LLM token 用量与状态大小。
+    时间使用 time.time()，进程池中执行的节点也能与主进程的时间对齐。
+    """
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.started = time.time()
+        self.finished = None
+        self.spans: List[Dict[str, Any]] = []
+        self.lock = threading.Lock()
+
+    def add_node(self, node: str, node_type: str, executor: str, submitted: float, started: float,
+                 finished: float, state: Any, output: Any = None, error: Optional[str] = None) -> None:
+        span = {
+            "node": node,
+            "type": node_type,
+            "executor": executor,
+            "start_ms": round((submitted - self.started) * 1000, 3),
+            "queue_ms": round((started - submitted) * 1000, 3),
+            "wall_ms": round((finished - started) * 1000, 3),
+            "state_bytes": _state_bytes(state),
+            "output_bytes": _state_bytes(output) if output is not None else 0,
+            **_token_usage(output)
+        }
+        if error is not None:
+            span["error"] = error
+        with self.lock:
+            self.spans.append(span)
+
+    def finish(self) -> None:
+        self.finished = time.time()
+
+    def summary(self) -> Dict[str, Any]:
+        end = self.finished or time.time()
+        with self.lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+        return {
+            "trace_id": self.trace_id,
+            "total_ms": round((end - self.started) * 1000, 3),
+            "nodes": spans
+        }
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """导出为 Chrome trace-event 格式（可在 chrome://tracing 或 Perfetto 中打开）"""
+        events = []
+        lanes: List[float] = []
+        for span in self.summary()["nodes"]:
+            start_us = span["start_ms"] * 1000
+            end_us = start_us + (span["queue_ms"] + span["wall_ms"]) * 1000
+            # 并发执行的节点放到不同的轨道上
+            lane = next((i for i, busy_until in enumerate(lanes) if busy_until <= start_us), len(lanes))
+            if lane == len(lanes):
+                lanes.append(end_us)
+            else:
+                lanes[lane] = end_us
+            args = {k: v for k, v in span.items() if k not in ("node", "type", "start_ms")}
+            if span["queue_ms"] > 0:
+                events.append({"name": f"{span['node']} (排队)", "cat": "queue", "ph": "X", "pid": 1, "tid": lane,
+                               "ts": start_us, "dur": span["queue_ms"] * 1000})
+            events.append({"name": span["node"], "cat": span["type"], "ph": "X", "pid": 1, "tid": lane,
+                           "ts": start_us + span["queue_ms"] * 1000, "dur": span["wall_ms"] * 1000, "args": args})
+        events.append({"name": "process_name", "ph": "M", "pid": 1, "args": {"name": f"workflow {self.trace_id}"}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+class TraceStore:
+    """保留最近的若干条追踪记录，供按 trace_id 导出"""
+
+    def __init__(self, max_size: int = 100):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self._traces: "OrderedDict[str, RunTrace]" = OrderedDict()
+
+    def put(self, trace: RunTrace) -> None:
+        with self.lock:
+            self._traces[trace.trace_id] = trace
+            while len(self._traces) > self.max_size:
+                self._traces.popitem(last=False)
+
+    def get(self, trace_id: str) -> Optional[RunTrace]:
+        with self.lock:
+            return self._traces.get(trace_id)
+
+
+class NodeLatencyHistograms:
+    """按节点类型聚合的执行耗时与排队耗时直方图（始终开启，开销为一次加锁计数）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, node_type: str, wall: float, queue: float, error: bool = False) -> None:
+        wall_ms, queue_ms = wall * 1000.0, queue * 1000.0
+        with self.lock:
+            stats = self._stats.get(node_type)
+            if stats is None:
+                stats = self._stats[node_type] = {
+                    "count": 0, "errors": 0, "total_ms": 0.0, "queue_total_ms": 0.0, "max_ms": 0.0,
+                    "histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1)
+                }
+            stats["count"] += 1
+            stats["errors"] += int(error)
+            stats["total_ms"] += wall_ms
+            stats["queue_total_ms"] += queue_ms
+            stats["max_ms"] = max(stats["max_ms"], wall_ms)
+            stats["histogram"][bisect.bisect_left(LATENCY_BUCKETS_MS, wall_ms)] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "latency_buckets_ms": list(LATENCY_BUCKETS_MS) + ["+Inf"],
+                "nodes": {
+                    node_type: {
+                        "count": s["count"],
+                        "errors": s["errors"],
+                        "mean_ms": round(s["total_ms"] / s["count"], 3),
+                        "mean_queue_ms": round(s["queue_total_ms"] / s["count"], 3),
+                        "max_ms": round(s["max_ms"], 3),
+                        "histogram": list(s["histogram"])
+                    }
+                    for node_type, s in self._stats.items()
+                }
+            }
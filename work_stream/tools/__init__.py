@@ -1,7 +1,7 @@
 # 导出二次方程求解工具
-from .quadratic_solver_tool import solve_quadratic_equation, tool_metadata
+from .quadratic_solver_tool import solve_quadratic_equation, solve_quadratic_equations, tool_metadata, batch_tool_metadata
 
 # 工具列表
-tools = [solve_quadratic_equation]
+tools = [solve_quadratic_equation, solve_quadratic_equations]
 # 工具元数据列表
-tools_metadata = [tool_metadata]
+tools_metadata = [tool_metadata, batch_tool_metadata]
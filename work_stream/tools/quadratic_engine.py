@@ -0,0 +1,210 @@
+import math
+import re
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+# 一元二次方程求解引擎：解析（预编译正则）+ NumPy 向量化求解 + 结果格式化
+# 工具 solve_quadratic_equation(s) 与节点 quadratic_equation(_batch)_node 共用
+
+EPS = 1e-9
+# 可解析方程数达到该值时使用 NumPy 向量化求解；更少时逐条求解（避免创建数组的固定开销）
+VECTORIZE_MIN = 32
+
+# 求解结果类型
+KIND_TWO_REAL = 0   # 两个不同的实根
+KIND_REPEATED = 1   # 一个重根
+KIND_COMPLEX = 2    # 两个共轭复根
+KIND_LINEAR = 3     # 一次方程（a = 0）
+KIND_NONE = 4       # 无解（a = b = 0, c ≠ 0）
+KIND_INFINITE = 5   # 无数解（a = b = c = 0）
+KIND_OVERFLOW = 6   # 判别式超出浮点数范围
+
+_QUADRATIC_RE = re.compile(r'([+-]?\d*\.?\d*)x\^?2')
+_LINEAR_RE = re.compile(r'([+-]?\d*\.?\d*)x(?!\^)')  # (?!\^) 确保不是x^2
+
+MSG_NOT_ZERO = "无法解析方程格式。请确保方程以 = 0 结尾。"
+MSG_OVERFLOW = "计算错误：(34, 'Numerical result out of range')"
+MSG_UNPARSED = "无法解析方程格式。请使用以下格式之一：\n1. a,b,c (如：1,-2,1)\n2. ax² + bx + c = 0 (如：x² - 2x + 1 = 0)"
+
+
+class EquationFormatError(ValueError):
+    """方程格式无法识别，message 为直接返回给用户的提示"""
+
+
+def _coefficient(coeff_str: str) -> float:
+    if coeff_str == "" or coeff_str == "+":
+        return 1.0
+    if coeff_str == "-":
+        return -1.0
+    return float(coeff_str)
+
+
+def parse_equation(equation: str) -> Tuple[float, float, float]:
+    """
+    解析方程系数，支持 "a,b,c" 与 "ax² + bx + c = 0" 两种格式。
+    格式无法识别时抛出 EquationFormatError，系数不是合法数字时抛出 ValueError。
+    """
+    if "," in equation:
+        a, b, c = map(float, equation.strip().split(","))
+        return a, b, c
+
+    # 去除所有空格，并将 Unicode 平方符号替换为 x^2
+    cleaned = equation.replace(" ", "").lower().replace("²", "^2")
+    if not cleaned.endswith("=0"):
+        raise EquationFormatError(MSG_NOT_ZERO)
+    rest = cleaned[:-2]
+
+    a = b = c = 0.0
+    # 二次项 (ax² 或 ax^2 或 ax2)，处理后从方程中移除
+    match = _QUADRATIC_RE.search(rest)
+    if match:
+        a = _coefficient(match.group(1))
+        rest = rest[:match.start()] + rest[match.end():]
+    # 一次项 (bx)
+    match = _LINEAR_RE.search(rest)
+    if match:
+        b = _coefficient(match.group(1))
+        rest = rest[:match.start()] + rest[match.end():]
+    # 常数项 (c)
+    rest = rest.strip()
+    if rest and rest != "+":
+        c = float(rest)
+
+    if a == 0 and b == 0 and c == 0:
+        raise EquationFormatError(MSG_UNPARSED)
+    return a, b, c
+
+
+def _complex(real: np.ndarray, imag: np.ndarray) -> np.ndarray:
+    """分别写入实部与虚部（real + 1j * imag 会丢失 -0.0 的符号）"""
+    out = np.empty(real.shape, dtype=np.complex128)
+    out.real = real
+    out.imag = imag
+    return out
+
+
+def solve_batch(a, b, c) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    向量化求解 a x² + b x + c = 0，返回 (结果类型, 第一个根, 第二个根)，根为复数数组。
+    一次方程的解放在第一个根；重根两个根相同；无解/无数解时根为 nan。
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    c = np.asarray(c, dtype=np.float64)
+
+    linear = np.abs(a) < EPS
+    no_x = linear & (np.abs(b) < EPS)
+    with np.errstate(over="ignore", invalid="ignore"):
+        b_squared = b * b
+        disc = b_squared - 4 * a * c
+
+    kind = np.full(a.shape, KIND_COMPLEX, dtype=np.int8)
+    kind[disc > EPS] = KIND_TWO_REAL
+    kind[np.abs(disc) < EPS] = KIND_REPEATED
+    kind[linear] = KIND_LINEAR
+    kind[no_x] = np.where(np.abs(c[no_x]) < EPS, KIND_INFINITE, KIND_NONE)
+    # 逐条求解时 b**2 溢出会抛出 OverflowError，其余溢出按 inf 参与计算
+    kind[~linear & np.isinf(b_squared)] = KIND_OVERFLOW
+
+    # 运算顺序与逐条求解的公式保持一致，保证格式化后的结果逐位相同
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        two_a = np.where(linear, 1.0, 2 * a)
+        sq = np.sqrt(np.abs(disc))
+        is_real = kind == KIND_TWO_REAL
+        real = -b / two_a
+        imag = np.where(kind == KIND_COMPLEX, sq / two_a, 0.0)
+        real1 = np.where(is_real, (-b + sq) / two_a, real)
+        real2 = np.where(is_real, (-b - sq) / two_a, real)
+        linear_root = -c / np.where(no_x, 1.0, b)
+
+    real1 = np.where(linear, np.where(no_x, np.nan, linear_root), real1)
+    real2 = np.where(linear, np.nan, real2)
+    return kind, _complex(real1, imag), _complex(real2, -imag)
+
+
+def solve_one(a: float, b: float, c: float) -> Tuple[int, complex, complex]:
+    """逐条求解单个方程，返回值与 solve_batch 的单个元素一致"""
+    if abs(a) < EPS:
+        if abs(b) < EPS:
+            return (KIND_INFINITE if abs(c) < EPS else KIND_NONE), complex(math.nan), complex(math.nan)
+        return KIND_LINEAR, complex(-c / b), complex(math.nan)
+    try:
+        disc = b ** 2 - 4 * a * c
+    except OverflowError:
+        return KIND_OVERFLOW, complex(math.nan), complex(math.nan)
+    if disc > EPS:
+        sq = math.sqrt(disc)
+        return KIND_TWO_REAL, complex((-b + sq) / (2 * a)), complex((-b - sq) / (2 * a))
+    real = -b / (2 * a)
+    if abs(disc) < EPS:
+        return KIND_REPEATED, complex(real), complex(real)
+    imag = math.sqrt(-disc) / (2 * a)
+    return KIND_COMPLEX, complex(real, imag), complex(real, -imag)
+
+
+def format_solution(a: float, b: float, c: float, kind: int, root1: complex, root2: complex) -> str:
+    if kind == KIND_INFINITE:
+        return "方程有无数解，因为 0 = 0"
+    if kind == KIND_NONE:
+        return "方程无解，因为 c ≠ 0"
+    if kind == KIND_OVERFLOW:
+        return MSG_OVERFLOW
+    if kind == KIND_LINEAR:
+        return f"这是一次方程，解为：x = {root1.real:.6f}"
+    if kind == KIND_TWO_REAL:
+        return f"方程 {a}x² + {b}x + {c} = 0 的解为：\nx1 = {root1.real:.6f}\nx2 = {root2.real:.6f}"
+    if kind == KIND_REPEATED:
+        return f"方程 {a}x² + {b}x + {c} = 0 有一个重根：x = {root1.real:.6f}"
+    return (f"方程 {a}x² + {b}x + {c} = 0 有两个共轭复根：\n"
+            f"x1 = {root1.real:.6f} + {root1.imag:.6f}i\nx2 = {root2.real:.6f} - {root1.imag:.6f}i")
+
+
+def _parse_error(e: Exception) -> str:
+    if isinstance(e, EquationFormatError):
+        return str(e)
+    if isinstance(e, ValueError):
+        return f"解析错误：{str(e)}。请确保输入格式正确，例如：1,-2,1 或 x² - 2x + 1 = 0"
+    return f"计算错误：{str(e)}"
+
+
+def solve_equations(equations: Sequence[str]) -> List[str]:
+    """批量求解：逐条解析后一次向量化求解，返回与输入顺序一致的结果文本（解析失败的条目返回错误提示）"""
+    results: List[str] = [""] * len(equations)
+    index, coeffs = [], []
+    for i, equation in enumerate(equations):
+        try:
+            coeffs.append(parse_equation(equation))
+            index.append(i)
+        except Exception as e:
+            results[i] = _parse_error(e)
+    if not coeffs:
+        return results
+
+    if len(coeffs) < VECTORIZE_MIN:
+        rows = [(a, b, c, *solve_one(a, b, c)) for a, b, c in coeffs]
+    else:
+        a, b, c = np.array(coeffs, dtype=np.float64).T
+        kind, root1, root2 = solve_batch(a, b, c)
+        # 转为 Python 标量后再格式化，输出与逐条求解完全一致
+        rows = zip(a.tolist(), b.tolist(), c.tolist(), kind.tolist(), root1.tolist(), root2.tolist())
+    for i, row in zip(index, rows):
+        results[i] = format_solution(*row)
+    return results
+
+
+def solve_equation(equation: str) -> str:
+    """求解单个方程，返回结果文本"""
+    try:
+        a, b, c = parse_equation(equation)
+    except Exception as e:
+        return _parse_error(e)
+    return format_solution(a, b, c, *solve_one(a, b, c))
+
+
+# 批量输入的分隔符：换行或分号（逗号用于 "a,b,c" 格式，不作分隔）
+_SPLIT_RE = re.compile(r'[\n;；]+')
+
+
+def split_equations(text: str) -> List[str]:
+    return [part.strip() for part in _SPLIT_RE.split(text) if part.strip()]